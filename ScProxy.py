@@ -1,21 +1,43 @@
-import requests
+import argparse
+import asyncio
 import os
 import time
 import threading
 import concurrent.futures
 import json
-import re
+import logging
+import shutil
 import signal
 import sys
-import random
+import warnings
 from datetime import datetime
-from colorama import Fore, init
-import fade
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
-from urllib.parse import urlparse
+from lazy_imports import Fore, LazyModule
+from typing import Callable, List, Dict, Tuple, Optional
+from proxy_pool import PROXY_TYPES, Proxy, ProxyPool, remove_duplicates, unpack_country
+from proxy_engine import (DEFAULT_JUDGE_URL, DEFAULT_SAMPLES, STORE_MODES, VALIDATION_MODES, LatencyProfile, discover_real_ip,
+                          profile_proxies_async, validate_proxies_async)
+from health_store import DEFAULT_DB_PATH, DEFAULT_TTL, ProxyHealthStore
+from source_cache import SourceCache
+from proxy_parser import CHUNK_SIZE, ParseStats, iter_parse_chunks, parse_line
+from bulk_loader import load_pool_from_file
+from geoip import DEFAULT_GEOIP_PATH, GeoIPIndex
+from proxy_rotator import ProxyRotator
+from adaptive_concurrency import AdaptiveConcurrency
+from proxy_gateway import DEFAULT_GATEWAY_HOST, DEFAULT_GATEWAY_PORT, ProxyGateway, run_gateway
+from proxy_priority import prioritize
+from result_writer import OUTPUT_FORMATS, ResultWriter
+from checkpoint import CHECKPOINT_SUFFIX, ValidationCheckpoint, fingerprint
+from sharded_validation import DEFAULT_PROCESSES, validate_sharded
+from distributed import DEFAULT_COORDINATOR_HOST, DEFAULT_COORDINATOR_PORT, LeaseCoordinator, run_coordinator, run_worker
+from pool_query import DEFAULT_QUERY_HOST, DEFAULT_QUERY_PORT, PoolQueryService, load_results, start_query_server
+from source_quality import (KEEP, SAMPLE_FRACTION, SKIP, describe, load_source_stats, merge_listings, rank_sources,
+                            report_lines, select_for_validation)
+from metrics import (DEFAULT_DUMP_INTERVAL, DEFAULT_METRICS_HOST, SOURCE_CHECKS, SOURCE_FETCHES, SOURCE_FETCH_SECONDS,
+                     SOURCE_LINES, SOURCE_REJECTED, ProgressReporter, record_dedupe, start_json_dump, start_metrics_server)
 
-init(autoreset=True)
+# Dépendances lourdes ou réservées au menu : importées au premier usage
+requests = LazyModule("requests")
+fade = LazyModule("fade")
 
 # Variable globale pour contrôler l'interruption
 interrupt_flag = False
@@ -29,16 +51,49 @@ def signal_handler(signum, frame):
 # Enregistrer le gestionnaire de signal
 signal.signal(signal.SIGINT, signal_handler)
 
-@dataclass
-class Proxy:
-    """Classe pour représenter un proxy avec ses métadonnées."""
-    ip: str
-    port: str
-    proxy_type: str
-    country: Optional[str] = None
-    speed: Optional[float] = None
-    last_checked: Optional[datetime] = None
-    anonymity: Optional[str] = None
+# Nombre de proxys fonctionnels dont le délai d'obtention est affiché
+FIRST_RESULTS_MILESTONE = 100
+
+# Stockage de santé des proxys, ouvert à la première utilisation
+_health_store: Optional[ProxyHealthStore] = None
+
+def get_health_store() -> ProxyHealthStore:
+    """Retourne le stockage de santé partagé des proxys."""
+    global _health_store
+    if _health_store is None:
+        retention_days = SETTINGS.get("history_retention_days")
+        _health_store = ProxyHealthStore(DEFAULT_DB_PATH, retention_days * 24 * 3600 if retention_days else None)
+    return _health_store
+
+# Cache des listes sources (ETag / Last-Modified)
+_source_cache: Optional[SourceCache] = None
+_source_cache_lock = threading.Lock()
+
+def get_source_cache() -> SourceCache:
+    """Retourne le cache partagé des listes sources."""
+    global _source_cache
+    with _source_cache_lock:
+        if _source_cache is None:
+            _source_cache = SourceCache()
+        return _source_cache
+
+# Index GeoIP hors ligne, chargé à la première utilisation (None si la base est absente)
+_geoip_index: Optional[GeoIPIndex] = None
+
+def get_geoip_index(path: str = DEFAULT_GEOIP_PATH) -> Optional[GeoIPIndex]:
+    """Retourne l'index GeoIP local, ou None si aucune base n'est disponible."""
+    global _geoip_index
+    if _geoip_index is None and os.path.exists(path):
+        _geoip_index = GeoIPIndex.load(path)
+    return _geoip_index
+
+def get_geo_lookup():
+    """Fonction ip -> pays hors ligne, ou None sans base GeoIP."""
+    index = get_geoip_index()
+    return index.lookup if index is not None else None
+
+# Juge de géolocalisation en ligne (pays de sortie), utilisé sans base GeoIP locale
+GEO_JUDGE_URL = "http://ip-api.com/json"
 
 # Configuration des URLs de proxys
 PROXY_URLS: Dict[str, List[str]] = {
@@ -66,353 +121,664 @@ PROXY_URLS: Dict[str, List[str]] = {
     ]
 }
 
-def validate_proxy_format(proxy_str: str) -> Optional[Tuple[str, str]]:
-    """Valide le format d'un proxy et retourne (ip, port)."""
-    # Patterns pour différents formats de proxy
-    patterns = [
-        r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{1,5})$',  # IP:PORT
-        r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{1,5}):(\w+):(\w+)$',  # IP:PORT:USER:PASS
-    ]
-    
-    for pattern in patterns:
-        match = re.match(pattern, proxy_str.strip())
-        if match:
-            ip = match.group(1)
-            port = match.group(2)
-            
-            # Validation supplémentaire de l'IP et du port
-            if not is_valid_ip(ip) or not is_valid_port(port):
-                return None
-                
-            return ip, port
-    return None
+# Configuration externalisée : config.json à côté du script, surchargeable avec --config
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+SETTINGS: Dict = {
+    "timeout": 10,                  # délai des téléchargements de sources (secondes)
+    "max_workers": 10,              # téléchargements de sources simultanés
+    "test_url": DEFAULT_JUDGE_URL,  # juge de validation
+    "output_directory": ".",
+    "backup_enabled": False,        # copie l'ancienne version d'un fichier de sortie dans backup/
+    "log_level": "INFO",            # journal du mode daemon
+    "adaptive_sources": True,       # échantillonne ou ignore les sources sans proxys fonctionnels
+    "history_retention_days": 7,    # conservation de l'historique détaillé des tests (0 : sans limite)
+}
+# Juges de secours, essayés dans l'ordre si le juge principal est injoignable
+TEST_URLS: List[str] = []
+BACKUP_DIRECTORY = "backup"
+_judge_url: Optional[str] = None
+# Reprise automatique des validations interrompues (--resume)
+resume_requested = False
 
-def is_valid_ip(ip: str) -> bool:
-    """Valide une adresse IP."""
+def apply_config(path: str = CONFIG_PATH) -> bool:
+    """Applique config.json (URLs sources, réglages, juges) ; faux si le fichier est absent ou invalide."""
+    global _judge_url
     try:
-        parts = ip.split('.')
-        if len(parts) != 4:
-            return False
-        for part in parts:
-            if not part.isdigit() or not (0 <= int(part) <= 255):
-                return False
-        return True
-    except:
+        with open(path, encoding="utf-8") as file:
+            config = json.load(file)
+    except (OSError, ValueError):
         return False
+    if isinstance(config.get("proxy_urls"), dict):
+        PROXY_URLS.clear()
+        PROXY_URLS.update({proxy_type.upper(): list(urls) for proxy_type, urls in config["proxy_urls"].items()})
+    SETTINGS.update(config.get("settings") or {})
+    TEST_URLS[:] = config.get("test_urls") or []
+    _judge_url = None
+    return True
 
-def is_valid_port(port: str) -> bool:
-    """Valide un numéro de port."""
-    try:
-        port_num = int(port)
-        return 1 <= port_num <= 65535
-    except:
-        return False
+apply_config()
 
-def test_proxy(proxy: Proxy, timeout: int = 5) -> bool:
-    """Teste si un proxy fonctionne avec un timeout plus court."""
-    global interrupt_flag
-    if interrupt_flag:
-        return False
-        
-    try:
-        proxy_dict = {
-            'http': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}',
-            'https': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}'
-        }
-        
-        # Test avec une requête simple et timeout court
-        response = requests.get(
-            'http://httpbin.org/ip',
-            proxies=proxy_dict,
-            timeout=timeout
-        )
-        return response.status_code == 200
-    except:
+def get_judge_url() -> str:
+    """Juge de validation : test_url de la configuration, ou le premier juge de secours joignable."""
+    global _judge_url
+    if _judge_url is None:
+        candidates = list(dict.fromkeys([SETTINGS["test_url"], *TEST_URLS]))
+        _judge_url = candidates[0]
+        if len(candidates) > 1:
+            for url in candidates:
+                # Le juge doit au moins renvoyer l'adresse du client
+                if asyncio.run(discover_real_ip(url, SETTINGS["timeout"])) is not None:
+                    _judge_url = url
+                    break
+    return _judge_url
+
+def get_target_url() -> str:
+    """URL cible des profils https et url : target_url de la configuration, sinon le juge."""
+    return SETTINGS.get("target_url") or get_judge_url()
+
+def output_path(filename: str) -> str:
+    """Chemin d'un fichier de sortie dans output_directory ; l'ancienne version est sauvegardée si activé."""
+    directory = SETTINGS.get("output_directory") or "."
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(filename))
+    if SETTINGS.get("backup_enabled") and os.path.exists(path):
+        backup_directory = os.path.join(directory, BACKUP_DIRECTORY)
+        os.makedirs(backup_directory, exist_ok=True)
+        stem, extension = os.path.splitext(os.path.basename(path))
+        shutil.copy2(path, os.path.join(backup_directory, f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"))
+    return path
+
+def validate_proxy_format(proxy_str: str) -> Optional[Tuple[str, str]]:
+    """Valide le format d'un proxy et retourne (ip, port)."""
+    # Grammaire unique : IP:PORT, IP:PORT:USER:PASS, scheme://, user:pass@ et [IPv6]:PORT
+    return parse_line(proxy_str)
+
+def split_for_revalidation(proxies: List[Proxy], ttl: float = DEFAULT_TTL) -> Tuple[List[Proxy], List[Proxy]]:
+    """Retourne (à tester, fonctionnels récents) d'après le stockage de santé."""
+    to_check, fresh_alive, fresh_dead = get_health_store().split_by_freshness(proxies, ttl)
+    if fresh_alive or fresh_dead:
+        print(Fore.CYAN + f"[INFO] {len(fresh_alive)} fonctionnels et {fresh_dead} morts testés il y a moins de {ttl:.0f}s, {len(to_check)} à tester")
+    return to_check, fresh_alive
+
+def record_check(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+    """Met à jour les métadonnées du proxy et l'historique de santé."""
+    if ok:
+        proxy.last_checked = datetime.now()
+        if proxy.speed is None:
+            proxy.speed = latency
+    get_health_store().record(proxy, ok, latency)
+
+def prepare_queue(proxies: List[Proxy], use_store: bool, ttl: float, prioritized: bool) -> Tuple[List[Proxy], List[Proxy]]:
+    """Retourne (file à tester, fonctionnels récents), la file étant triée par chances de succès."""
+    fresh_proxies: List[Proxy] = []
+    if use_store:
+        proxies, fresh_proxies = split_for_revalidation(proxies, ttl)
+    if prioritized:
+        proxies = prioritize(proxies, get_health_store())
+    return proxies, fresh_proxies
+
+def stream_results(use_store: bool, on_working: Optional[Callable[[Proxy], None]] = None, on_checked: Optional[Callable[[Proxy, bool, Optional[float]], None]] = None) -> Callable[[Proxy, bool, Optional[float]], None]:
+    """Callback de résultat : historique de santé et diffusion immédiate des proxys fonctionnels."""
+    start = time.time()
+    found = 0
+
+    def on_result(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+        nonlocal found
+        if use_store:
+            record_check(proxy, ok, latency)
+        if proxy.source:
+            SOURCE_CHECKS.inc(source=proxy.source, result="alive" if ok else "dead")
+        if on_checked is not None:
+            on_checked(proxy, ok, latency)
+        if not ok:
+            return
+        found += 1
+        print(Fore.GREEN + f"[+] {proxy.ip}:{proxy.port} fonctionnel ({latency:.2f}s)")
+        if on_working is not None:
+            on_working(proxy)
+        if found == FIRST_RESULTS_MILESTONE:
+            print(Fore.CYAN + f"[INFO] {FIRST_RESULTS_MILESTONE} premiers proxys fonctionnels en {time.time() - start:.1f}s")
+
+    return on_result
+
+def make_concurrency(max_workers: Optional[int], timeout: float):
+    """Concurrence fixe si max_workers est donné, sinon contrôleur adaptatif (AIMD)."""
+    return max_workers if max_workers else AdaptiveConcurrency(timeout)
+
+def report_concurrency(concurrency) -> None:
+    """Affiche la concurrence retenue par le contrôleur adaptatif."""
+    if isinstance(concurrency, AdaptiveConcurrency):
+        print(Fore.CYAN + f"[INFO] {concurrency.summary()}")
+
+def ask_resume(output_filename: str) -> bool:
+    """Propose de reprendre une validation interrompue (automatique avec --resume)."""
+    if not os.path.exists(output_filename + CHECKPOINT_SUFFIX):
         return False
+    if resume_requested:
+        return True
+    choice = input(Fore.YELLOW + "Une validation interrompue de ce fichier a été trouvée. Reprendre ? (o/n) : ").lower()
+    return choice in ['o', 'oui', 'y', 'yes']
 
-def test_proxy_speed(proxy: Proxy, timeout: int = 10) -> Optional[float]:
-    """Teste la vitesse d'un proxy et retourne le temps de réponse en secondes."""
-    try:
-        proxy_dict = {
-            'http': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}',
-            'https': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}'
-        }
-        
-        start_time = time.time()
-        response = requests.get(
-            'http://httpbin.org/ip',
-            proxies=proxy_dict,
-            timeout=timeout
-        )
-        end_time = time.time()
-        
-        if response.status_code == 200:
-            return end_time - start_time
-        return None
-    except:
-        return None
-
-def get_proxy_country(proxy: Proxy) -> Optional[str]:
-    """Tente de déterminer le pays du proxy."""
-    try:
-        proxy_dict = {
-            'http': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}',
-            'https': f'{proxy.proxy_type.lower()}://{proxy.ip}:{proxy.port}'
-        }
-        
-        response = requests.get(
-            'http://ip-api.com/json',
-            proxies=proxy_dict,
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('countryCode', 'Unknown')
-        return None
-    except:
-        return None
-
-def validate_proxies_batch(proxies: List[Proxy], batch_size: int = 100, max_workers: int = 20) -> List[Proxy]:
-    """Valide les proxys par batch pour éviter la surcharge."""
+def prompt_processes() -> int:
+    """Demande le nombre de processus de validation."""
+    choice = input(Fore.YELLOW + f"Nombre de processus de validation (défaut: 1, {DEFAULT_PROCESSES} cœurs disponibles) : ").strip()
+    return max(1, int(choice)) if choice.isdigit() else 1
+
+def validate_proxies_batch(proxies: List[Proxy], batch_size: int = 1000, max_workers: Optional[int] = None, timeout: int = 5, mode: str = "staged", incremental: bool = True, ttl: float = DEFAULT_TTL, prioritized: bool = True, on_working: Optional[Callable[[Proxy], None]] = None, on_checked: Optional[Callable[[Proxy, bool, Optional[float]], None]] = None, processes: int = 1) -> List[Proxy]:
+    """Valide les proxys en fenêtre glissante, avec un rapport de progression par batch.
+
+    Avec processes > 1, la file est répartie sur plusieurs processus (max_workers tests
+    simultanés par processus) ; la progression reste affichée par ce processus.
+    """
     global interrupt_flag
     interrupt_flag = False
-    working_proxies = []
+    # Le handshake seul ne prouve pas qu'un proxy relaie, et les profils https/url visent
+    # une autre cible que le juge : ils n'alimentent pas l'historique
+    use_store = incremental and mode in STORE_MODES
+    proxies, fresh_proxies = prepare_queue(proxies, use_store, ttl, prioritized)
+    if on_working is not None:
+        for proxy in fresh_proxies:
+            on_working(proxy)
+    if processes > 1:
+        proxies = remove_duplicates(proxies, by_type=True)
     total_proxies = len(proxies)
+    total_batches = (total_proxies + batch_size - 1) // batch_size
     
-    print(Fore.CYAN + f"[INFO] Validation de {total_proxies} proxys par batch de {batch_size}...")
+    concurrency = make_concurrency(max_workers, timeout)
+    if processes > 1:
+        print(Fore.CYAN + f"[INFO] Validation de {total_proxies} proxys sur {processes} processus ({max_workers or 'auto'} tests simultanés par processus, rapport tous les {batch_size})...")
+    else:
+        print(Fore.CYAN + f"[INFO] Validation de {total_proxies} proxys ({max_workers or 'auto'} tests simultanés, rapport tous les {batch_size})...")
     print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour interrompre la validation")
     
-    for i in range(0, total_proxies, batch_size):
-        if interrupt_flag:
-            print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
-            break
-            
-        batch = proxies[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (total_proxies + batch_size - 1) // batch_size
-        
-        print(Fore.YELLOW + f"[INFO] Batch {batch_num}/{total_batches} ({len(batch)} proxys)...")
-        
-        # Validation du batch en parallèle
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_proxy = {executor.submit(test_proxy, proxy): proxy for proxy in batch}
-            
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_proxy):
-                if interrupt_flag:
-                    break
-                    
-                proxy = future_to_proxy[future]
-                completed += 1
-                
-                try:
-                    if future.result():
-                        working_proxies.append(proxy)
-                except Exception:
-                    continue
-                
-                # Affichage de progression
-                if completed % 10 == 0 or completed == len(batch):
-                    progress = (completed / len(batch)) * 100
-                    working_count = len([p for p in working_proxies if p in batch])
-                    print(Fore.GREEN + f"  Progression: {progress:.1f}% - {working_count} fonctionnels")
-        
-        if interrupt_flag:
-            break
-            
-        # Pause courte entre les batchs pour éviter la surcharge
-        time.sleep(0.5)
+    # Pas de barrière entre les batchs : un nouveau test démarre dès qu'un slot se libère
+    reported_batches = 0
+    reported_working = 0
+    stream = stream_results(use_store, on_working, on_checked)
+
+    def render(progress: ProgressReporter) -> None:
+        # Thread de rendu : une ligne dès qu'au moins un batch a été franchi depuis la précédente
+        nonlocal reported_batches, reported_working
+        completed, working_count = progress.completed, progress.working
+        batch_num = -(-completed // batch_size) if completed == total_proxies else completed // batch_size
+        if batch_num == reported_batches:
+            return
+        percent = (completed / total_proxies) * 100
+        print(Fore.GREEN + f"  Batch {batch_num}/{total_batches} - {percent:.1f}% - {working_count - reported_working} fonctionnels ({working_count} au total) - {progress.rate:.0f} proxys/s")
+        reported_batches = batch_num
+        reported_working = working_count
+
+    progress = ProgressReporter(total_proxies, render)
+
+    def on_result(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+        progress.record(ok)
+        stream(proxy, ok, latency)
+
+    with progress:
+        working_proxies = run_batch_validation(proxies, processes, timeout, max_workers, concurrency, on_result, mode)
+    if processes == 1:
+        report_concurrency(concurrency)
+    if use_store:
+        get_health_store().flush()
     
-    return working_proxies
+    if interrupt_flag:
+        print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
+    
+    return fresh_proxies + working_proxies
+
+def run_batch_validation(proxies: List[Proxy], processes: int, timeout: int, max_workers: Optional[int], concurrency, on_result: Callable[[Proxy, bool, Optional[float]], None], mode: str) -> List[Proxy]:
+    """Validation dans ce processus ou répartie sur plusieurs processus."""
+    if processes > 1:
+        return validate_sharded(
+            proxies,
+            processes,
+            timeout=timeout,
+            max_workers=max_workers,
+            on_result=on_result,
+            should_stop=lambda: interrupt_flag,
+            mode=mode,
+            test_url=get_target_url(),
+            judge_url=get_judge_url(),
+            geo_lookup=get_geo_lookup(),
+        )
+    return validate_proxies_async(
+        proxies,
+        timeout=timeout,
+        concurrency=concurrency,
+        on_result=on_result,
+        should_stop=lambda: interrupt_flag,
+        mode=mode,
+        test_url=get_target_url(),
+        judge_url=get_judge_url(),
+        geo_lookup=get_geo_lookup(),
+    )
+
+def test_proxies_speed(proxies: List[Proxy], max_workers: Optional[int] = None, timeout: int = 10, samples: int = DEFAULT_SAMPLES) -> List[Proxy]:
+    """Teste la vitesse de tous les proxys sur plusieurs mesures et les trie par latence médiane.
 
-def test_proxies_speed(proxies: List[Proxy], max_workers: int = 10) -> List[Proxy]:
-    """Teste la vitesse de tous les proxys et les trie par vitesse."""
-    print(Fore.CYAN + f"[INFO] Test de vitesse pour {len(proxies)} proxys...")
+    Chaque proxy reçoit p50 (speed), p95, gigue et la durée de chaque phase
+    (connexion, négociation, premier octet, total) ; la première réponse du juge
+    renseigne aussi IP de sortie, anonymat et pays.
+    """
+    global interrupt_flag
+    interrupt_flag = False
+    print(Fore.CYAN + f"[INFO] Test de vitesse pour {len(proxies)} proxys ({samples} mesures par proxy)...")
+    # Plusieurs mesures par proxy : le délai d'un test complet est multiplié d'autant
+    concurrency = make_concurrency(max_workers, timeout * samples)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_proxy = {executor.submit(test_proxy_speed, proxy): proxy for proxy in proxies}
-        
-        for future in concurrent.futures.as_completed(future_to_proxy):
-            proxy = future_to_proxy[future]
-            try:
-                speed = future.result()
-                if speed is not None:
-                    proxy.speed = speed
-            except Exception:
-                continue
+    def on_result(proxy: Proxy, profile: LatencyProfile) -> None:
+        record_check(proxy, profile.ok, profile.p50)
     
-    # Trier par vitesse (plus rapide en premier)
-    fast_proxies = [p for p in proxies if p.speed is not None]
-    fast_proxies.sort(key=lambda x: x.speed or 999.0)
+    fast_proxies = profile_proxies_async(
+        proxies,
+        samples=samples,
+        timeout=timeout,
+        concurrency=concurrency,
+        judge_url=get_judge_url(),
+        on_result=on_result,
+        should_stop=lambda: interrupt_flag,
+        geo_lookup=get_geo_lookup(),
+    )
+    report_concurrency(concurrency)
+    get_health_store().flush()
+    
+    # Trier par latence médiane puis p95 (plus stable en premier)
+    fast_proxies.sort(key=lambda x: (x.speed or 999.0, x.speed_p95 or 999.0))
     
     print(Fore.GREEN + f"[INFO] {len(fast_proxies)} proxys testés pour la vitesse")
     return fast_proxies
 
-def filter_proxies_by_country(proxies: List[Proxy], country_codes: List[str]) -> List[Proxy]:
-    """Filtre les proxys par pays."""
+def filter_proxies_by_country(proxies: List[Proxy], country_codes: List[str], verify_exit: bool = False, max_workers: Optional[int] = None) -> List[Proxy]:
+    """Filtre les proxys par pays (base GeoIP locale, vérification optionnelle de l'IP de sortie)."""
+    global interrupt_flag
     print(Fore.CYAN + f"[INFO] Filtrage par pays: {', '.join(country_codes)}")
+    wanted = {c.strip().upper() for c in country_codes if c.strip()}
     
-    filtered_proxies = []
-    for proxy in proxies:
-        country = get_proxy_country(proxy)
-        if country and country.upper() in [c.upper() for c in country_codes]:
-            proxy.country = country
-            filtered_proxies.append(proxy)
+    index = get_geoip_index()
+    if index is None:
+        print(Fore.YELLOW + f"[WARN] Base GeoIP locale absente ({DEFAULT_GEOIP_PATH}), recherche en ligne via chaque proxy")
+        candidates = list(proxies)
+        verify_exit = True
+    else:
+        start_time = time.perf_counter()
+        # Recherche vectorisée sur les colonnes d'un pool compact : seuls les proxys retenus sont modifiés
+        ipv4 = [proxy for proxy in proxies if ":" not in proxy.ip]
+        pool = ProxyPool()
+        pool.extend_pairs(((proxy.ip, proxy.port) for proxy in ipv4), "HTTP")
+        candidates = []
+        for position in index.select_countries(pool, wanted):
+            proxy = ipv4[position]
+            proxy.country = unpack_country(pool.countries[position])
+            candidates.append(proxy)
+        print(Fore.CYAN + f"[INFO] Géolocalisation hors ligne en {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    
+    if not verify_exit:
+        filtered_proxies = candidates
+    else:
+        # Le pays de sortie peut différer de celui de l'adresse du proxy : contrôle par le moteur
+        interrupt_flag = False
+        for proxy in candidates:
+            proxy.country = None
+        timeout = 5
+        concurrency = make_concurrency(max_workers, timeout)
+        reachable = validate_proxies_async(
+            candidates,
+            timeout=timeout,
+            concurrency=concurrency,
+            should_stop=lambda: interrupt_flag,
+            mode="full",
+            judge_url=get_judge_url() if index is not None else GEO_JUDGE_URL,
+            geo_lookup=get_geo_lookup(),
+        )
+        report_concurrency(concurrency)
+        filtered_proxies = [proxy for proxy in reachable if proxy.country in wanted]
     
     print(Fore.GREEN + f"[INFO] {len(filtered_proxies)} proxys trouvés pour les pays spécifiés")
     return filtered_proxies
 
-def create_proxy_rotator(proxies: List[Proxy]):
-    """Crée un rotateur de proxys qui change automatiquement."""
-    proxy_list = proxies.copy()
-    random.shuffle(proxy_list)
-    current_index = 0
+def create_proxy_rotator(proxies: List[Proxy]) -> ProxyRotator:
+    """Crée un rotateur de proxys partagé, pondéré par la latence et la santé de chaque proxy.
+
+    rotator() ou rotator.get(proxy_type, country) choisit un proxy ;
+    rotator.report(proxy, ok, latence) alimente le disjoncteur.
+    """
+    return ProxyRotator(proxies)
+
+def start_gateway(proxies: List[Proxy], host: str = DEFAULT_GATEWAY_HOST, port: int = DEFAULT_GATEWAY_PORT) -> None:
+    """Lance la passerelle rotative (HTTP CONNECT / SOCKS5) adossée au pool de proxys."""
+    global interrupt_flag
+    interrupt_flag = False
+    rotator = create_proxy_rotator(proxies)
+    print(Fore.GREEN + f"[*] Passerelle à l'écoute sur {host}:{port} (HTTP et SOCKS5) - {len(rotator)} proxys")
+    print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour arrêter la passerelle")
     
-    def get_next_proxy():
-        nonlocal current_index
-        if not proxy_list:
-            return None
-        
-        proxy = proxy_list[current_index]
-        current_index = (current_index + 1) % len(proxy_list)
-        return proxy
+    # Chaque ouverture de tunnel alimente le rotateur et l'historique de santé
+    stats = run_gateway(rotator, host, port, should_stop=lambda: interrupt_flag, on_result=record_check)
+    get_health_store().flush()
+    print(Fore.CYAN + f"[INFO] {stats.total} connexions, {stats.failed} échecs, {stats.retries} nouvelles tentatives, {stats.rejected} clients refusés (tunnels saturés)")
+
+def start_coordinator(proxies: List[Proxy], output_filename: str, host: str = DEFAULT_COORDINATOR_HOST, port: int = DEFAULT_COORDINATOR_PORT, token: Optional[str] = None) -> None:
+    """Distribue la validation du pool à des ouvriers et fusionne leurs résultats dans un fichier."""
+    global interrupt_flag
+    interrupt_flag = False
+
+    def on_working(proxy: Proxy) -> None:
+        print(Fore.GREEN + f"[+] {proxy.ip}:{proxy.port} fonctionnel ({proxy.speed or 0:.2f}s)")
+        writer.write(proxy)
+
+    with ResultWriter(output_filename) as writer:
+        # Résultats des ouvriers enregistrés dans l'historique : la revalidation incrémentale en profite
+        coordinator = LeaseCoordinator(prioritize(proxies, get_health_store()), geo_lookup=get_geo_lookup(), on_working=on_working,
+                                       token=token, on_result=record_check)
+        print(Fore.GREEN + f"[*] Coordinateur à l'écoute sur http://{host}:{port} - {len(coordinator.entries)} proxys en {coordinator.lease_count} baux")
+        print(Fore.YELLOW + "[INFO] Lancez les ouvriers (option 15) sur cette machine ou d'autres ; Ctrl+C pour arrêter")
+        run_coordinator(coordinator, host, port, should_stop=lambda: interrupt_flag)
+    get_health_store().flush()
     
-    return get_next_proxy
+    stats = coordinator.stats
+    print(Fore.CYAN + f"[INFO] {stats.checked}/{stats.total} proxys testés, {stats.working} fonctionnels, {stats.requeued} baux redistribués")
+    if writer.count:
+        print(Fore.GREEN + f"[+] {writer.count} proxys enregistrés dans '{output_filename}'")
+    else:
+        os.remove(output_filename)
+
+def start_worker(coordinator_url: str, token: Optional[str] = None, mode: str = "staged") -> None:
+    """Valide les baux distribués par un coordinateur jusqu'à ce qu'il n'y en ait plus."""
+    global interrupt_flag
+    interrupt_flag = False
+    print(Fore.GREEN + f"[*] Ouvrier connecté à {coordinator_url}")
+    print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour arrêter l'ouvrier")
+    checked = run_worker(
+        coordinator_url,
+        mode=mode,
+        judge_url=get_judge_url(),
+        test_url=get_target_url(),
+        token=token,
+        should_stop=lambda: interrupt_flag,
+        on_lease=lambda lease, tested, working: print(Fore.GREEN + f"  Bail {lease} : {tested} testés, {working} fonctionnels"),
+    )
+    print(Fore.CYAN + f"[INFO] {checked} proxys testés pour le coordinateur")
+
+def load_validated_proxies(filename: str, proxy_type: str = "HTTP") -> List[Proxy]:
+    """Proxys validés d'un fichier ; les sorties JSON/JSONL conservent type, pays et latence."""
+    if filename.endswith((".json", ".jsonl")):
+        proxies = load_results(filename)
+        print(Fore.CYAN + f"[*] {len(proxies)} proxys chargés")
+        return proxies
+    return list(load_proxies_from_file(filename, proxy_type))
 
-def scrape_proxies(proxy_type: str, validate: bool = False, max_workers: int = 10) -> List[Proxy]:
+def start_query_api(proxies: List[Proxy], host: str = DEFAULT_QUERY_HOST, port: int = DEFAULT_QUERY_PORT) -> None:
+    """Sert l'API de requête JSON sur le pool jusqu'à l'interruption."""
+    global interrupt_flag
+    interrupt_flag = False
+    server = start_query_server(PoolQueryService(proxies), host, port)
+    print(Fore.GREEN + f"[*] API de requête à l'écoute sur http://{host}:{port} - {len(proxies)} proxys indexés")
+    print(Fore.CYAN + f"[INFO] Exemple : curl 'http://{host}:{port}/proxies?type=SOCKS5&country=DE&max_latency_ms=300&limit=10'")
+    print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour arrêter l'API")
+    try:
+        while not interrupt_flag:
+            time.sleep(0.2)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def show_source_stats(proxy_types: List[str]) -> None:
+    """Affiche la qualité mesurée des sources, les plus productives d'abord."""
+    source_stats = load_source_stats(get_health_store())
+    for proxy_type in proxy_types:
+        print(Fore.CYAN + f"[INFO] Sources {proxy_type} :")
+        for url in rank_sources(PROXY_URLS.get(proxy_type, []), source_stats):
+            if url in source_stats:
+                print(describe(source_stats[url]))
+            else:
+                print(f"{url}\n    jamais scrapée")
+
+def scrape_proxies(proxy_type: str, validate: bool = False, max_workers: Optional[int] = None, mode: str = "staged", ttl: float = DEFAULT_TTL) -> List[Proxy]:
     """Scrape des proxys avec validation optionnelle optimisée."""
+    max_workers = max_workers or SETTINGS["max_workers"]
     if proxy_type not in PROXY_URLS:
         print(Fore.RED + "Type de proxy invalide.")
         return []
 
     print(Fore.CYAN + f"[INFO] Début du scraping des proxys {proxy_type}...")
-    all_proxies: List[Proxy] = []
+    scrape_start = time.time()
+    # Qualité des sources mesurée lors des exécutions précédentes
+    adaptive = SETTINGS.get("adaptive_sources", True)
+    source_stats = load_source_stats(get_health_store()) if adaptive else {}
+    decisions = {url: source_stats[url].decision() if url in source_stats else KEEP for url in PROXY_URLS[proxy_type]}
+    for url, decision in decisions.items():
+        if decision == SKIP:
+            stats = source_stats[url]
+            print(Fore.YELLOW + f"[INFO] {url} ignorée : {stats.alive_rate:.2%} de fonctionnels, {stats.overlap:.0%} de recouvrement")
+    urls = [url for url in rank_sources(PROXY_URLS[proxy_type], source_stats) if decisions[url] != SKIP]
+    listings: Dict[str, List[Tuple[str, str]]] = {}
     
     # Scraping parallèle des URLs
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_url = {
-            executor.submit(scrape_single_url, url, proxy_type): url 
-            for url in PROXY_URLS[proxy_type]
-        }
+        future_to_url = {executor.submit(scrape_source_pairs, url): url for url in urls}
         
         for future in concurrent.futures.as_completed(future_to_url):
             url = future_to_url[future]
             try:
-                proxies_from_url = future.result()
-                all_proxies.extend(proxies_from_url)
-                print(Fore.GREEN + f"[+] {len(proxies_from_url)} proxys récupérés depuis {url}")
+                listings[url] = future.result()
+                print(Fore.GREEN + f"[+] {len(listings[url])} proxys récupérés depuis {url}")
             except Exception as e:
                 print(Fore.YELLOW + f"[Erreur] Impossible de scraper depuis {url}: {e}")
 
-    # Suppression des doublons
-    unique_proxies = remove_duplicates(all_proxies)
+    # Suppression des doublons dans le pool compact, les meilleures sources d'abord :
+    # chacune devient la source principale de ses proxys
+    unique_proxies = merge_listings({url: listings[url] for url in urls if url in listings}, proxy_type)
+    record_dedupe(proxy_type, sum(len(pairs) for pairs in listings.values()), len(unique_proxies))
     print(Fore.CYAN + f"[INFO] {len(unique_proxies)} proxys uniques trouvés")
+    counts = unique_proxies.source_counts()
+    if adaptive:
+        store = get_health_store()
+        for url in listings:
+            listed, unique = counts.get(url, (0, 0))
+            store.record_scrape(url, listed, unique, *get_source_cache().freshness(url, scrape_start))
 
     # Validation optionnelle avec gestion des gros volumes
+    working_proxies = None
     if validate and unique_proxies:
-        if len(unique_proxies) > 1000:
+        if adaptive:
+            candidates, dropped = select_for_validation(unique_proxies, decisions)
+            if dropped:
+                print(Fore.YELLOW + f"[INFO] {dropped} proxys de sources peu fiables écartés ({SAMPLE_FRACTION:.0%} de leurs entrées restent testées)")
+        else:
+            candidates = list(unique_proxies)
+        if len(candidates) > 1000:
             print(Fore.YELLOW + "[INFO] Gros volume détecté, utilisation de la validation par batch...")
-            working_proxies = validate_proxies_batch(unique_proxies)
+            working_proxies = validate_proxies_batch(candidates, mode=mode, ttl=ttl)
         else:
             print(Fore.YELLOW + "[INFO] Validation des proxys en cours...")
-            working_proxies = validate_proxies_parallel(unique_proxies, max_workers)
+            working_proxies = validate_proxies_parallel(candidates, mode=mode, ttl=ttl)
         
         print(Fore.GREEN + f"[INFO] {len(working_proxies)} proxys fonctionnels trouvés")
-        return working_proxies
     
-    return unique_proxies
+    if adaptive:
+        print(Fore.CYAN + "[INFO] Apport des sources :")
+        for line in report_lines(counts, decisions, source_stats, working_proxies):
+            print(Fore.CYAN + f"  {line}")
+    return list(unique_proxies) if working_proxies is None else working_proxies
 
-def scrape_single_url(url: str, proxy_type: str) -> List[Proxy]:
-    """Scrape les proxys d'une URL spécifique."""
+def download_source(url: str, conditional: bool = True) -> Optional[List[Tuple[str, str]]]:
+    """Télécharge et analyse une source, retourne None si elle est inchangée (304)."""
+    cache = get_source_cache()
+    headers = cache.conditional_headers(url) if conditional else {}
+    start = time.perf_counter()
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        proxies = []
-        for line in response.text.splitlines():
-            line = line.strip()
-            if not line:
-                continue
-                
-            proxy_info = validate_proxy_format(line)
-            if proxy_info:
-                ip, port = proxy_info
-                proxies.append(Proxy(ip=ip, port=port, proxy_type=proxy_type))
+        with requests.get(url, timeout=SETTINGS["timeout"], headers=headers, stream=True) as response:
+            if response.status_code == 304:
+                SOURCE_FETCHES.inc(source=url, status="304")
+                return None
+            response.raise_for_status()
+            
+            # Analyse en flux, bloc par bloc, sans construire response.text
+            stats = ParseStats()
+            proxy_infos = list(iter_parse_chunks(response.iter_content(chunk_size=CHUNK_SIZE), stats))
+    except requests.RequestException:
+        SOURCE_FETCHES.inc(source=url, status="error")
+        raise
+    finally:
+        SOURCE_FETCH_SECONDS.observe(time.perf_counter() - start, source=url)
+    SOURCE_FETCHES.inc(source=url, status="200")
+    SOURCE_LINES.inc(stats.lines, source=url)
+    SOURCE_REJECTED.inc(stats.rejected, source=url)
+    
+    cache.store(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), proxy_infos)
+    return proxy_infos
+
+def scrape_proxies_to_pool(proxy_type: str, pool: ProxyPool, max_workers: Optional[int] = None) -> int:
+    """Scrape un type de proxy directement dans un pool compact, retourne le nombre d'entrées ajoutées."""
+    max_workers = max_workers or SETTINGS["max_workers"]
+    before = len(pool)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_url = {executor.submit(scrape_source_pairs, url): url for url in PROXY_URLS[proxy_type]}
         
-        return proxies
-    except Exception as e:
-        raise e
+        for future in concurrent.futures.as_completed(future_to_url):
+            url = future_to_url[future]
+            try:
+                proxy_infos = future.result()
+                pool.extend_pairs(proxy_infos, proxy_type, source=url)
+                print(Fore.GREEN + f"[+] {len(proxy_infos)} proxys récupérés depuis {url}")
+            except Exception as e:
+                print(Fore.YELLOW + f"[Erreur] Impossible de scraper depuis {url}: {e}")
+    return len(pool) - before
 
-def remove_duplicates(proxies: List[Proxy]) -> List[Proxy]:
-    """Supprime les proxys en double basés sur IP:PORT."""
-    seen = set()
-    unique_proxies = []
-    
-    for proxy in proxies:
-        proxy_key = f"{proxy.ip}:{proxy.port}"
-        if proxy_key not in seen:
-            seen.add(proxy_key)
-            unique_proxies.append(proxy)
+def scrape_single_url(url: str, proxy_type: str) -> List[Proxy]:
+    """Scrape les proxys d'une URL spécifique (requête conditionnelle avec cache).
+
+    Obsolète : scrape_source_pairs évite de créer un objet Proxy par ligne listée.
+    """
+    warnings.warn("scrape_single_url est obsolète, utilisez scrape_source_pairs", DeprecationWarning, stacklevel=2)
+    return [Proxy(ip=ip, port=port, proxy_type=proxy_type, source=url, sources=(url,)) for ip, port in scrape_source_pairs(url)]
+
+def scrape_source_pairs(url: str) -> List[Tuple[str, str]]:
+    """Retourne les couples (ip, port) d'une source, via le cache si elle est inchangée."""
+    cache = get_source_cache()
+    try:
+        proxy_infos = download_source(url)
+        if proxy_infos is None:
+            # Source inchangée : réutiliser le résultat déjà analysé
+            proxy_infos = cache.load(url)
+            if proxy_infos is None:
+                proxy_infos = download_source(url, conditional=False)
+            else:
+                cache.touch(url)
+    except requests.RequestException as e:
+        # Source injoignable : copie en cache si elle n'est pas trop ancienne
+        proxy_infos = cache.load_stale(url)
+        if proxy_infos is None:
+            raise e
+        print(Fore.YELLOW + f"[INFO] {url} injoignable ({e.__class__.__name__}), utilisation de la copie en cache")
     
-    return unique_proxies
+    return proxy_infos
 
-def validate_proxies_parallel(proxies: List[Proxy], max_workers: int = 10) -> List[Proxy]:
+def validate_proxies_parallel(proxies: List[Proxy], max_workers: Optional[int] = None, timeout: int = 5, mode: str = "staged", incremental: bool = True, ttl: float = DEFAULT_TTL, prioritized: bool = True, on_working: Optional[Callable[[Proxy], None]] = None, on_checked: Optional[Callable[[Proxy, bool, Optional[float]], None]] = None) -> List[Proxy]:
     """Valide les proxys en parallèle (pour petits volumes)."""
     global interrupt_flag
     interrupt_flag = False
-    working_proxies = []
+    use_store = incremental and mode in STORE_MODES
+    proxies, fresh_proxies = prepare_queue(proxies, use_store, ttl, prioritized)
+    if on_working is not None:
+        for proxy in fresh_proxies:
+            on_working(proxy)
     
     print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour interrompre la validation")
+    concurrency = make_concurrency(max_workers, timeout)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_proxy = {executor.submit(test_proxy, proxy): proxy for proxy in proxies}
-        
-        for future in concurrent.futures.as_completed(future_to_proxy):
-            if interrupt_flag:
-                print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
-                break
-                
-            proxy = future_to_proxy[future]
-            try:
-                if future.result():
-                    working_proxies.append(proxy)
-            except Exception:
-                continue
+    working_proxies = validate_proxies_async(
+        proxies,
+        timeout=timeout,
+        concurrency=concurrency,
+        on_result=stream_results(use_store, on_working, on_checked),
+        should_stop=lambda: interrupt_flag,
+        mode=mode,
+        test_url=get_target_url(),
+        judge_url=get_judge_url(),
+        geo_lookup=get_geo_lookup(),
+    )
+    report_concurrency(concurrency)
+    if use_store:
+        get_health_store().flush()
+    if interrupt_flag:
+        print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
     
-    return working_proxies
+    return fresh_proxies + working_proxies
 
 def save_proxies_to_file(filename: str, proxies: List[Proxy], format_type: str = "simple") -> None:
-    """Sauvegarde les proxys dans un fichier avec différents formats."""
-    if format_type == "simple":
-        with open(filename, "w", encoding="utf-8") as file:
-            for proxy in proxies:
-                file.write(f"{proxy.ip}:{proxy.port}\n")
-    elif format_type == "detailed":
-        with open(filename, "w", encoding="utf-8") as file:
-            file.write("IP:PORT:TYPE:COUNTRY:SPEED:LAST_CHECKED\n")
+    """Sauvegarde les proxys dans un fichier avec différents formats (écriture en flux)."""
+    with ResultWriter(filename, format_type) as writer:
+        if format_type == "simple" and isinstance(proxies, ProxyPool):
+            # Pool compact : écriture directe sans créer d'objets Proxy
+            writer.write_addresses(proxies.iter_addresses())
+        else:
             for proxy in proxies:
-                country = proxy.country or "Unknown"
-                speed = proxy.speed or "Unknown"
-                last_checked = proxy.last_checked.isoformat() if proxy.last_checked else "Unknown"
-                file.write(f"{proxy.ip}:{proxy.port}:{proxy.proxy_type}:{country}:{speed}:{last_checked}\n")
-    elif format_type == "json":
-        proxy_list = []
-        for proxy in proxies:
-            proxy_dict = {
-                "ip": proxy.ip,
-                "port": proxy.port,
-                "type": proxy.proxy_type,
-                "country": proxy.country,
-                "speed": proxy.speed,
-                "last_checked": proxy.last_checked.isoformat() if proxy.last_checked else None
-            }
-            proxy_list.append(proxy_dict)
-        
-        with open(filename, "w", encoding="utf-8") as file:
-            json.dump(proxy_list, file, indent=2, default=str)
+                writer.write(proxy)
+    
+    print(Fore.GREEN + f"[+] {writer.count} proxys enregistrés dans '{filename}' (format: {format_type})")
+
+def validate_to_file(proxies: List[Proxy], output_filename: str, format_type: str = "simple", batch: bool = False, resume: bool = False, **options) -> List[Proxy]:
+    """Valide les proxys en écrivant chaque proxy fonctionnel dans le fichier dès sa confirmation.
+
+    L'avancement est sauvegardé dans un point de reprise : avec resume=True, une validation
+    interrompue de la même liste reprend exactement là où elle s'était arrêtée.
+    """
+    validate = validate_proxies_batch if batch else validate_proxies_parallel
+    proxies = list(proxies)
+    checkpoint_path = output_filename + CHECKPOINT_SUFFIX
+    digest = fingerprint(proxies)
+    checkpoint = ValidationCheckpoint.load(checkpoint_path, digest, len(proxies)) if resume else None
+    if checkpoint is None:
+        if resume:
+            print(Fore.YELLOW + "[INFO] Point de reprise absent ou d'une autre liste, validation complète")
+        checkpoint = ValidationCheckpoint(checkpoint_path, digest, len(proxies))
+    else:
+        print(Fore.CYAN + f"[INFO] Reprise : {checkpoint.tested_count} proxys déjà testés, {len(checkpoint.working)} fonctionnels")
+    
+    # Position d'origine des proxys restant à tester
+    positions: Dict[int, int] = {}
+    pending: List[Proxy] = []
+    for index, proxy in enumerate(proxies):
+        if not checkpoint.is_tested(index):
+            positions[id(proxy)] = index
+            pending.append(proxy)
+
+    def on_checked(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+        index = positions.get(id(proxy))
+        if index is not None:
+            checkpoint.mark(index, ok, latency)
+
+    finished = False
+    with ResultWriter(output_filename, format_type) as writer:
+        resumed_proxies = []
+        for index, latency in checkpoint.iter_working():
+            proxy = proxies[index]
+            proxy.speed = proxy.speed or latency
+            writer.write(proxy)
+            resumed_proxies.append(proxy)
+        try:
+            working_proxies = resumed_proxies + validate(pending, on_working=writer.write, on_checked=on_checked, **options)
+            finished = not interrupt_flag
+        finally:
+            if finished:
+                checkpoint.remove()
+            else:
+                checkpoint.save()
+                print(Fore.YELLOW + f"[INFO] Progression sauvegardée dans '{checkpoint_path}' (reprise avec --resume)")
     
-    print(Fore.GREEN + f"[+] {len(proxies)} proxys enregistrés dans '{filename}' (format: {format_type})")
+    if writer.count:
+        print(Fore.GREEN + f"[+] {writer.count} proxys enregistrés dans '{output_filename}' (format: {format_type})")
+    else:
+        os.remove(output_filename)
+    return working_proxies
+
+def load_proxies_from_file(filename: str, proxy_type: str = "HTTP") -> ProxyPool:
+    """Charge un fichier de proxys dans un pool compact et affiche un résumé des rejets."""
+    stats = ParseStats()
+    pool = load_pool_from_file(filename, proxy_type, stats=stats)
+    print(Fore.CYAN + f"[*] {len(pool)} proxys chargés, {stats.rejected} lignes rejetées")
+    return pool
 
 def show_info() -> None:
     """Affiche les informations détaillées sur les URLs disponibles."""
@@ -444,6 +810,19 @@ def display_banner() -> None:
     faded_text = fade.purplepink(banner) 
     print(faded_text)
 
+def prompt_validation_mode() -> str:
+    """Demande le mode de validation à l'utilisateur."""
+    print(Fore.CYAN + "\nModes de validation :")
+    print("1. Handshake puis requête complète (recommandé)")
+    print("2. Requête complète uniquement")
+    print("3. Handshake protocolaire uniquement (le plus rapide)")
+    print("4. Tunnel HTTPS jusqu'à une cible TLS")
+    print("5. Requête vers l'URL cible (target_url)")
+    mode_choice = input(Fore.YELLOW + "Choisissez le mode (1-5) : ")
+    
+    mode_map = {"1": "staged", "2": "full", "3": "handshake", "4": "https", "5": "url"}
+    return mode_map.get(mode_choice, "staged")
+
 def prompt_to_continue() -> None:
     """Affiche un message et attend l'entrée de l'utilisateur pour continuer."""
     input(Fore.YELLOW + "\nAppuyez sur une touche pour revenir au menu...")
@@ -463,6 +842,10 @@ def main() -> None:
     CHOICE_TEST_SPEED = "10"
     CHOICE_FILTER_COUNTRY = "11"
     CHOICE_CREATE_ROTATOR = "12"
+    CHOICE_GATEWAY = "13"
+    CHOICE_COORDINATOR = "14"
+    CHOICE_WORKER = "15"
+    CHOICE_QUERY_API = "16"
 
     # Mapping des choix vers les types de proxy
     proxy_scrape_options = {
@@ -487,8 +870,12 @@ def main() -> None:
         print(Fore.GREEN + f"\n{CHOICE_TEST_SPEED} - Tester la vitesse des proxys")
         print(Fore.GREEN + f"{CHOICE_FILTER_COUNTRY} - Filtrer par pays")
         print(Fore.GREEN + f"{CHOICE_CREATE_ROTATOR} - Créer un rotateur de proxys")
+        print(Fore.GREEN + f"{CHOICE_GATEWAY} - Lancer une passerelle proxy rotative")
+        print(Fore.GREEN + f"\n{CHOICE_COORDINATOR} - Coordonner une validation distribuée")
+        print(Fore.GREEN + f"{CHOICE_WORKER} - Rejoindre une validation distribuée (ouvrier)")
+        print(Fore.GREEN + f"{CHOICE_QUERY_API} - Lancer l'API de requête du pool")
         
-        choix = input(Fore.YELLOW + f"Choisissez une option ({CHOICE_EXIT} à {CHOICE_CREATE_ROTATOR}) : ")
+        choix = input(Fore.YELLOW + f"Choisissez une option ({CHOICE_EXIT} à {CHOICE_QUERY_API}) : ")
 
         if choix == CHOICE_EXIT:
             clear_screen()
@@ -501,14 +888,17 @@ def main() -> None:
 
         elif choix == CHOICE_SCRAPE_ALL:
             print(Fore.GREEN + "[*] Scraping de tous les types de proxys en cours...")
-            all_proxies = []
+            all_proxies = ProxyPool()
             for proxy_type in PROXY_URLS.keys():
                 print(Fore.CYAN + f"[INFO] Scraping {proxy_type}...")
-                proxies = scrape_proxies(proxy_type, validate=False)
-                all_proxies.extend(proxies)
+                scrape_proxies_to_pool(proxy_type, all_proxies)
+            
+            # Doublons retirés par type, comme lors du scraping type par type
+            removed = all_proxies.dedupe(by_type=True)
+            print(Fore.CYAN + f"[INFO] {len(all_proxies)} proxys uniques trouvés ({removed} doublons retirés)")
             
             if all_proxies:
-                filename = f"all_proxies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+                filename = output_path(f"all_proxies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
                 save_proxies_to_file(filename, all_proxies)
             else:
                 print(Fore.RED + "Aucun proxy trouvé.")
@@ -517,28 +907,22 @@ def main() -> None:
         elif choix == CHOICE_VALIDATE_PROXIES:
             filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys à valider : ")
             try:
-                with open(filename, 'r') as file:
-                    proxy_lines = file.readlines()
-                
-                proxies = []
-                for line in proxy_lines:
-                    proxy_info = validate_proxy_format(line.strip())
-                    if proxy_info:
-                        ip, port = proxy_info
-                        proxies.append(Proxy(ip=ip, port=port, proxy_type="HTTP"))
+                # Pool compact : parcouru une seule fois par la validation
+                proxies = load_proxies_from_file(filename)
                 
                 if proxies:
+                    mode = prompt_validation_mode()
                     print(Fore.GREEN + f"[*] Validation de {len(proxies)} proxys...")
-                    if len(proxies) > 1000:
+                    batch = len(proxies) > 1000
+                    options = {"mode": mode}
+                    if batch:
                         print(Fore.YELLOW + "[INFO] Gros volume détecté, utilisation de la validation par batch...")
-                        working_proxies = validate_proxies_batch(proxies)
-                    else:
-                        working_proxies = validate_proxies_parallel(proxies)
+                        options["processes"] = prompt_processes()
+                    # Chaque proxy fonctionnel est écrit dès sa confirmation
+                    output_filename = output_path(f"validated_{os.path.basename(filename)}")
+                    working_proxies = validate_to_file(proxies, output_filename, batch=batch, resume=ask_resume(output_filename), **options)
                     
-                    if working_proxies:
-                        output_filename = f"validated_{filename}"
-                        save_proxies_to_file(output_filename, working_proxies)
-                    else:
+                    if not working_proxies:
                         print(Fore.RED + "Aucun proxy fonctionnel trouvé.")
                 else:
                     print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
@@ -552,25 +936,16 @@ def main() -> None:
             print(Fore.GREEN + "[*] Mode validation rapide activé...")
             filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys à valider : ")
             try:
-                with open(filename, 'r') as file:
-                    proxy_lines = file.readlines()
-                
-                proxies = []
-                for line in proxy_lines:
-                    proxy_info = validate_proxy_format(line.strip())
-                    if proxy_info:
-                        ip, port = proxy_info
-                        proxies.append(Proxy(ip=ip, port=port, proxy_type="HTTP"))
+                proxies = load_proxies_from_file(filename)
                 
                 if proxies:
+                    mode = prompt_validation_mode()
                     print(Fore.GREEN + f"[*] Validation rapide de {len(proxies)} proxys (timeout: 3s)...")
                     # Validation avec timeout très court
-                    working_proxies = validate_proxies_batch(proxies, batch_size=200, max_workers=30)
+                    output_filename = output_path(f"fast_validated_{os.path.basename(filename)}")
+                    working_proxies = validate_to_file(proxies, output_filename, batch=True, resume=ask_resume(output_filename), timeout=3, mode=mode, processes=prompt_processes())
                     
-                    if working_proxies:
-                        output_filename = f"fast_validated_{filename}"
-                        save_proxies_to_file(output_filename, working_proxies)
-                    else:
+                    if not working_proxies:
                         print(Fore.RED + "Aucun proxy fonctionnel trouvé.")
                 else:
                     print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
@@ -583,28 +958,20 @@ def main() -> None:
         elif choix == CHOICE_TEST_SPEED:
             filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys à tester : ")
             try:
-                with open(filename, 'r') as file:
-                    proxy_lines = file.readlines()
-                
-                proxies = []
-                for line in proxy_lines:
-                    proxy_info = validate_proxy_format(line.strip())
-                    if proxy_info:
-                        ip, port = proxy_info
-                        proxies.append(Proxy(ip=ip, port=port, proxy_type="HTTP"))
+                proxies = list(load_proxies_from_file(filename))
                 
                 if proxies:
                     print(Fore.GREEN + f"[*] Test de vitesse pour {len(proxies)} proxys...")
                     fast_proxies = test_proxies_speed(proxies)
                     
                     if fast_proxies:
-                        output_filename = f"speed_tested_{filename}"
+                        output_filename = output_path(f"speed_tested_{os.path.basename(filename)}")
                         save_proxies_to_file(output_filename, fast_proxies, "detailed")
                         
                         # Afficher les 10 plus rapides
                         print(Fore.CYAN + "\n[INFO] Top 10 des proxys les plus rapides :")
                         for i, proxy in enumerate(fast_proxies[:10], 1):
-                            print(Fore.GREEN + f"  {i}. {proxy.ip}:{proxy.port} - {proxy.speed:.2f}s")
+                            print(Fore.GREEN + f"  {i}. {proxy.ip}:{proxy.port} - p50 {proxy.speed:.2f}s / p95 {proxy.speed_p95:.2f}s / gigue {proxy.jitter:.3f}s - {proxy.anonymity or '?'} - {proxy.country or '?'}")
                     else:
                         print(Fore.RED + "Aucun proxy testé avec succès.")
                 else:
@@ -621,22 +988,16 @@ def main() -> None:
             countries = [c.strip().upper() for c in countries]
             
             try:
-                with open(filename, 'r') as file:
-                    proxy_lines = file.readlines()
-                
-                proxies = []
-                for line in proxy_lines:
-                    proxy_info = validate_proxy_format(line.strip())
-                    if proxy_info:
-                        ip, port = proxy_info
-                        proxies.append(Proxy(ip=ip, port=port, proxy_type="HTTP"))
+                proxies = list(load_proxies_from_file(filename))
                 
                 if proxies:
+                    verify_choice = input(Fore.YELLOW + "Vérifier le pays de sortie via chaque proxy ? (o/n) : ").lower()
+                    verify_exit = verify_choice in ['o', 'oui', 'y', 'yes']
                     print(Fore.GREEN + f"[*] Filtrage par pays pour {len(proxies)} proxys...")
-                    filtered_proxies = filter_proxies_by_country(proxies, countries)
+                    filtered_proxies = filter_proxies_by_country(proxies, countries, verify_exit=verify_exit)
                     
                     if filtered_proxies:
-                        output_filename = f"filtered_{filename}"
+                        output_filename = output_path(f"filtered_{os.path.basename(filename)}")
                         save_proxies_to_file(output_filename, filtered_proxies, "detailed")
                     else:
                         print(Fore.RED + "Aucun proxy trouvé pour les pays spécifiés.")
@@ -651,15 +1012,7 @@ def main() -> None:
         elif choix == CHOICE_CREATE_ROTATOR:
             filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys : ")
             try:
-                with open(filename, 'r') as file:
-                    proxy_lines = file.readlines()
-                
-                proxies = []
-                for line in proxy_lines:
-                    proxy_info = validate_proxy_format(line.strip())
-                    if proxy_info:
-                        ip, port = proxy_info
-                        proxies.append(Proxy(ip=ip, port=port, proxy_type="HTTP"))
+                proxies = list(load_proxies_from_file(filename))
                 
                 if proxies:
                     print(Fore.GREEN + f"[*] Création d'un rotateur pour {len(proxies)} proxys...")
@@ -681,6 +1034,75 @@ def main() -> None:
                 print(Fore.RED + f"Erreur lors de la création du rotateur : {e}")
             prompt_to_continue()
 
+        elif choix == CHOICE_GATEWAY:
+            filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys validés : ")
+            proxy_type = input(Fore.YELLOW + "Type des proxys (HTTP/HTTPS/SOCKS4/SOCKS5) [HTTP] : ").strip().upper() or "HTTP"
+            port_input = input(Fore.YELLOW + f"Port d'écoute [{DEFAULT_GATEWAY_PORT}] : ").strip()
+            try:
+                if proxy_type not in PROXY_TYPES:
+                    raise ValueError(f"type de proxy inconnu '{proxy_type}'")
+                port = int(port_input) if port_input else DEFAULT_GATEWAY_PORT
+                proxies = list(load_proxies_from_file(filename, proxy_type))
+                
+                if proxies:
+                    start_gateway(proxies, port=port)
+                else:
+                    print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+            except FileNotFoundError:
+                print(Fore.RED + f"Fichier '{filename}' non trouvé.")
+            except Exception as e:
+                print(Fore.RED + f"Erreur de la passerelle : {e}")
+            prompt_to_continue()
+
+        elif choix == CHOICE_COORDINATOR:
+            filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys à valider : ")
+            host = input(Fore.YELLOW + f"Adresse d'écoute (0.0.0.0 pour d'autres machines) [{DEFAULT_COORDINATOR_HOST}] : ").strip() or DEFAULT_COORDINATOR_HOST
+            port_input = input(Fore.YELLOW + f"Port d'écoute [{DEFAULT_COORDINATOR_PORT}] : ").strip()
+            token = input(Fore.YELLOW + "Jeton partagé avec les ouvriers (vide pour aucun) : ").strip() or None
+            try:
+                port = int(port_input) if port_input else DEFAULT_COORDINATOR_PORT
+                proxies = load_proxies_from_file(filename)
+                
+                if proxies:
+                    start_coordinator(proxies, output_path(f"distributed_{os.path.basename(filename)}"), host, port, token)
+                else:
+                    print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+            except FileNotFoundError:
+                print(Fore.RED + f"Fichier '{filename}' non trouvé.")
+            except Exception as e:
+                print(Fore.RED + f"Erreur du coordinateur : {e}")
+            prompt_to_continue()
+
+        elif choix == CHOICE_WORKER:
+            coordinator_url = input(Fore.YELLOW + f"URL du coordinateur [http://{DEFAULT_COORDINATOR_HOST}:{DEFAULT_COORDINATOR_PORT}] : ").strip()
+            token = input(Fore.YELLOW + "Jeton partagé (vide pour aucun) : ").strip() or None
+            mode = prompt_validation_mode()
+            try:
+                start_worker(coordinator_url or f"http://{DEFAULT_COORDINATOR_HOST}:{DEFAULT_COORDINATOR_PORT}", token, mode)
+            except Exception as e:
+                print(Fore.RED + f"Erreur de l'ouvrier : {e}")
+            prompt_to_continue()
+
+        elif choix == CHOICE_QUERY_API:
+            filename = input(Fore.YELLOW + "Entrez le nom du fichier de proxys validés (JSON/JSONL conseillé) : ")
+            port_input = input(Fore.YELLOW + f"Port d'écoute [{DEFAULT_QUERY_PORT}] : ").strip()
+            try:
+                port = int(port_input) if port_input else DEFAULT_QUERY_PORT
+                proxy_type = "HTTP"
+                if not filename.endswith((".json", ".jsonl")):
+                    proxy_type = input(Fore.YELLOW + "Type des proxys (HTTP/HTTPS/SOCKS4/SOCKS5) [HTTP] : ").strip().upper() or "HTTP"
+                proxies = load_validated_proxies(filename, proxy_type)
+                
+                if proxies:
+                    start_query_api(proxies, port=port)
+                else:
+                    print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+            except FileNotFoundError:
+                print(Fore.RED + f"Fichier '{filename}' non trouvé.")
+            except Exception as e:
+                print(Fore.RED + f"Erreur de l'API : {e}")
+            prompt_to_continue()
+
         elif choix in proxy_scrape_options:
             proxy_type = proxy_scrape_options[choix]
             print(Fore.GREEN + f"[*] Scraping des proxys {proxy_type} en cours...")
@@ -688,8 +1110,9 @@ def main() -> None:
             # Demander si l'utilisateur veut valider les proxys
             validate_choice = input(Fore.YELLOW + "Voulez-vous valider les proxys ? (o/n) : ").lower()
             validate = validate_choice in ['o', 'oui', 'y', 'yes']
+            mode = prompt_validation_mode() if validate else "staged"
             
-            scraped_proxies = scrape_proxies(proxy_type, validate=validate)
+            scraped_proxies = scrape_proxies(proxy_type, validate=validate, mode=mode)
 
             if scraped_proxies:
                 # Demander le format de sauvegarde
@@ -697,23 +1120,263 @@ def main() -> None:
                 print("1. Simple (IP:PORT)")
                 print("2. Détaillé (avec métadonnées)")
                 print("3. JSON")
-                format_choice = input(Fore.YELLOW + "Choisissez le format (1-3) : ")
+                print("4. JSONL (un objet JSON par ligne)")
+                format_choice = input(Fore.YELLOW + "Choisissez le format (1-4) : ")
                 
-                format_map = {"1": "simple", "2": "detailed", "3": "json"}
+                format_map = {"1": "simple", "2": "detailed", "3": "json", "4": "jsonl"}
                 format_type = format_map.get(format_choice, "simple")
                 
                 filename = f"{proxy_type.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                if format_type == "json":
-                    filename = filename.replace(".txt", ".json")
+                if format_type in ("json", "jsonl"):
+                    filename = filename.replace(".txt", f".{format_type}")
                 
-                save_proxies_to_file(filename, scraped_proxies, format_type)
+                save_proxies_to_file(output_path(filename), scraped_proxies, format_type)
             else:
                 print(Fore.RED + f"Aucun proxy {proxy_type} trouvé.")
             prompt_to_continue()
 
         else:
-            print(Fore.RED + f"Choix invalide. Veuillez entrer un chiffre entre {CHOICE_EXIT} et {CHOICE_CREATE_ROTATOR}.")
+            print(Fore.RED + f"Choix invalide. Veuillez entrer un chiffre entre {CHOICE_EXIT} et {CHOICE_QUERY_API}.")
             prompt_to_continue()
 
+def run_daemon(proxy_types: List[str], interval: float, prefix: str = "daemon", mode: str = "staged",
+               host: str = DEFAULT_GATEWAY_HOST, port: int = DEFAULT_GATEWAY_PORT, gateway: bool = True,
+               api_port: Optional[int] = DEFAULT_QUERY_PORT) -> None:
+    """Scrape et revalide en boucle ; la passerelle et l'API de requête servent toujours le dernier pool validé."""
+    global interrupt_flag
+    interrupt_flag = False
+    signal.signal(signal.SIGTERM, signal_handler)
+    logger = logging.getLogger("scproxy")
+    
+    # Un fichier JSONL par type (type, pays et latence conservés), réécrit à chaque cycle sans sauvegarde
+    directory = SETTINGS.get("output_directory") or "."
+    os.makedirs(directory, exist_ok=True)
+    outputs = {proxy_type: os.path.join(directory, f"{prefix}_{proxy_type.lower()}.jsonl") for proxy_type in proxy_types}
+    working: Dict[str, List[Proxy]] = {}
+    for proxy_type, filename in outputs.items():
+        if os.path.exists(filename):
+            working[proxy_type] = load_results(filename)
+            logger.info("%d proxys %s repris depuis %s", len(working[proxy_type]), proxy_type, filename)
+    
+    def current_pool() -> List[Proxy]:
+        return [proxy for proxies in working.values() for proxy in proxies]
+    
+    proxy_gateway = None
+    gateway_thread = None
+    if gateway:
+        # Chaque tunnel servi alimente l'historique de santé, comme avec la commande serve
+        proxy_gateway = ProxyGateway(ProxyRotator(current_pool()), host, port, on_result=record_check)
+        # Boucle asyncio dédiée : la passerelle continue de servir pendant les validations
+        gateway_thread = threading.Thread(target=lambda: asyncio.run(proxy_gateway.serve(lambda: interrupt_flag)), daemon=True)
+        gateway_thread.start()
+        logger.info("Passerelle à l'écoute sur %s:%d", host, port)
+    query_service = None
+    if api_port:
+        query_service = PoolQueryService(current_pool())
+        query_server = start_query_server(query_service, host, api_port)
+        logger.info("API de requête à l'écoute sur http://%s:%d", host, api_port)
+    
+    cycle = 0
+    while not interrupt_flag:
+        cycle += 1
+        started = time.monotonic()
+        for proxy_type in proxy_types:
+            scraped = scrape_proxies(proxy_type)
+            if interrupt_flag:
+                break
+            if scraped:
+                # Les proxys vérifiés depuis moins d'un intervalle ne sont pas retestés
+                working[proxy_type] = validate_to_file(scraped, outputs[proxy_type], "jsonl", batch=True, mode=mode, ttl=interval)
+            if interrupt_flag:
+                break
+            logger.info("Cycle %d : %d proxys %s fonctionnels sur %d", cycle, len(working.get(proxy_type, [])), proxy_type, len(scraped))
+            if query_service is not None:
+                # Nouvel instantané indexé publié dès chaque type revalidé ; les requêtes en cours lisent l'ancien
+                query_service.update(current_pool())
+        if proxy_gateway is not None:
+            # Remplacement atomique : les connexions en cours gardent l'ancien rotateur
+            proxy_gateway.rotator = ProxyRotator(current_pool())
+            logger.info("Passerelle mise à jour : %d proxys", len(proxy_gateway.rotator))
+        get_health_store().flush()
+        
+        deadline = started + interval
+        while not interrupt_flag and time.monotonic() < deadline:
+            time.sleep(1)
+    if query_service is not None:
+        query_server.shutdown()
+    if gateway_thread is not None:
+        # Les derniers résultats de la passerelle sont écrits avant de rendre la main
+        gateway_thread.join(timeout=5)
+        get_health_store().flush()
+    logger.info("Arrêt du daemon")
+
+def build_parser() -> argparse.ArgumentParser:
+    """Analyseur de la ligne de commande (sans commande : menu interactif)."""
+    proxy_types = list(PROXY_URLS.keys())
+    modes = list(VALIDATION_MODES)
+    parser = argparse.ArgumentParser(description="Scraper et validateur de proxys. Sans commande, lance le menu interactif.")
+    parser.add_argument("--config", help=f"fichier de configuration (défaut : {CONFIG_PATH})")
+    parser.add_argument("--resume", action="store_true", help="reprend les validations interrompues sans le demander")
+    parser.add_argument("--target-url", help="URL cible des modes https et url (défaut : settings.target_url, sinon le juge)")
+    parser.add_argument("--metrics-port", type=int, help="expose les métriques (texte Prometheus sur /metrics, JSON sur /metrics.json)")
+    parser.add_argument("--metrics-host", default=DEFAULT_METRICS_HOST)
+    parser.add_argument("--metrics-json", help="fichier JSON des métriques, réécrit périodiquement")
+    parser.add_argument("--metrics-interval", type=float, default=DEFAULT_DUMP_INTERVAL, help="secondes entre deux écritures du fichier JSON")
+    commands = parser.add_subparsers(dest="command")
+    
+    scrape = commands.add_parser("scrape", help="scrape les sources d'un type (ou de tous)")
+    scrape.add_argument("--type", default="ALL", type=str.upper, choices=proxy_types + ["ALL"])
+    scrape.add_argument("--validate", action="store_true", help="ne garde que les proxys fonctionnels")
+    scrape.add_argument("--mode", default="staged", choices=modes)
+    scrape.add_argument("--format", default="simple", choices=OUTPUT_FORMATS)
+    scrape.add_argument("-o", "--output", help="fichier de sortie (un seul type)")
+    scrape.add_argument("--all-sources", action="store_true", help="valide toutes les sources, même peu fiables")
+    
+    sources = commands.add_parser("sources", help="statistiques de qualité des sources")
+    sources.add_argument("--type", default="ALL", type=str.upper, choices=proxy_types + ["ALL"])
+    
+    validate = commands.add_parser("validate", help="valide un fichier de proxys")
+    validate.add_argument("file")
+    validate.add_argument("--type", default="HTTP", type=str.upper, choices=proxy_types)
+    validate.add_argument("--mode", default="staged", choices=modes)
+    validate.add_argument("--timeout", type=float, default=5)
+    validate.add_argument("--processes", type=int, default=1, help="processus de validation (batch)")
+    validate.add_argument("--max-workers", type=int, help="concurrence fixe (adaptative par défaut)")
+    validate.add_argument("--resume", action="store_true", default=argparse.SUPPRESS)
+    validate.add_argument("--format", default="simple", choices=OUTPUT_FORMATS)
+    validate.add_argument("-o", "--output")
+    
+    speed = commands.add_parser("speed", help="mesure la latence des proxys d'un fichier")
+    speed.add_argument("file")
+    speed.add_argument("--type", default="HTTP", type=str.upper, choices=proxy_types)
+    speed.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    speed.add_argument("--timeout", type=float, default=10)
+    speed.add_argument("-o", "--output")
+    
+    geo = commands.add_parser("geo", help="filtre les proxys d'un fichier par pays")
+    geo.add_argument("file")
+    geo.add_argument("--countries", required=True, help="codes pays séparés par des virgules (ex: US,FR,DE)")
+    geo.add_argument("--type", default="HTTP", type=str.upper, choices=proxy_types)
+    geo.add_argument("--verify-exit", action="store_true", help="vérifie le pays de sortie via chaque proxy")
+    geo.add_argument("-o", "--output")
+    
+    serve = commands.add_parser("serve", help="lance la passerelle rotative sur un fichier de proxys validés")
+    serve.add_argument("file")
+    serve.add_argument("--type", default="HTTP", type=str.upper, choices=proxy_types)
+    serve.add_argument("--host", default=DEFAULT_GATEWAY_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT)
+    
+    daemon = commands.add_parser("daemon", help="scrape et revalide périodiquement derrière la passerelle")
+    daemon.add_argument("--interval", type=float, default=3600, help="secondes entre deux cycles")
+    daemon.add_argument("--types", default=",".join(proxy_types), help="types séparés par des virgules")
+    daemon.add_argument("--mode", default="staged", choices=modes)
+    daemon.add_argument("--host", default=DEFAULT_GATEWAY_HOST)
+    daemon.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT)
+    daemon.add_argument("--no-gateway", action="store_true", help="maintient les fichiers sans passerelle")
+    daemon.add_argument("--api-port", type=int, default=DEFAULT_QUERY_PORT, help="port de l'API de requête")
+    daemon.add_argument("--no-api", action="store_true", help="désactive l'API de requête")
+    daemon.add_argument("-o", "--prefix", default="daemon", help="préfixe des fichiers de sortie par type")
+    
+    api = commands.add_parser("api", help="API de requête JSON sur un fichier de proxys validés")
+    api.add_argument("file", help="sortie JSON/JSONL (type, pays et latence conservés) ou liste IP:PORT")
+    api.add_argument("--type", default="HTTP", type=str.upper, choices=proxy_types, help="type d'une liste IP:PORT")
+    api.add_argument("--host", default=DEFAULT_QUERY_HOST)
+    api.add_argument("--port", type=int, default=DEFAULT_QUERY_PORT)
+    return parser
+
+def cli(argv: List[str]) -> int:
+    """Point d'entrée en ligne de commande ; retourne le code de sortie."""
+    global resume_requested
+    args = build_parser().parse_args(argv)
+    if args.config and not apply_config(args.config):
+        print(Fore.RED + f"Configuration '{args.config}' illisible.")
+        return 1
+    resume_requested = args.resume
+    if args.target_url:
+        SETTINGS["target_url"] = args.target_url
+    metrics_server = start_metrics_server(args.metrics_host, args.metrics_port) if args.metrics_port else None
+    metrics_dump = start_json_dump(args.metrics_json, args.metrics_interval) if args.metrics_json else None
+    
+    try:
+        if args.command is None:
+            main()
+            return 0
+        
+        if args.command == "scrape":
+            if args.all_sources:
+                SETTINGS["adaptive_sources"] = False
+            proxy_types = list(PROXY_URLS.keys()) if args.type == "ALL" else [args.type]
+            extension = args.format if args.format in ("json", "jsonl") else "txt"
+            found = 0
+            for proxy_type in proxy_types:
+                proxies = scrape_proxies(proxy_type, validate=args.validate, mode=args.mode)
+                if proxies:
+                    filename = args.output if args.output and len(proxy_types) == 1 else output_path(f"{proxy_type.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}")
+                    save_proxies_to_file(filename, proxies, args.format)
+                    found += len(proxies)
+            return 0 if found else 1
+        
+        if args.command == "sources":
+            show_source_stats(list(PROXY_URLS.keys()) if args.type == "ALL" else [args.type])
+            return 0
+        
+        if args.command == "serve":
+            proxies = load_validated_proxies(args.file, args.type)
+            if not proxies:
+                print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+                return 1
+            start_gateway(proxies, host=args.host, port=args.port)
+            return 0
+        
+        if args.command == "daemon":
+            logging.basicConfig(level=str(SETTINGS.get("log_level", "INFO")).upper(), format="%(asctime)s %(levelname)s %(message)s")
+            proxy_types = [proxy_type.strip().upper() for proxy_type in args.types.split(",") if proxy_type.strip()]
+            unknown = [proxy_type for proxy_type in proxy_types if proxy_type not in PROXY_URLS]
+            if unknown or not proxy_types:
+                print(Fore.RED + f"Types de proxy inconnus : {', '.join(unknown) or args.types}")
+                return 1
+            run_daemon(proxy_types, args.interval, args.prefix, args.mode, args.host, args.port,
+                       gateway=not args.no_gateway, api_port=None if args.no_api else args.api_port)
+            return 0
+        
+        if args.command == "api":
+            proxies = load_validated_proxies(args.file, args.type)
+            if not proxies:
+                print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+                return 1
+            start_query_api(proxies, host=args.host, port=args.port)
+            return 0
+        
+        proxies = load_proxies_from_file(args.file, args.type)
+        if not proxies:
+            print(Fore.RED + "Aucun proxy valide trouvé dans le fichier.")
+            return 1
+        if args.command == "validate":
+            output_filename = args.output or output_path(f"validated_{os.path.basename(args.file)}")
+            batch = len(proxies) > 1000 or args.processes > 1
+            options = {"mode": args.mode, "timeout": args.timeout, "max_workers": args.max_workers}
+            if batch:
+                options["processes"] = args.processes
+            working_proxies = validate_to_file(proxies, output_filename, args.format, batch=batch, resume=args.resume, **options)
+        elif args.command == "speed":
+            working_proxies = test_proxies_speed(list(proxies), timeout=args.timeout, samples=args.samples)
+            if working_proxies:
+                save_proxies_to_file(args.output or output_path(f"speed_tested_{os.path.basename(args.file)}"), working_proxies, "detailed")
+        else:
+            countries = [country.strip().upper() for country in args.countries.split(",") if country.strip()]
+            working_proxies = filter_proxies_by_country(list(proxies), countries, verify_exit=args.verify_exit)
+            if working_proxies:
+                save_proxies_to_file(args.output or output_path(f"filtered_{os.path.basename(args.file)}"), working_proxies, "detailed")
+        return 0 if working_proxies else 1
+    except FileNotFoundError as e:
+        print(Fore.RED + f"Fichier '{e.filename}' non trouvé.")
+        return 1
+    finally:
+        if metrics_dump is not None:
+            metrics_dump()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+
 if __name__ == "__main__":
-    main()
+    sys.exit(cli(sys.argv[1:]))
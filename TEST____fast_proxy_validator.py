@@ -4,158 +4,90 @@ Script de validation rapide pour gros volumes de proxys
 Optimisé pour traiter des dizaines de milliers de proxys rapidement
 """
 
-import requests
 import os
 import time
-import concurrent.futures
-import json
-import re
-import signal
-import sys
 from datetime import datetime
 from colorama import Fore, init
-from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+from typing import Callable, List, Optional
+# Moteur, profils de validation et gestionnaire de Ctrl+C partagés avec ScProxy
+import ScProxy
+from ScProxy import PROXY_URLS, make_concurrency, report_concurrency, run_batch_validation
+from proxy_engine import VALIDATION_MODES
+from proxy_pool import Proxy
+from result_writer import ResultWriter
+from sharded_validation import DEFAULT_PROCESSES
+from metrics import ProgressReporter
 
 init(autoreset=True)
 
-# Variable globale pour contrôler l'interruption
-interrupt_flag = False
-
-def signal_handler(signum, frame):
-    """Gestionnaire de signal pour Ctrl+C."""
-    global interrupt_flag
-    print(Fore.YELLOW + "\n[INFO] Interruption demandée... Attendez la fin du batch en cours...")
-    interrupt_flag = True
-
-# Enregistrer le gestionnaire de signal
-signal.signal(signal.SIGINT, signal_handler)
-
-@dataclass
-class FastProxy:
-    """Proxy simplifié pour validation rapide."""
-    ip: str
-    port: str
-    proxy_type: str = "HTTP"
-
-def validate_proxy_format(proxy_str: str) -> Optional[Tuple[str, str]]:
-    """Validation rapide du format proxy."""
-    match = re.match(r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{1,5})', proxy_str.strip())
-    if match:
-        ip, port = match.group(1), match.group(2)
-        try:
-            port_num = int(port)
-            if 1 <= port_num <= 65535:
-                return ip, port
-        except:
-            pass
-    return None
-
-def test_proxy_fast(proxy: FastProxy, timeout: int = 2) -> bool:
-    """Test ultra-rapide d'un proxy."""
-    global interrupt_flag
-    if interrupt_flag:
-        return False
-        
-    try:
-        proxy_dict = {
-            'http': f'http://{proxy.ip}:{proxy.port}',
-            'https': f'http://{proxy.ip}:{proxy.port}'
-        }
-        
-        response = requests.get(
-            'http://httpbin.org/ip',
-            proxies=proxy_dict,
-            timeout=timeout
-        )
-        return response.status_code == 200
-    except:
-        return False
-
-def load_proxies_from_file(filename: str) -> List[FastProxy]:
-    """Charge les proxys depuis un fichier."""
-    proxies = []
+def load_proxies_from_file(filename: str, proxy_type: str = "HTTP") -> List[Proxy]:
+    """Charge les proxys depuis un fichier (chargement en masse, rejets comptés)."""
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                
-                proxy_info = validate_proxy_format(line)
-                if proxy_info:
-                    ip, port = proxy_info
-                    proxies.append(FastProxy(ip=ip, port=port))
-                else:
-                    print(Fore.YELLOW + f"[WARN] Ligne {line_num} ignorée: {line}")
-        
-        return proxies
+        return list(ScProxy.load_proxies_from_file(filename, proxy_type))
     except Exception as e:
         print(Fore.RED + f"Erreur lors du chargement: {e}")
         return []
 
-def validate_proxies_ultra_fast(proxies: List[FastProxy], batch_size: int = 500, max_workers: int = 50) -> List[FastProxy]:
-    """Validation ultra-rapide par batch."""
-    global interrupt_flag
-    interrupt_flag = False
-    working_proxies = []
+def prompt_proxy_type() -> str:
+    """Demande le type des proxys du fichier (les listes IP:PORT ne le portent pas)."""
+    proxy_types = list(PROXY_URLS.keys())
+    proxy_type = input(Fore.YELLOW + f"Type de proxy ({'/'.join(proxy_types)}, défaut: HTTP): ").strip().upper() or "HTTP"
+    if proxy_type not in proxy_types:
+        print(Fore.RED + "Type inconnu, utilisation de HTTP")
+        return "HTTP"
+    return proxy_type
+
+def validate_proxies_ultra_fast(proxies: List[Proxy], batch_size: int = 5000, max_workers: Optional[int] = None, timeout: int = 2, on_working: Optional[Callable[[Proxy], None]] = None, processes: int = 1, mode: str = "full") -> List[Proxy]:
+    """Validation ultra-rapide en fenêtre glissante, progression affichée par batch.
+
+    Sans max_workers, le nombre de tests simultanés s'ajuste tout seul (AIMD).
+    Avec processes > 1, les proxys sont répartis sur plusieurs processus.
+    Le profil de validation (mode) est celui du moteur commun à ScProxy.
+    """
+    ScProxy.interrupt_flag = False
     total_proxies = len(proxies)
+    total_batches = (total_proxies + batch_size - 1) // batch_size
     
     print(Fore.CYAN + f"[INFO] Validation ultra-rapide de {total_proxies:,} proxys")
-    print(Fore.CYAN + f"[INFO] Batch size: {batch_size}, Workers: {max_workers}")
+    concurrency = make_concurrency(max_workers, timeout)
+    print(Fore.CYAN + f"[INFO] Batch size: {batch_size}, Workers: {max_workers or 'auto'}, Processus: {processes}, Mode: {mode}")
     print(Fore.YELLOW + "[INFO] Appuyez sur Ctrl+C pour interrompre la validation")
     
     start_time = time.time()
     
-    for i in range(0, total_proxies, batch_size):
-        if interrupt_flag:
-            print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
-            break
-            
-        batch = proxies[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (total_proxies + batch_size - 1) // batch_size
-        
-        print(Fore.YELLOW + f"\n[INFO] Batch {batch_num}/{total_batches} ({len(batch):,} proxys)...")
-        
-        batch_start = time.time()
-        
-        # Validation du batch en parallèle
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_proxy = {executor.submit(test_proxy_fast, proxy): proxy for proxy in batch}
-            
-            completed = 0
-            batch_working = 0
-            
-            for future in concurrent.futures.as_completed(future_to_proxy):
-                if interrupt_flag:
-                    break
-                    
-                proxy = future_to_proxy[future]
-                completed += 1
-                
-                try:
-                    if future.result():
-                        working_proxies.append(proxy)
-                        batch_working += 1
-                except Exception:
-                    continue
-                
-                # Affichage de progression tous les 50 proxys
-                if completed % 50 == 0 or completed == len(batch):
-                    progress = (completed / len(batch)) * 100
-                    elapsed = time.time() - batch_start
-                    rate = completed / elapsed if elapsed > 0 else 0
-                    print(Fore.GREEN + f"  {progress:.1f}% - {batch_working} fonctionnels - {rate:.0f} proxys/s")
-        
-        if interrupt_flag:
-            break
-            
-        batch_time = time.time() - batch_start
-        print(Fore.CYAN + f"  Batch terminé en {batch_time:.1f}s - {batch_working} fonctionnels")
-        
-        # Pause très courte entre les batchs
-        time.sleep(0.1)
+    # Fenêtre glissante : le proxy suivant démarre dès qu'un slot se libère
+    reported_batches = 0
+    reported_working = 0
+    batch_start = time.time()
+
+    def render(progress: ProgressReporter) -> None:
+        # Rendu hors du chemin chaud : une ligne par seconde, plus un résumé par batch franchi
+        nonlocal reported_batches, reported_working, batch_start
+        completed, working_count = progress.completed, progress.working
+        percent = (completed / total_proxies) * 100 if total_proxies else 100.0
+        print(Fore.GREEN + f"  {percent:.1f}% - {working_count} fonctionnels - {progress.rate:.0f} proxys/s")
+        batch_num = (completed + batch_size - 1) // batch_size if completed == total_proxies else completed // batch_size
+        if batch_num > reported_batches:
+            batch_time = time.time() - batch_start
+            print(Fore.CYAN + f"  Batch {batch_num}/{total_batches} terminé en {batch_time:.1f}s - {working_count - reported_working} fonctionnels")
+            reported_batches = batch_num
+            reported_working = working_count
+            batch_start = time.time()
+
+    progress = ProgressReporter(total_proxies, render)
+
+    def on_result(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+        progress.record(ok)
+        if ok and on_working is not None:
+            on_working(proxy)
+
+    with progress:
+        working_proxies = run_batch_validation(proxies, processes, timeout, max_workers, concurrency, on_result, mode)
+    if processes == 1:
+        report_concurrency(concurrency)
+    
+    if ScProxy.interrupt_flag:
+        print(Fore.YELLOW + "\n[INFO] Validation interrompue par l'utilisateur")
     
     total_time = time.time() - start_time
     print(Fore.GREEN + f"\n[INFO] Validation terminée en {total_time:.1f}s")
@@ -165,16 +97,20 @@ def validate_proxies_ultra_fast(proxies: List[FastProxy], batch_size: int = 500,
     
     return working_proxies
 
-def save_proxies_fast(filename: str, proxies: List[FastProxy]) -> None:
-    """Sauvegarde rapide des proxys."""
-    try:
-        with open(filename, 'w', encoding='utf-8') as file:
-            for proxy in proxies:
-                file.write(f"{proxy.ip}:{proxy.port}\n")
-        
-        print(Fore.GREEN + f"[+] {len(proxies):,} proxys sauvegardés dans '{filename}'")
-    except Exception as e:
-        print(Fore.RED + f"Erreur lors de la sauvegarde: {e}")
+def validate_to_file(proxies: List[Proxy], filename: str, on_working: Optional[Callable[[Proxy], None]] = None, **options) -> List[Proxy]:
+    """Valide les proxys en écrivant chaque proxy fonctionnel dès sa confirmation."""
+    with ResultWriter(filename) as writer:
+        def write(proxy: Proxy) -> None:
+            writer.write(proxy)
+            if on_working is not None:
+                on_working(proxy)
+        working_proxies = validate_proxies_ultra_fast(proxies, on_working=write, **options)
+    
+    if writer.count:
+        print(Fore.GREEN + f"[+] {writer.count:,} proxys sauvegardés dans '{filename}'")
+    else:
+        os.remove(filename)
+    return working_proxies
 
 def main():
     """Interface principale pour validation rapide."""
@@ -196,9 +132,10 @@ def main():
             if not os.path.exists(filename):
                 print(Fore.RED + f"Fichier '{filename}' non trouvé!")
                 continue
+            proxy_type = prompt_proxy_type()
             
             print(Fore.GREEN + f"[*] Chargement du fichier '{filename}'...")
-            proxies = load_proxies_from_file(filename)
+            proxies = load_proxies_from_file(filename, proxy_type)
             
             if not proxies:
                 print(Fore.RED + "Aucun proxy valide trouvé dans le fichier!")
@@ -207,12 +144,10 @@ def main():
             print(Fore.GREEN + f"[*] {len(proxies):,} proxys chargés")
             
             # Validation avec paramètres par défaut
-            working_proxies = validate_proxies_ultra_fast(proxies)
+            output_filename = f"validated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            working_proxies = validate_to_file(proxies, output_filename)
             
-            if working_proxies:
-                output_filename = f"validated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                save_proxies_fast(output_filename, working_proxies)
-            else:
+            if not working_proxies:
                 print(Fore.RED + "Aucun proxy fonctionnel trouvé!")
         
         elif choice == "2":
@@ -221,33 +156,37 @@ def main():
             if not os.path.exists(filename):
                 print(Fore.RED + f"Fichier '{filename}' non trouvé!")
                 continue
+            proxy_type = prompt_proxy_type()
             
             # Paramètres personnalisés
             try:
-                batch_size = int(input(Fore.YELLOW + "Taille du batch (défaut: 500): ") or "500")
-                max_workers = int(input(Fore.YELLOW + "Nombre de workers (défaut: 50): ") or "50")
+                batch_size = int(input(Fore.YELLOW + "Taille du batch (défaut: 5000): ") or "5000")
+                max_workers = int(input(Fore.YELLOW + "Nombre de tests simultanés (défaut: auto): ") or "0") or None
                 timeout = int(input(Fore.YELLOW + "Timeout en secondes (défaut: 2): ") or "2")
+                processes = int(input(Fore.YELLOW + f"Nombre de processus (défaut: 1, {DEFAULT_PROCESSES} cœurs): ") or "1")
             except ValueError:
                 print(Fore.RED + "Paramètres invalides, utilisation des valeurs par défaut")
-                batch_size, max_workers, timeout = 500, 50, 2
+                batch_size, max_workers, timeout, processes = 5000, None, 2, 1
+            mode = input(Fore.YELLOW + f"Profil de validation ({'/'.join(VALIDATION_MODES)}, défaut: full): ").strip().lower() or "full"
+            if mode not in VALIDATION_MODES:
+                print(Fore.RED + "Profil inconnu, utilisation de full")
+                mode = "full"
             
             print(Fore.GREEN + f"[*] Chargement du fichier '{filename}'...")
-            proxies = load_proxies_from_file(filename)
+            proxies = load_proxies_from_file(filename, proxy_type)
             
             if not proxies:
                 print(Fore.RED + "Aucun proxy valide trouvé dans le fichier!")
                 continue
             
             print(Fore.GREEN + f"[*] {len(proxies):,} proxys chargés")
-            print(Fore.CYAN + f"[INFO] Paramètres: batch_size={batch_size}, workers={max_workers}, timeout={timeout}s")
+            print(Fore.CYAN + f"[INFO] Paramètres: batch_size={batch_size}, workers={max_workers}, timeout={timeout}s, processus={processes}, profil={mode}")
             
             # Validation avec paramètres personnalisés
-            working_proxies = validate_proxies_ultra_fast(proxies, batch_size, max_workers)
+            output_filename = f"validated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+            working_proxies = validate_to_file(proxies, output_filename, batch_size=batch_size, max_workers=max_workers, timeout=timeout, processes=processes, mode=mode)
             
-            if working_proxies:
-                output_filename = f"validated_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-                save_proxies_fast(output_filename, working_proxies)
-            else:
+            if not working_proxies:
                 print(Fore.RED + "Aucun proxy fonctionnel trouvé!")
         
         elif choice == "3":
@@ -0,0 +1,161 @@
+"""
+Contrôle adaptatif du nombre de tests simultanés (AIMD).
+La limite augmente tant que le taux de timeouts reste stable, et diminue
+fortement dès qu'il grimpe, que la boucle d'événements prend du retard ou
+que les descripteurs de fichiers viennent à manquer.
+"""
+
+import asyncio
+import os
+import statistics
+import time
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_INITIAL = 100
+DEFAULT_MINIMUM = 10
+DEFAULT_MAXIMUM = 2000
+# Augmentation additive par fenêtre, après la phase de démarrage (doublement)
+ADDITIVE_STEP = 16
+DECREASE_FACTOR = 0.7
+# Hausse tolérée du taux de timeouts par rapport au taux de référence
+TIMEOUT_TOLERANCE = 0.15
+BASELINE_ALPHA = 0.2
+# Retard de la boucle d'événements au-delà duquel la machine est saturée (secondes)
+MAX_LOOP_LAG = 0.15
+LAG_SAMPLE_INTERVAL = 0.1
+# Descripteurs à garder libres
+FD_HEADROOM = 64
+MIN_WINDOW = 20
+
+
+def open_fd_count() -> Optional[int]:
+    """Nombre de descripteurs ouverts par le processus (Linux), sinon None."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def fd_soft_limit() -> Optional[int]:
+    """Limite souple de descripteurs, ou None si inconnue ou illimitée."""
+    if resource is None:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return None if soft == resource.RLIM_INFINITY else soft
+
+
+class AdaptiveConcurrency:
+    """Limite de tests en vol ajustée en AIMD à chaque fenêtre de résultats."""
+
+    def __init__(self, timeout: float, initial: int = DEFAULT_INITIAL, minimum: int = DEFAULT_MINIMUM,
+                 maximum: int = DEFAULT_MAXIMUM):
+        self.timeout = timeout
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.inflight = 0
+        self.slow_start = True
+        self.decreases = 0
+        self.peak = self.limit
+        self.loop_lag = 0.0
+        self.history: List[int] = []
+        self._baseline: Optional[float] = None
+        self._window_done = 0
+        self._window_timeouts = 0
+        # Résultats ignorés jusqu'à cette date (démarrage, effet d'une décision précédente)
+        self._hold_until: Optional[float] = None
+        self._condition: Optional[asyncio.Condition] = None
+
+    def cap(self, maximum: int) -> None:
+        """Abaisse la limite maximale (nombre de proxys, descripteurs disponibles)."""
+        self.maximum = max(self.minimum, min(self.maximum, maximum))
+        self.limit = min(self.limit, self.maximum)
+        self.peak = min(self.peak, self.maximum)
+
+    async def acquire(self) -> None:
+        """Attend qu'un emplacement de test se libère."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+            # Les premiers résultats ne sont que les réponses rapides : pas de décision avant un délai complet
+            self._hold_until = time.monotonic() + self.timeout
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.inflight < self.limit)
+            self.inflight += 1
+
+    async def release(self, ok: bool, elapsed: float) -> None:
+        """Libère un emplacement et comptabilise le résultat du test."""
+        self._window_done += 1
+        # Un échec qui a duré tout le délai est un timeout : signal de congestion possible
+        if not ok and elapsed >= self.timeout * 0.9:
+            self._window_timeouts += 1
+        if self._window_done >= max(MIN_WINDOW, self.limit // 2):
+            self._adjust()
+        await self.release_slot()
+
+    async def release_slot(self) -> None:
+        """Libère un emplacement sans résultat à comptabiliser."""
+        self.inflight -= 1
+        async with self._condition:
+            self._condition.notify(max(1, self.limit - self.inflight))
+
+    def _congested(self, timeout_rate: float) -> bool:
+        """Vrai si la fenêtre écoulée montre des signes de surcharge."""
+        if self.loop_lag > MAX_LOOP_LAG:
+            return True
+        soft_limit = fd_soft_limit()
+        open_fds = open_fd_count() if soft_limit else None
+        if open_fds is not None and soft_limit - open_fds < FD_HEADROOM:
+            return True
+        return self._baseline is not None and timeout_rate > self._baseline + TIMEOUT_TOLERANCE
+
+    def _adjust(self) -> None:
+        """Décision AIMD de fin de fenêtre."""
+        timeout_rate = self._window_timeouts / self._window_done
+        self._window_done = 0
+        self._window_timeouts = 0
+        now = time.monotonic()
+        if self._hold_until is not None and now < self._hold_until:
+            return
+        if self._baseline is None:
+            # Référence mesurée au démarrage puis après chaque réduction (proxys morts compris)
+            self._baseline = timeout_rate
+        if self._congested(timeout_rate):
+            if self.limit == self.minimum:
+                # Au minimum, les timeouts viennent des proxys morts et non de la charge
+                self._baseline = timeout_rate
+            else:
+                self.limit = max(self.minimum, int(self.limit * DECREASE_FACTOR))
+                self.slow_start = False
+                self.decreases += 1
+                self._baseline = None
+                # Une seule réduction par délai : les tests en vol datent d'avant la décision
+                self._hold_until = now + self.timeout
+        else:
+            self.limit = min(self.maximum, self.limit * 2 if self.slow_start else self.limit + ADDITIVE_STEP)
+            # La référence ne suit que les baisses, sinon elle finirait par absorber la congestion
+            self._baseline = min(self._baseline, self._baseline + BASELINE_ALPHA * (timeout_rate - self._baseline))
+        self.peak = max(self.peak, self.limit)
+        self.history.append(self.limit)
+
+    async def watch_loop_lag(self) -> None:
+        """Mesure en continu le retard de la boucle d'événements."""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            lag = time.perf_counter() - start - LAG_SAMPLE_INTERVAL
+            self.loop_lag += 0.3 * (lag - self.loop_lag)
+
+    @property
+    def settled(self) -> int:
+        """Limite retenue : médiane des dernières fenêtres."""
+        recent = self.history[-10:]
+        return int(statistics.median(recent)) if recent else self.limit
+
+    def summary(self) -> str:
+        return (f"concurrence stabilisée à {self.settled} tests simultanés "
+                f"(pic {self.peak}, {self.decreases} réductions, retard de boucle {self.loop_lag * 1000:.0f} ms)")
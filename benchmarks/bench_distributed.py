@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai local de la validation distribuée sur la ferme de faux proxys (aucun accès réseau).
+Un coordinateur et plusieurs processus ouvriers se partagent la ferme ; un ouvrier est tué
+en plein bail. Vérifie le rejet des jetons invalides, la remise en file du bail perdu,
+le rejet des résultats tardifs en double et que le pool fusionné est exactement
+l'ensemble des proxys fonctionnels de la ferme.
+Usage : python benchmarks/bench_distributed.py [--proxies N] [--workers N] [--seed N]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_farm import DEFAULT_SLOW_DELAY, FarmConfig, MockFarm  # noqa: E402
+
+DEFAULT_PROXIES = 900
+DEFAULT_WORKERS = 3
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_LEASE_SIZE = 50
+# Bail court : le bail de l'ouvrier tué est redistribué en quelques secondes
+DEFAULT_LEASE_TIMEOUT = 3.0
+TOKEN = "banc-distribue"
+
+Key = Tuple[str, str, str]
+
+
+def _start_farm(count: int, seed: int) -> Tuple[FarmConfig, Callable[[], None]]:
+    """Ferme servie par une boucle asyncio dans un thread ; retourne (description, arrêt)."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    farm = MockFarm(count, sources=0, seed=seed)
+    config = asyncio.run_coroutine_threadsafe(farm.start(), loop).result()
+
+    def stop() -> None:
+        asyncio.run_coroutine_threadsafe(farm.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+    return config, stop
+
+
+def _worker(coordinator_url: str, name: str, judge_url: str, timeout: float) -> None:
+    """Processus ouvrier : valide des baux jusqu'à ce que le coordinateur n'en ait plus."""
+    from distributed import run_worker
+    run_worker(coordinator_url, worker_name=name, timeout=timeout, mode="full", judge_url=judge_url, token=TOKEN)
+
+
+def _check(label: str, ok: bool, failures: List[str], detail: str = "") -> None:
+    print(f"{'OK   ' if ok else 'ÉCHEC'} {label}{' : ' + detail if detail else ''}")
+    if not ok:
+        failures.append(label)
+
+
+def run(proxies: int, workers: int, timeout: float, lease_size: int, lease_timeout: float, seed: int) -> List[str]:
+    """Exécute le scénario et retourne la liste des vérifications en échec."""
+    from distributed import POLL_INTERVAL, LeaseCoordinator, _post, run_coordinator
+    from proxy_pool import Proxy
+
+    failures: List[str] = []
+    config, stop_farm = _start_farm(proxies, seed)
+    alive = {"alive", "slow"} if config.slow_delay < timeout else {"alive"}
+    expected: Set[Key] = {(proxy.ip, str(proxy.port), proxy.protocol) for proxy in config.proxies if proxy.behaviour in alive}
+    recorded: List[Tuple[Key, bool]] = []
+    coordinator = LeaseCoordinator(
+        [Proxy(ip=proxy.ip, port=str(proxy.port), proxy_type=proxy.protocol) for proxy in config.proxies],
+        lease_size=lease_size, lease_timeout=lease_timeout, token=TOKEN,
+        on_result=lambda proxy, ok, latency: recorded.append(((proxy.ip, str(proxy.port), proxy.proxy_type), ok)),
+    )
+    started: List[Any] = []
+    # Port 0 : port libre choisi par le système
+    serving = threading.Thread(target=run_coordinator, args=(coordinator, "127.0.0.1", 0),
+                               kwargs={"on_started": started.append}, daemon=True)
+    serving.start()
+    while not started:
+        time.sleep(0.01)
+    url = f"http://127.0.0.1:{started[0].server_address[1]}"
+
+    status, _ = _post(url, "/lease", {"worker": "intrus"})
+    _check("bail refusé sans jeton", status == 403, failures, f"HTTP {status}")
+    status, _ = _post(url, "/lease", {"worker": "intrus"}, token="mauvais")
+    _check("bail refusé avec un mauvais jeton", status == 403, failures, f"HTTP {status}")
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_worker, args=(url, f"ouvrier-{number}", config.judge_url, timeout), daemon=True)
+                 for number in range(workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    # Le premier ouvrier est tué une fois que chacun a pris un bail : le sien est en cours de validation
+    while coordinator.status()["leased"] < workers and time.perf_counter() - start < 30:
+        time.sleep(0.05)
+    time.sleep(timeout / 2)
+    processes[0].kill()
+    print(f"ouvrier-0 tué après {time.perf_counter() - start:.1f}s")
+
+    serving.join(timeout=120 + proxies * timeout / lease_size)
+    elapsed = time.perf_counter() - start
+    for process in processes[1:]:
+        process.join(timeout=POLL_INTERVAL * 3)
+        if process.is_alive():
+            process.terminate()
+    stop_farm()
+
+    stats = coordinator.status()
+    _check("validation terminée", stats["finished"], failures, f"{elapsed:.1f}s, {stats['completed']}/{coordinator.lease_count} baux")
+    _check("bail de l'ouvrier tué remis en file", stats["requeued"] >= 1, failures, f"{stats['requeued']} remis en file")
+    _check("chaque proxy testé une fois", stats["checked"] == len(coordinator.entries), failures,
+           f"{stats['checked']}/{len(coordinator.entries)}")
+
+    merged = [(proxy.ip, proxy.port, proxy.proxy_type) for proxy in coordinator.pool]
+    _check("pool fusionné sans doublon", len(merged) == len(set(merged)), failures, f"{len(merged)} entrées")
+    missing, extra = expected - set(merged), set(merged) - expected
+    _check("pool fusionné = proxys fonctionnels de la ferme", not missing and not extra, failures,
+           f"{len(merged)} trouvés, {len(expected)} attendus, {len(missing)} manquants, {len(extra)} en trop")
+
+    # Historique de santé : chaque proxy enregistré une seule fois, succès = proxys fonctionnels
+    keys = [key for key, _ in recorded]
+    succeeded = {key for key, ok in recorded if ok}
+    _check("résultats enregistrés dans l'historique", len(keys) == len(set(keys)) == len(coordinator.entries)
+           and succeeded == set(merged), failures, f"{len(keys)} enregistrés, {len(succeeded)} succès")
+
+    # Résultats tardifs (ouvrier lent dont le bail a été redistribué) : ignorés
+    late = [[*next(iter(expected)), 0.1, "elite", "127.0.0.1"]] if expected else []
+    accepted = [lease_id for lease_id in range(1, stats["leased"] + 1) if coordinator.complete(lease_id, lease_size, late)]
+    _check("résultats en double ignorés", not accepted and len(coordinator.pool) == len(merged), failures,
+           f"{len(accepted)} baux acceptés une seconde fois")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc d'essai local de la validation distribuée.")
+    parser.add_argument("--proxies", type=int, default=DEFAULT_PROXIES, help="taille de la ferme")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processus ouvriers (au moins 2)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="timeout des tests (s)")
+    parser.add_argument("--lease-size", type=int, default=DEFAULT_LEASE_SIZE)
+    parser.add_argument("--lease-timeout", type=float, default=DEFAULT_LEASE_TIMEOUT)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.workers < 2:
+        parser.error("au moins 2 ouvriers (l'un d'eux est tué)")
+    if args.timeout <= DEFAULT_SLOW_DELAY:
+        print(f"timeout {args.timeout}s : les proxys lents ({DEFAULT_SLOW_DELAY}s) ne sont pas attendus")
+    print(f"Ferme de {args.proxies:,} proxys, {args.workers} ouvriers, baux de {args.lease_size} ({args.lease_timeout}s), graine {args.seed}")
+    failures = run(args.proxies, args.workers, args.timeout, args.lease_size, args.lease_timeout, args.seed)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai local de la passerelle rotative devant la ferme de faux proxys (aucun accès réseau).
+La passerelle écoute sur un port libre ; des clients CONNECT, SOCKS5 et HTTP absolu la
+traversent vers chaque protocole amont. Vérifie les nouvelles tentatives sur un amont mort,
+la remontée des résultats (on_result) et le refus des clients au-delà de max_tunnels.
+Usage : python benchmarks/bench_gateway.py [--proxies N] [--seed N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import sys
+from typing import Any, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_farm import PROTOCOLS, MockFarm  # noqa: E402
+
+DEFAULT_PROXIES = 60
+# Ferme réduite aux deux comportements utiles : proxys vivants et ports refusant la connexion
+FARM_MIX = {"alive": 0.5, "dead": 0.5}
+CONNECT_TIMEOUT = 1.0
+CLIENT_TIMEOUT = 5.0
+
+Result = Tuple[Optional[int], Optional[str]]
+
+
+def _check(label: str, ok: bool, failures: List[str], detail: str = "") -> None:
+    print(f"{'OK   ' if ok else 'ÉCHEC'} {label}{' : ' + detail if detail else ''}")
+    if not ok:
+        failures.append(label)
+
+
+def _parse_response(data: bytes) -> Result:
+    """(statut, adresse vue par le juge) d'une réponse HTTP complète."""
+    head, _, body = data.partition(b"\r\n\r\n")
+    try:
+        status = int(head.split(b" ", 2)[1])
+    except (IndexError, ValueError):
+        return None, None
+    try:
+        origin = json.loads(body).get("origin")
+    except ValueError:
+        origin = None
+    return status, origin
+
+
+async def _get_through(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, port: int) -> Result:
+    """Requête au juge sur un tunnel établi, lue jusqu'à la fermeture."""
+    writer.write(f"GET /get HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    return _parse_response(await reader.read(-1))
+
+
+async def _connect_client(gateway_port: int, host: str, port: int) -> Result:
+    """Client HTTP CONNECT."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", gateway_port)
+    try:
+        writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status, _ = _parse_response(head)
+        if status != 200:
+            return status, None
+        return await _get_through(reader, writer, host, port)
+    finally:
+        writer.close()
+
+
+async def _socks5_client(gateway_port: int, host: str, port: int) -> Result:
+    """Client SOCKS5 (sans authentification, CONNECT IPv4)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", gateway_port)
+    try:
+        writer.write(b"\x05\x01\x00")
+        await writer.drain()
+        if await reader.readexactly(2) != b"\x05\x00":
+            return None, None
+        writer.write(b"\x05\x01\x00\x01" + socket.inet_aton(host) + struct.pack(">H", port))
+        await writer.drain()
+        reply = await reader.readexactly(10)
+        if reply[1] != 0:
+            return None, None
+        return await _get_through(reader, writer, host, port)
+    finally:
+        writer.close()
+
+
+async def _absolute_client(gateway_port: int, host: str, port: int) -> Result:
+    """Client HTTP en forme absolue (proxy HTTP classique)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", gateway_port)
+    try:
+        writer.write(f"GET http://{host}:{port}/get HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        return _parse_response(await reader.read(-1))
+    finally:
+        writer.close()
+
+
+CLIENTS = (("CONNECT", _connect_client), ("SOCKS5", _socks5_client), ("HTTP absolu", _absolute_client))
+
+
+async def _scenario(proxies: int, seed: int) -> List[str]:
+    from proxy_gateway import ProxyGateway
+    from proxy_pool import Proxy
+    from proxy_rotator import ProxyRotator
+
+    failures: List[str] = []
+    farm = MockFarm(proxies, mix=FARM_MIX, sources=0, seed=seed)
+    config = await farm.start()
+    judge = config.judge_url.split("/")[2]
+    host, port = judge.split(":")[0], int(judge.split(":")[1])
+
+    def members(protocol: str, behaviour: str) -> List[Any]:
+        return [Proxy(ip=proxy.ip, port=str(proxy.port), proxy_type=protocol)
+                for proxy in config.proxies if proxy.protocol == protocol and proxy.behaviour == behaviour]
+
+    async def run_client(gateway: ProxyGateway, client: Any) -> Result:
+        try:
+            return await asyncio.wait_for(client(gateway.port, host, port), CLIENT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None, None
+
+    try:
+        # Chaque type de client vers chaque protocole amont
+        for protocol in PROTOCOLS:
+            alive = members(protocol, "alive")
+            addresses = {proxy.ip for proxy in alive}
+            gateway = ProxyGateway(ProxyRotator(alive, seed=seed), port=0, connect_timeout=CONNECT_TIMEOUT)
+            await gateway.start()
+            try:
+                for name, client in CLIENTS:
+                    status, origin = await run_client(gateway, client)
+                    _check(f"{name} via amont {protocol}", status == 200 and origin in addresses, failures,
+                           f"statut {status}, sortie {origin}")
+            finally:
+                await gateway.stop()
+
+        # Amonts morts : chaque échec passe au proxy suivant, puis 502 quand il n'en reste plus
+        dead = members("HTTP", "dead")[:3]
+        alive = members("HTTP", "alive")
+        reported: List[Tuple[str, bool, Optional[float]]] = []
+        rotator = ProxyRotator(dead, failure_threshold=1, seed=seed)
+        gateway = ProxyGateway(rotator, port=0, connect_timeout=CONNECT_TIMEOUT, max_retries=len(dead),
+                               on_result=lambda proxy, ok, latency: reported.append((proxy.ip, ok, latency)))
+        await gateway.start()
+        try:
+            status, _ = await run_client(gateway, _connect_client)
+            _check("amonts morts : 502 après une tentative par proxy", status == 502 and gateway.stats.retries == len(dead) - 1,
+                   failures, f"statut {status}, {gateway.stats.retries} nouvelles tentatives")
+            for proxy in alive:
+                rotator.add(proxy)
+            status, _ = await run_client(gateway, _absolute_client)
+            _check("proxys morts écartés, requête servie par un vivant", status == 200 and rotator.stats()["cooling"] == len(dead),
+                   failures, f"statut {status}, {rotator.stats()['cooling']} en refroidissement")
+        finally:
+            await gateway.stop()
+        failed = {ip for ip, ok, _ in reported if not ok}
+        succeeded = [latency for _, ok, latency in reported if ok]
+        _check("résultats remontés par on_result", failed == {proxy.ip for proxy in dead} and len(succeeded) == 1
+               and succeeded[0] is not None, failures, f"{len(failed)} échecs, {len(succeeded)} succès")
+
+        # max_tunnels : un tunnel ouvert occupe la seule place, le client suivant est refusé
+        gateway = ProxyGateway(ProxyRotator(alive, seed=seed), port=0, connect_timeout=CONNECT_TIMEOUT, max_tunnels=1)
+        await gateway.start()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", gateway.port)
+            writer.write(f"CONNECT {host}:{port} HTTP/1.1\r\n\r\n".encode("latin-1"))
+            await writer.drain()
+            opened, _ = _parse_response(await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), CLIENT_TIMEOUT))
+            refused, _ = await run_client(gateway, _connect_client)
+            _check("client refusé au-delà de max_tunnels", opened == 200 and refused is None and gateway.stats.rejected == 1,
+                   failures, f"{gateway.stats.rejected} refusé(s)")
+            served, _ = await _get_through(reader, writer, host, port)
+            writer.close()
+            status, _ = await run_client(gateway, _socks5_client)
+            _check("place libérée à la fermeture du tunnel", served == 200 and status == 200 and gateway.stats.rejected == 1,
+                   failures, f"statut {status}")
+        finally:
+            await gateway.stop()
+    finally:
+        await farm.close()
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc d'essai local de la passerelle rotative.")
+    parser.add_argument("--proxies", type=int, default=DEFAULT_PROXIES, help="taille de la ferme")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(f"Ferme de {args.proxies} proxys, graine {args.seed}")
+    failures = asyncio.run(_scenario(args.proxies, args.seed))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
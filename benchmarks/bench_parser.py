@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark : analyse en flux (proxy_parser) contre l'ancien validate_proxy_format.
+Usage : python benchmarks/bench_parser.py [nombre_de_lignes]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_parser import ParseStats, iter_parse_chunks  # noqa: E402
+
+DEFAULT_LINES = 2_000_000
+CHUNK_SIZE = 1 << 16
+
+
+def legacy_is_valid_ip(ip: str) -> bool:
+    """Version d'origine de is_valid_ip."""
+    try:
+        parts = ip.split('.')
+        if len(parts) != 4:
+            return False
+        for part in parts:
+            if not part.isdigit() or not (0 <= int(part) <= 255):
+                return False
+        return True
+    except:
+        return False
+
+
+def legacy_is_valid_port(port: str) -> bool:
+    """Version d'origine de is_valid_port."""
+    try:
+        port_num = int(port)
+        return 1 <= port_num <= 65535
+    except:
+        return False
+
+
+def legacy_validate_proxy_format(proxy_str: str):
+    """Version d'origine de validate_proxy_format (référence du benchmark)."""
+    patterns = [
+        r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{1,5})$',
+        r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}):(\d{1,5}):(\w+):(\w+)$',
+    ]
+    for pattern in patterns:
+        match = re.match(pattern, proxy_str.strip())
+        if match:
+            ip = match.group(1)
+            port = match.group(2)
+            if not legacy_is_valid_ip(ip) or not legacy_is_valid_port(port):
+                return None
+            return ip, port
+    return None
+
+
+def build_corpus(lines: int, seed: int = 42) -> bytes:
+    """Génère une liste réaliste : majorité d'IP:PORT, quelques formes étendues et du bruit."""
+    rng = random.Random(seed)
+    ports = [80, 8080, 3128, 1080, 443, 8888, 9050]
+    out = []
+    for _ in range(lines):
+        roll = rng.random()
+        ip = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        port = rng.choice(ports) if rng.random() < 0.7 else rng.randint(1, 65535)
+        if roll < 0.85:
+            out.append(f"{ip}:{port}")
+        elif roll < 0.90:
+            out.append(f"{ip}:{port}:user:pass")
+        elif roll < 0.93:
+            out.append(f"socks5://user:pass@{ip}:{port}")
+        elif roll < 0.95:
+            out.append(f"http://{ip}:{port}")
+        elif roll < 0.97:
+            out.append("# commentaire")
+        else:
+            out.append(f"{rng.randint(256, 999)}.1.1.1:{port}")
+    return ("\n".join(out) + "\n").encode("ascii")
+
+
+def bench_legacy(corpus: bytes) -> int:
+    """Chemin d'origine : texte complet, splitlines puis validation ligne par ligne."""
+    count = 0
+    for line in corpus.decode("utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if legacy_validate_proxy_format(line):
+            count += 1
+    return count
+
+
+def bench_streaming(corpus: bytes) -> int:
+    """Nouveau chemin : blocs de 64 Ko analysés par la grammaire précompilée."""
+    chunks = (corpus[i:i + CHUNK_SIZE] for i in range(0, len(corpus), CHUNK_SIZE))
+    stats = ParseStats()
+    count = sum(1 for _ in iter_parse_chunks(chunks, stats))
+    return count
+
+
+def main() -> None:
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_LINES
+    print(f"Génération d'un corpus de {lines:,} lignes...")
+    corpus = build_corpus(lines)
+    print(f"Corpus : {len(corpus) / 1e6:.1f} Mo")
+
+    results = {}
+    for name, func in (("ancien validate_proxy_format", bench_legacy), ("analyse en flux", bench_streaming)):
+        start = time.perf_counter()
+        accepted = func(corpus)
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed
+        print(f"{name:<30} {elapsed:7.2f}s  {lines / elapsed:>12,.0f} lignes/s  {accepted:,} acceptées")
+
+    legacy, streaming = results.values()
+    print(f"Gain : x{legacy / streaming:.1f}")
+
+
+if __name__ == "__main__":
+    main()
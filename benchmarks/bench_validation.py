@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Benchmark des stratégies de validation et de scraping sur une ferme locale de faux proxys.
+Aucun accès réseau : proxys, juge et listes sources sont servis par benchmarks/mock_farm.py,
+la répartition des comportements est tirée d'une graine fixe (reproductible en CI).
+Chaque stratégie tourne dans un processus neuf : débit, délai du premier proxy trouvé,
+p95 de la latence des tests, pic de mémoire (RSS) et pic de descripteurs ouverts.
+Usage : python benchmarks/bench_validation.py [--proxies N] [--strategies a,b] [--json resultats.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_farm import DEFAULT_MIX, DEFAULT_SLOW_DELAY, PROTOCOLS, FarmConfig, MockFarm, parse_mix  # noqa: E402
+
+DEFAULT_PROXIES = 3000
+DEFAULT_TIMEOUT = 2.0
+FD_SAMPLE_INTERVAL = 0.005
+# Stratégies limitées aux proxys HTTP (elles ne connaissent pas le type du proxy)
+HTTP_ONLY = {"threads"}
+
+Entry = Tuple[str, int, str]
+
+
+class Measurement:
+    """Compteurs d'une stratégie : chaque test est rapporté par report(ok, latence)."""
+
+    def __init__(self):
+        self.checked = 0
+        self.working = 0
+        self.first_hit: Optional[float] = None
+        self.latencies: List[float] = []
+        self.start = time.perf_counter()
+
+    def restart(self) -> None:
+        """Oublie la phase de préparation (cache à chauffer, etc.)."""
+        self.__init__()
+
+    def report(self, ok: bool, latency: Optional[float] = None) -> None:
+        self.checked += 1
+        if ok:
+            self.working += 1
+            if self.first_hit is None:
+                self.first_hit = time.perf_counter() - self.start
+        if latency is not None:
+            self.latencies.append(latency)
+
+
+def _run_farm(options: Dict[str, Any], connection: Any, stop_event: Any) -> None:
+    """Processus de la ferme : démarre les serveurs, transmet leur description, sert jusqu'à l'arrêt."""
+    async def serve() -> None:
+        farm = MockFarm(**options)
+        connection.send(await farm.start())
+        while not stop_event.is_set():
+            await asyncio.sleep(0.1)
+        await farm.close()
+    asyncio.run(serve())
+
+
+# --- Stratégies : chacune reçoit les proxys de la ferme et rapporte chaque résultat à la mesure ---
+
+def _scproxy(judge_url: str):
+    """Module principal configuré pour la ferme (juge local, ni historique ni priorisation)."""
+    import ScProxy
+    ScProxy.SETTINGS["test_url"] = judge_url
+    ScProxy.SETTINGS["adaptive_sources"] = False
+    ScProxy.TEST_URLS[:] = []
+    ScProxy._judge_url = None
+    return ScProxy
+
+
+def _scproxy_proxies(entries: List[Entry]) -> List[Any]:
+    from proxy_pool import Proxy
+    return [Proxy(ip=ip, port=str(port), proxy_type=protocol) for ip, port, protocol in entries]
+
+
+def _validate_with(function_name: str, **options: Any):
+    def run(entries: List[Entry], config: FarmConfig, timeout: float, measurement: Measurement) -> None:
+        ScProxy = _scproxy(config.judge_url)
+        proxies = _scproxy_proxies(entries)
+        measurement.restart()
+        getattr(ScProxy, function_name)(
+            proxies, timeout=timeout, incremental=False, prioritized=False,
+            on_checked=lambda proxy, ok, latency: measurement.report(ok, latency), **options)
+    return run
+
+
+def _ultra_fast(entries: List[Entry], config: FarmConfig, timeout: float, measurement: Measurement) -> None:
+    """Validateur rapide, par le même chemin que son menu (écriture au fil de l'eau) : seuls les fonctionnels sont remontés."""
+    _scproxy(config.judge_url)
+    import TEST____fast_proxy_validator as fast
+    proxies = _scproxy_proxies(entries)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "validated.txt")
+        measurement.restart()
+        fast.validate_to_file(proxies, filename, timeout=timeout, on_working=lambda proxy: measurement.report(True))
+        measurement.checked = len(proxies)
+        written = 0
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as file:
+                written = sum(1 for line in file if line.strip())
+    if written != measurement.working:
+        raise RuntimeError(f"{written} proxys écrits pour {measurement.working} fonctionnels")
+
+
+def legacy_test_proxy_fast(ip: str, port: str, timeout: float) -> bool:
+    """Version d'origine de test_proxy_fast (requests, toujours en http://)."""
+    import requests
+    try:
+        proxy_dict = {
+            'http': f'http://{ip}:{port}',
+            'https': f'http://{ip}:{port}'
+        }
+        # Les proxys de la ferme répondent eux-mêmes : aucune requête ne sort
+        response = requests.get('http://httpbin.org/ip', proxies=proxy_dict, timeout=timeout)
+        return response.status_code == 200
+    except:
+        return False
+
+
+def _threads(entries: List[Entry], config: FarmConfig, timeout: float, measurement: Measurement) -> None:
+    """Référence historique : test_proxy_fast (requests) dans un pool de threads."""
+    import concurrent.futures
+
+    def check(entry: Entry) -> None:
+        start = time.perf_counter()
+        ok = legacy_test_proxy_fast(entry[0], str(entry[1]), timeout)
+        with lock:
+            # Latence des tests réussis, comme pour les autres stratégies
+            measurement.report(ok, time.perf_counter() - start if ok else None)
+
+    lock = threading.Lock()
+    measurement.restart()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=200) as executor:
+        list(executor.map(check, entries))
+
+
+def _scrape(warm: bool):
+    def run(entries: List[Entry], config: FarmConfig, timeout: float, measurement: Measurement) -> None:
+        ScProxy = _scproxy(config.judge_url)
+        from source_cache import SourceCache
+        ScProxy.PROXY_URLS.clear()
+        ScProxy.PROXY_URLS.update(config.source_urls)
+        with tempfile.TemporaryDirectory() as directory:
+            ScProxy._source_cache = SourceCache(directory)
+            if warm:
+                # Premier passage hors mesure : le second ne reçoit que des 304
+                for protocol in PROTOCOLS:
+                    ScProxy.scrape_proxies(protocol)
+            measurement.restart()
+            for protocol in PROTOCOLS:
+                for _ in ScProxy.scrape_proxies(protocol):
+                    measurement.report(True)
+    return run
+
+
+STRATEGIES: Dict[str, Callable[[List[Entry], FarmConfig, float, Measurement], None]] = {
+    "batch": _validate_with("validate_proxies_batch", mode="staged"),
+    "batch-full": _validate_with("validate_proxies_batch", mode="full"),
+    "parallel": _validate_with("validate_proxies_parallel", mode="staged"),
+    "sharded": _validate_with("validate_proxies_batch", mode="staged", processes=2),
+    "ultra-fast": _ultra_fast,
+    "threads": _threads,
+    "scrape-cold": _scrape(warm=False),
+    "scrape-warm": _scrape(warm=True),
+}
+DEFAULT_STRATEGIES = ("batch", "batch-full", "parallel", "sharded", "ultra-fast", "scrape-cold", "scrape-warm")
+
+
+def _open_fds() -> Optional[int]:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def _run_strategy(name: str, entries: List[Entry], config: FarmConfig, timeout: float, results: Any) -> None:
+    """Processus de mesure d'une stratégie."""
+    peak_fds = _open_fds()
+    sampling = True
+
+    def sample_fds() -> None:
+        nonlocal peak_fds
+        while sampling:
+            count = _open_fds()
+            if count is None:
+                return
+            peak_fds = max(peak_fds or 0, count)
+            time.sleep(FD_SAMPLE_INTERVAL)
+
+    sampler = threading.Thread(target=sample_fds, daemon=True)
+    sampler.start()
+    measurement = Measurement()
+    # Les validateurs affichent chaque proxy trouvé : sortie écartée pendant la mesure
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        STRATEGIES[name](entries, config, timeout, measurement)
+    elapsed = time.perf_counter() - measurement.start
+    latencies = measurement.latencies
+    sampling = False
+    sampler.join()
+
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale
+    results.put({
+        "strategy": name,
+        "elapsed": elapsed,
+        "checked": measurement.checked,
+        "working": measurement.working,
+        "rate": measurement.checked / elapsed if elapsed > 0 else 0.0,
+        "first_hit": measurement.first_hit,
+        "p95_latency": statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 2 else None,
+        "peak_rss_mb": rss / 1e6,
+        "peak_fds": peak_fds,
+    })
+
+
+def _wait_report(name: str, worker: Any, results: Any) -> Dict[str, Any]:
+    """Résultat d'une stratégie ; erreur si son processus meurt sans l'avoir envoyé."""
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not worker.is_alive():
+                try:
+                    return results.get(timeout=1)
+                except queue.Empty:
+                    raise RuntimeError(f"stratégie {name} interrompue (code de sortie {worker.exitcode})") from None
+
+
+def run_benchmark(strategies: List[str], proxies: int, mix: Dict[str, float], slow_delay: float,
+                  timeout: float, sources: int, source_lines: int, seed: int) -> List[Dict[str, Any]]:
+    """Démarre la ferme, mesure chaque stratégie dans un processus neuf et retourne les résultats."""
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    stop_event = context.Event()
+    farm_options = {"count": proxies, "mix": mix, "slow_delay": slow_delay, "sources": sources,
+                    "source_lines": source_lines, "seed": seed}
+    farm = context.Process(target=_run_farm, args=(farm_options, child, stop_event), daemon=True)
+    farm.start()
+    config: FarmConfig = parent.recv()
+    reports = []
+    try:
+        for name in strategies:
+            protocols = ("HTTP",) if name in HTTP_ONLY else PROTOCOLS
+            entries = [(proxy.ip, proxy.port, proxy.protocol) for proxy in config.proxies if proxy.protocol in protocols]
+            results = context.Queue()
+            worker = context.Process(target=_run_strategy, args=(name, entries, config, timeout, results))
+            worker.start()
+            report = _wait_report(name, worker, results)
+            worker.join()
+            report["expected"] = None if name.startswith("scrape") else config.expected_working(timeout, protocols)
+            reports.append(report)
+            print_report(report)
+    finally:
+        stop_event.set()
+        farm.join(timeout=5)
+    return reports
+
+
+def _format(value: Optional[float], pattern: str) -> str:
+    return "-" if value is None else format(value, pattern)
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    found = f"{report['working']}/{report['expected']}" if report["expected"] is not None else str(report["working"])
+    unit = "proxys/s" if report["expected"] is not None else "entrées/s"
+    print(f"{report['strategy']:<12} {report['elapsed']:7.2f}s  {report['rate']:>10,.0f} {unit:<9}  "
+          f"trouvés {found:<11}  1er {_format(report['first_hit'], '.3f'):>6}s  "
+          f"p95 {_format(report['p95_latency'], '.3f'):>6}s  RSS {report['peak_rss_mb']:6.1f} Mo  fd {report['peak_fds'] or '-'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne des stratégies de validation.")
+    parser.add_argument("--proxies", type=int, default=DEFAULT_PROXIES, help="taille de la ferme")
+    parser.add_argument("--strategies", default=",".join(DEFAULT_STRATEGIES), help=f"parmi : {', '.join(STRATEGIES)}")
+    parser.add_argument("--mix", default=",".join(f"{name}={share}" for name, share in DEFAULT_MIX.items()),
+                        help="répartition des comportements")
+    parser.add_argument("--slow-delay", type=float, default=DEFAULT_SLOW_DELAY, help="retard des proxys lents (s)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="timeout des tests (s)")
+    parser.add_argument("--sources", type=int, default=4, help="listes sources par protocole")
+    parser.add_argument("--source-lines", type=int, default=20000, help="lignes par liste source")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier (comparaison en CI)")
+    args = parser.parse_args()
+
+    strategies = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"stratégies inconnues : {', '.join(unknown)}")
+    print(f"Ferme de {args.proxies:,} proxys ({args.mix}), timeout {args.timeout}s, graine {args.seed}")
+    reports = run_benchmark(strategies, args.proxies, parse_mix(args.mix), args.slow_delay, args.timeout,
+                            args.sources, args.source_lines, args.seed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"proxies": args.proxies, "mix": args.mix, "timeout": args.timeout, "seed": args.seed,
+                       "results": reports}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Ferme locale de faux proxys pour les benchmarks, sans aucun accès réseau.
+Chaque proxy a sa propre adresse 127.x.y.z ; un écouteur par (protocole, comportement)
+sert toutes ces adresses. Les proxys « vivants » répondent eux-mêmes comme un juge
+(aucune connexion sortante) ; un juge direct et des listes sources sont aussi servis.
+Usage : python benchmarks/mock_farm.py [nombre_de_proxys] (écrit mock_farm_<protocole>.txt et sert jusqu'à Ctrl+C)
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import struct
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+PROTOCOLS = ("HTTP", "SOCKS4", "SOCKS5")
+BEHAVIOURS = ("alive", "dead", "blackhole", "slow", "garbage")
+# Répartition par défaut, proche d'une liste publique : une majorité de proxys morts ou muets
+DEFAULT_MIX = {"alive": 0.15, "dead": 0.45, "blackhole": 0.2, "slow": 0.1, "garbage": 0.1}
+DEFAULT_SLOW_DELAY = 1.0
+HEAD_LIMIT = 16384
+
+
+@dataclass
+class FarmProxy:
+    ip: str
+    port: int
+    protocol: str
+    behaviour: str
+
+
+@dataclass
+class FarmConfig:
+    """Description de la ferme démarrée, transmise au harnais de benchmark."""
+    proxies: List[FarmProxy]
+    judge_url: str
+    source_urls: Dict[str, List[str]] = field(default_factory=dict)
+    slow_delay: float = DEFAULT_SLOW_DELAY
+
+    def expected_working(self, timeout: float, protocols: Tuple[str, ...] = PROTOCOLS) -> int:
+        """Nombre de proxys qu'un validateur correct doit trouver."""
+        alive = {"alive", "slow"} if self.slow_delay < timeout else {"alive"}
+        return sum(1 for proxy in self.proxies if proxy.behaviour in alive and proxy.protocol in protocols)
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Répartition des comportements : « alive=0.2,dead=0.5,... » (normalisée)."""
+    mix = {}
+    for item in text.split(","):
+        name, _, share = item.partition("=")
+        name = name.strip()
+        if name not in BEHAVIOURS:
+            raise ValueError(f"comportement inconnu '{name}'")
+        mix[name] = float(share)
+    total = sum(mix.values())
+    return {name: share / total for name, share in mix.items()}
+
+
+def _address(index: int) -> str:
+    # 127.1.0.1 et suivantes : jamais 127.0.0.1, qui est l'adresse « réelle » vue par le juge
+    index += 1
+    return f"127.{1 + index // 65536}.{(index // 256) % 256}.{index % 256}"
+
+
+def _judge_body(origin: str, head: bytes) -> bytes:
+    headers = {}
+    for line in head.decode("latin-1").split("\r\n")[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip()] = value.strip()
+    return json.dumps({"origin": origin, "headers": headers}).encode()
+
+
+def _http_response(body: bytes, status: str = "200 OK", extra: str = "") -> bytes:
+    return (f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"{extra}Connection: close\r\n\r\n").encode("latin-1") + body
+
+
+class MockFarm:
+    """Serveur asyncio de la ferme : écouteurs de proxys, juge et listes sources."""
+
+    def __init__(self, count: int, mix: Optional[Dict[str, float]] = None, slow_delay: float = DEFAULT_SLOW_DELAY,
+                 sources: int = 4, source_lines: int = 20000, seed: int = 42):
+        self.count = count
+        self.mix = mix or DEFAULT_MIX
+        self.slow_delay = slow_delay
+        self.sources = sources
+        self.source_lines = source_lines
+        self.rng = random.Random(seed)
+        self.servers: List[asyncio.AbstractServer] = []
+        self._dead_sockets: List[socket.socket] = []
+        self._source_bodies: Dict[str, bytes] = {}
+
+    async def start(self) -> FarmConfig:
+        ports: Dict[Tuple[str, str], int] = {}
+        for protocol in PROTOCOLS:
+            for behaviour in self.mix:
+                if behaviour == "dead":
+                    # Port lié mais sans écoute : la connexion est refusée (RST)
+                    dead = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    dead.bind(("0.0.0.0", 0))
+                    self._dead_sockets.append(dead)
+                    ports[protocol, behaviour] = dead.getsockname()[1]
+                    continue
+                handler = self._make_handler(protocol, behaviour)
+                # 0.0.0.0 : un seul écouteur sert toutes les adresses 127.x.y.z du comportement
+                server = await asyncio.start_server(handler, "0.0.0.0", 0, backlog=4096, limit=HEAD_LIMIT)
+                self.servers.append(server)
+                ports[protocol, behaviour] = server.sockets[0].getsockname()[1]
+
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        proxies = []
+        for index in range(self.count):
+            protocol = PROTOCOLS[index % len(PROTOCOLS)]
+            behaviour = self.rng.choices(names, weights)[0]
+            proxies.append(FarmProxy(_address(index), ports[protocol, behaviour], protocol, behaviour))
+        self.rng.shuffle(proxies)
+
+        judge = await asyncio.start_server(self._judge, "127.0.0.1", 0, limit=HEAD_LIMIT)
+        self.servers.append(judge)
+        judge_port = judge.sockets[0].getsockname()[1]
+        source_urls = self._build_sources(proxies, judge_port)
+        return FarmConfig(proxies, f"http://127.0.0.1:{judge_port}/get", source_urls, self.slow_delay)
+
+    def _build_sources(self, proxies: List[FarmProxy], port: int) -> Dict[str, List[str]]:
+        """Listes sources par protocole : proxys de la ferme, doublons, bruit et adresses fictives."""
+        source_urls: Dict[str, List[str]] = {}
+        for protocol in PROTOCOLS:
+            members = [f"{proxy.ip}:{proxy.port}" for proxy in proxies if proxy.protocol == protocol]
+            source_urls[protocol] = []
+            for number in range(self.sources):
+                lines = []
+                for _ in range(self.source_lines):
+                    roll = self.rng.random()
+                    if roll < 0.6 and members:
+                        lines.append(self.rng.choice(members))
+                    elif roll < 0.95:
+                        lines.append(f"10.{self.rng.randint(0, 255)}.{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}:{self.rng.randint(1, 65535)}")
+                    else:
+                        lines.append(self.rng.choice(["# liste", "", "junk", "300.1.1.1:80"]))
+                path = f"/sources/{protocol.lower()}/{number}.txt"
+                self._source_bodies[path] = ("\n".join(lines) + "\n").encode()
+                source_urls[protocol].append(f"http://127.0.0.1:{port}{path}")
+        return source_urls
+
+    async def close(self) -> None:
+        for server in self.servers:
+            server.close()
+        for dead in self._dead_sockets:
+            dead.close()
+
+    async def _judge(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Juge direct (/get) et listes sources (ETag, réponses 304)."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            path = head.split(b" ", 2)[1].decode("latin-1")
+            body = self._source_bodies.get(path)
+            if body is None:
+                writer.write(_http_response(_judge_body(writer.get_extra_info("peername")[0], head)))
+            else:
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if f"if-none-match: {etag}".encode() in head.lower():
+                    writer.write(_http_response(b"", "304 Not Modified", f"ETag: {etag}\r\n"))
+                else:
+                    writer.write(_http_response(body, extra=f"ETag: {etag}\r\n"))
+            await writer.drain()
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    def _make_handler(self, protocol: str, behaviour: str):
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                peer = writer.get_extra_info("peername")[0]
+                if not peer.startswith("127."):
+                    # Ferme de test : rien n'est servi hors de la boucle locale
+                    return
+                if behaviour == "blackhole":
+                    # Connexion acceptée puis silence jusqu'à l'abandon du client
+                    while await reader.read(4096):
+                        pass
+                    return
+                if behaviour == "garbage":
+                    await reader.read(1)
+                    writer.write(self.rng.randbytes(self.rng.randint(8, 512)))
+                    await writer.drain()
+                    return
+                if behaviour == "slow":
+                    await asyncio.sleep(self.slow_delay)
+                origin = writer.get_extra_info("sockname")[0]
+                await self._serve_proxy(protocol, origin, reader, writer)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                pass
+            finally:
+                writer.close()
+        return handle
+
+    async def _serve_proxy(self, protocol: str, origin: str, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        """Négociation du protocole puis réponse de juge, la ferme tenant lieu de serveur d'origine."""
+        if protocol == "SOCKS5":
+            greeting = await reader.readexactly(2)
+            await reader.readexactly(greeting[1])
+            writer.write(b"\x05\x00")
+            request = await reader.readexactly(4)
+            atyp = request[3]
+            if atyp == 1:
+                await reader.readexactly(4 + 2)
+            elif atyp == 4:
+                await reader.readexactly(16 + 2)
+            else:
+                length = (await reader.readexactly(1))[0]
+                await reader.readexactly(length + 2)
+            writer.write(b"\x05\x00\x00\x01" + socket.inet_aton(origin) + struct.pack(">H", 0))
+        elif protocol == "SOCKS4":
+            request = await reader.readexactly(8)
+            await reader.readuntil(b"\x00")
+            if request[4:7] == b"\x00\x00\x00" and request[7]:
+                # SOCKS4a : nom d'hôte après l'identifiant
+                await reader.readuntil(b"\x00")
+            writer.write(b"\x00\x5a" + b"\x00" * 6)
+        else:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head.startswith(b"CONNECT "):
+                # Requête en forme absolue : réponse directe
+                writer.write(_http_response(_judge_body(origin, head)))
+                await writer.drain()
+                return
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        head = await reader.readuntil(b"\r\n\r\n")
+        writer.write(_http_response(_judge_body(origin, head)))
+        await writer.drain()
+
+
+async def _serve(count: int) -> None:
+    farm = MockFarm(count)
+    config = await farm.start()
+    for protocol in PROTOCOLS:
+        # Un fichier par protocole : les listes IP:PORT ne portent pas le type
+        with open(f"mock_farm_{protocol.lower()}.txt", "w", encoding="utf-8") as file:
+            for proxy in config.proxies:
+                if proxy.protocol == protocol:
+                    file.write(f"{proxy.ip}:{proxy.port}\n")
+    print(f"{count} proxys dans mock_farm_<protocole>.txt, juge {config.judge_url}")
+    for protocol, urls in config.source_urls.items():
+        print(f"Sources {protocol} : {urls[0]} ...")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 3000))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+"""
+Chargement en masse de gros fichiers de proxys.
+Le fichier est projeté en mémoire (mmap) puis analysé par blocs vectorisés
+(NumPy si disponible) directement dans un ProxyPool compact. Les entrées IPv4 gardent
+l'ordre du fichier ; les IPv6, conservées à part par le pool, viennent après.
+"""
+
+import mmap
+import os
+from typing import Optional
+
+from proxy_parser import ParseStats, parse_block, parse_block_offsets
+from proxy_pool import ProxyPool, np, pack_ipv4
+
+# Taille des blocs analysés en une fois (alignés sur une fin de ligne)
+BLOCK_SIZE = 8 << 20
+
+_DOT, _COLON, _NEWLINE, _CR, _ZERO = 46, 58, 10, 13, 48
+
+# Poids par octet : la somme d'une ligne IP:PORT stricte vaut 3 points + 1 deux-points (+ \r éventuel)
+_W_DOT, _W_COLON, _W_CR, _W_OTHER = 1, 16, 256, 4096
+_STRICT_SUM = 3 * _W_DOT + _W_COLON
+
+_weights = None
+
+
+def _byte_weights():
+    """Table des poids par octet, construite au premier chargement vectorisé (numpy importé à ce moment)."""
+    global _weights
+    if _weights is None:
+        _weights = np.full(256, _W_OTHER, dtype=np.int32)
+        _weights[_ZERO:_ZERO + 10] = 0
+        _weights[_DOT] = _W_DOT
+        _weights[_COLON] = _W_COLON
+        _weights[_CR] = _W_CR
+        _weights[_NEWLINE] = 0
+    return _weights
+
+
+def _field_value(data, ends, lengths, max_len: int):
+    """Valeur décimale de champs de chiffres de longueur variable (vectorisé, lu depuis la fin)."""
+    value = np.zeros(len(ends), dtype=np.int32)
+    for offset in range(max_len):
+        digits = data[np.maximum(ends - 1 - offset, 0)].astype(np.int32) - _ZERO
+        value += digits * (lengths > offset) * (10 ** offset)
+    return value
+
+
+def _parse_block_vectorized(block: bytes, pool: ProxyPool, proxy_type: str, stats: ParseStats) -> None:
+    """Analyse vectorisée d'un bloc terminé par une fin de ligne.
+
+    Les lignes IP:PORT strictes sont décodées par NumPy ; les autres (formes étendues,
+    commentaires, erreurs) passent telles quelles par la grammaire complète, puis les
+    deux résultats sont fusionnés dans l'ordre des lignes.
+    """
+    data = np.frombuffer(block, dtype=np.uint8)
+    line_ends = np.flatnonzero(data == _NEWLINE)
+    line_count = len(line_ends)
+    if not line_count:
+        return
+    starts = np.empty(line_count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = line_ends[:-1] + 1
+    ends = line_ends.astype(np.int64)
+    has_cr = (ends > starts) & (data[np.maximum(ends - 1, 0)] == _CR)
+    ends[has_cr] -= 1
+    lengths = ends - starts
+
+    # Candidats : exactement 3 points, 1 deux-points, des chiffres et au plus un \r final
+    line_sums = np.add.reduceat(_byte_weights()[data], starts, dtype=np.int64)
+    candidate = (line_sums == _STRICT_SUM + _W_CR * has_cr) & (lengths >= 9) & (lengths <= 21)
+    cand_index = np.flatnonzero(candidate)
+    cand_starts = starts[cand_index]
+    cand_ends = ends[cand_index]
+
+    separators = np.flatnonzero((data == _DOT) | (data == _COLON))
+    first_sep = np.searchsorted(separators, cand_starts)
+    last_sep = len(separators) - 1
+    sep = [separators[np.minimum(first_sep + k, last_sep)] for k in range(4)]
+    valid = data[sep[3]] == _COLON
+
+    field_starts = [cand_starts, sep[0] + 1, sep[1] + 1, sep[2] + 1, sep[3] + 1]
+    field_ends = [sep[0], sep[1], sep[2], sep[3], cand_ends]
+    values = []
+    for field, (field_start, field_end) in enumerate(zip(field_starts, field_ends)):
+        length = field_end - field_start
+        max_len = 5 if field == 4 else 3
+        valid &= (length >= 1) & (length <= max_len)
+        # Pas de zéro non significatif (même règle que la grammaire)
+        valid &= (length == 1) | (data[np.minimum(field_start, len(data) - 1)] != _ZERO)
+        values.append(_field_value(data, field_end, length, max_len))
+    valid &= (values[0] <= 255) & (values[1] <= 255) & (values[2] <= 255) & (values[3] <= 255)
+    valid &= (values[4] >= 1) & (values[4] <= 65535)
+
+    octets = [value[valid].astype(np.uint32) for value in values[:4]]
+    ips = (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+    ports = values[4][valid]
+    lines = cand_index[valid]
+    stats.lines += len(ips)
+    stats.accepted += len(ips)
+
+    fast = np.zeros(line_count, dtype=bool)
+    fast[lines] = True
+    rest = np.flatnonzero(~fast)
+    ipv6 = []
+    if len(rest):
+        # Lignes restantes intactes (\r compris) : même verdict que la grammaire seule
+        rest_starts, rest_ends = starts[rest], line_ends[rest]
+        text = b"\n".join(block[start:end] for start, end in zip(rest_starts.tolist(), rest_ends.tolist())) + b"\n"
+        found = parse_block_offsets(text, stats)
+        if found:
+            sizes = rest_ends - rest_starts + 1
+            offsets = np.cumsum(sizes) - sizes
+            found_lines = rest[np.searchsorted(offsets, [offset for offset, _, _ in found], side="right") - 1]
+            ipv4 = [(line, ip, port) for line, (_, ip, port) in zip(found_lines.tolist(), found) if ":" not in ip]
+            ipv6 = [(ip, port) for _, ip, port in found if ":" in ip]
+            if ipv4:
+                lines = np.concatenate([lines, np.array([line for line, _, _ in ipv4], dtype=lines.dtype)])
+                ips = np.concatenate([ips, np.array([pack_ipv4(ip) for _, ip, _ in ipv4], dtype=np.uint32)])
+                ports = np.concatenate([ports, np.array([int(port) for _, _, port in ipv4], dtype=ports.dtype)])
+                order = np.argsort(lines, kind="stable")
+                ips, ports = ips[order], ports[order]
+    pool.extend_packed(ips, ports, proxy_type)
+    if ipv6:
+        pool.extend_pairs(ipv6, proxy_type)
+
+
+def load_pool_from_file(filename: str, proxy_type: str = "HTTP", pool: Optional[ProxyPool] = None,
+                        stats: Optional[ParseStats] = None) -> ProxyPool:
+    """Charge un fichier de proxys dans un pool compact (les rejets sont comptés, pas affichés)."""
+    pool = pool if pool is not None else ProxyPool()
+    stats = stats if stats is not None else ParseStats()
+    if os.path.getsize(filename) == 0:
+        return pool
+
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        size = len(mapped)
+        position = 0
+        while position < size:
+            end = min(position + BLOCK_SIZE, size)
+            if end < size:
+                cut = mapped.rfind(b"\n", position, end)
+                end = cut + 1 if cut >= position else (mapped.find(b"\n", end) + 1 or size)
+            block = mapped[position:end]
+            if not block.endswith(b"\n"):
+                block += b"\n"
+            position = end
+
+            if np is None:
+                pool.extend_pairs(parse_block(block, stats), proxy_type)
+                continue
+            _parse_block_vectorized(block, pool, proxy_type, stats)
+    return pool
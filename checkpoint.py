@@ -0,0 +1,99 @@
+"""
+Points de reprise des validations longues.
+Le fichier contient l'empreinte de la liste d'entrée, un bitmap des indices déjà
+testés et les résultats positifs (indice, latence), écrits atomiquement à intervalles.
+"""
+
+import hashlib
+import os
+import struct
+import time
+from array import array
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+from proxy_pool import _uint32_array
+
+CHECKPOINT_SUFFIX = ".ckpt"
+# Intervalle minimal entre deux écritures du point de reprise (secondes)
+CHECKPOINT_INTERVAL = 30.0
+_MAGIC = b"PXCKPT1\0"
+# magic, empreinte sha256, nombre d'entrées, nombre de résultats positifs
+_HEADER = struct.Struct("<8s32sQQ")
+
+
+def fingerprint(proxies: Iterable[Any]) -> bytes:
+    """Empreinte de la liste d'entrée (adresses, types et ordre)."""
+    digest = hashlib.sha256()
+    for proxy in proxies:
+        digest.update(f"{proxy.ip}:{proxy.port}:{proxy.proxy_type.upper()}\n".encode())
+    return digest.digest()
+
+
+class ValidationCheckpoint:
+    """État de progression d'une validation, indexé par position dans la liste d'entrée."""
+
+    def __init__(self, path: str, digest: bytes, total: int):
+        self.path = path
+        self.digest = digest
+        self.total = total
+        self.tested = bytearray((total + 7) // 8)
+        self.tested_count = 0
+        self.working = _uint32_array()
+        self.latencies = array("f")
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, path: str, digest: bytes, total: int) -> Optional["ValidationCheckpoint"]:
+        """Relit un point de reprise ; None s'il est absent, illisible ou d'une autre liste."""
+        checkpoint = cls(path, digest, total)
+        try:
+            with open(path, "rb") as file:
+                magic, saved_digest, saved_total, working_count = _HEADER.unpack(file.read(_HEADER.size))
+                if magic != _MAGIC or saved_digest != digest or saved_total != total:
+                    return None
+                tested = file.read(len(checkpoint.tested))
+                if len(tested) != len(checkpoint.tested):
+                    return None
+                checkpoint.tested[:] = tested
+                checkpoint.working.fromfile(file, working_count)
+                checkpoint.latencies.fromfile(file, working_count)
+        except (OSError, EOFError, struct.error):
+            return None
+        checkpoint.tested_count = sum(bin(byte).count("1") for byte in checkpoint.tested)
+        return checkpoint
+
+    def is_tested(self, index: int) -> bool:
+        return bool(self.tested[index >> 3] & (1 << (index & 7)))
+
+    def mark(self, index: int, ok: bool, latency: Optional[float] = None) -> None:
+        """Enregistre le résultat d'un test et écrit le point de reprise si l'intervalle est écoulé."""
+        if not self.is_tested(index):
+            self.tested[index >> 3] |= 1 << (index & 7)
+            self.tested_count += 1
+            if ok:
+                self.working.append(index)
+                self.latencies.append(latency or 0.0)
+        if time.monotonic() - self._last_save >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def iter_working(self) -> Iterator[Tuple[int, float]]:
+        """Résultats positifs déjà obtenus : (indice, latence)."""
+        return zip(self.working, self.latencies)
+
+    def save(self) -> None:
+        """Écrit le point de reprise (fichier temporaire puis renommage atomique)."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, self.digest, self.total, len(self.working)))
+            file.write(self.tested)
+            self.working.tofile(file)
+            self.latencies.tofile(file)
+        os.replace(tmp_path, self.path)
+        self._last_save = time.monotonic()
+
+    def remove(self) -> None:
+        """Supprime le point de reprise d'une validation terminée."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
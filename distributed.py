@@ -0,0 +1,366 @@
+"""
+Validation distribuée entre plusieurs machines.
+Un coordinateur découpe le pool en baux (plages de proxys) distribués en HTTP à des
+instances ouvrières de l'outil ; un bail non rendu à temps est remis en file, et les
+résultats de tous les ouvriers sont fusionnés dans un seul pool.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib import error as urllib_error
+from urllib import request as urllib_request
+
+from adaptive_concurrency import AdaptiveConcurrency
+from proxy_engine import DEFAULT_TEST_URL, STORE_MODES, validate_proxies_async
+from proxy_pool import Proxy, ProxyPool, remove_duplicates
+
+DEFAULT_COORDINATOR_HOST = "127.0.0.1"
+DEFAULT_COORDINATOR_PORT = 8898
+DEFAULT_LEASE_SIZE = 2000
+# Un bail non renouvelé pendant ce délai est considéré comme perdu (secondes)
+DEFAULT_LEASE_TIMEOUT = 120
+# Attente d'un ouvrier quand tous les baux sont distribués mais pas encore rendus
+POLL_INTERVAL = 2.0
+# Erreurs de connexion consécutives avant qu'un ouvrier abandonne
+MAX_CONNECT_ERRORS = 5
+TOKEN_HEADER = "X-Coordinator-Token"
+
+Entry = Tuple[str, str, str]
+
+
+@dataclass
+class CoordinatorStats:
+    """Compteurs du coordinateur."""
+    total: int = 0
+    leased: int = 0
+    requeued: int = 0
+    completed: int = 0
+    checked: int = 0
+    working: int = 0
+
+
+class _Lease:
+    __slots__ = ("lease_id", "start", "deadline", "worker")
+
+    def __init__(self, lease_id: int, start: int, deadline: float, worker: str):
+        self.lease_id = lease_id
+        self.start = start
+        self.deadline = deadline
+        self.worker = worker
+
+
+class LeaseCoordinator:
+    """Distribution des baux et fusion des résultats (sûr entre threads)."""
+
+    def __init__(self, proxies: List[Any], lease_size: int = DEFAULT_LEASE_SIZE,
+                 lease_timeout: float = DEFAULT_LEASE_TIMEOUT,
+                 geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+                 on_working: Optional[Callable[[Proxy], None]] = None,
+                 token: Optional[str] = None,
+                 on_result: Optional[Callable[[Any, bool, Optional[float]], None]] = None):
+        # Objets d'origine conservés : leurs sources sont créditées dans l'historique de santé
+        self.proxies = remove_duplicates(proxies, by_type=True)
+        self.entries: List[Entry] = [(proxy.ip, str(proxy.port), proxy.proxy_type.upper()) for proxy in self.proxies]
+        self.lease_size = lease_size
+        self.lease_timeout = lease_timeout
+        self.geo_lookup = geo_lookup
+        self.on_working = on_working
+        self.on_result = on_result
+        self.token = token
+        self.pool = ProxyPool()
+        self.stats = CoordinatorStats(total=len(self.entries))
+        self._lock = threading.Lock()
+        # Début de plage des baux à distribuer, en cours et terminés
+        self._pending: Deque[int] = deque(range(0, len(self.entries), lease_size))
+        self.lease_count = len(self._pending)
+        self._active: Dict[int, _Lease] = {}
+        self._issued: Dict[int, int] = {}
+        self._done: Set[int] = set()
+        self._next_id = 1
+        self.finished = threading.Event()
+        if not self.entries:
+            self.finished.set()
+
+    def _requeue_expired(self, now: float) -> None:
+        for lease_id, lease in list(self._active.items()):
+            if lease.deadline < now:
+                # Ouvrier arrêté ou injoignable : la plage repart en tête de file
+                del self._active[lease_id]
+                self._pending.appendleft(lease.start)
+                self.stats.requeued += 1
+
+    def lease(self, worker: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Attribue un bail : ("lease", contenu), ("wait", None) ou ("done", None)."""
+        with self._lock:
+            self._requeue_expired(time.monotonic())
+            while self._pending and self._pending[0] in self._done:
+                self._pending.popleft()
+            if not self._pending:
+                return ("done", None) if self.finished.is_set() else ("wait", None)
+            start = self._pending.popleft()
+            lease = _Lease(self._next_id, start, time.monotonic() + self.lease_timeout, worker)
+            self._next_id += 1
+            self._active[lease.lease_id] = lease
+            self._issued[lease.lease_id] = start
+            self.stats.leased += 1
+            entries = self.entries[start:start + self.lease_size]
+        return "lease", {"lease": lease.lease_id, "timeout": self.lease_timeout, "proxies": entries}
+
+    def renew(self, lease_id: int) -> bool:
+        """Prolonge un bail en cours ; faux s'il a expiré ou est déjà rendu."""
+        with self._lock:
+            lease = self._active.get(lease_id)
+            if lease is None:
+                return False
+            lease.deadline = time.monotonic() + self.lease_timeout
+            return True
+
+    def complete(self, lease_id: int, checked: int, working: List[List[Any]], mode: Optional[str] = None) -> bool:
+        """Fusionne les résultats d'un bail ; ignorés si la plage a déjà été rendue par un autre ouvrier.
+
+        on_result(proxy, ok, latence) reçoit chaque proxy du bail si le profil de l'ouvrier
+        alimente l'historique de santé (STORE_MODES).
+        """
+        merged: List[Proxy] = []
+        found: Dict[Entry, Proxy] = {}
+        with self._lock:
+            start = self._issued.get(lease_id)
+            if start is None or start in self._done:
+                return False
+            self._done.add(start)
+            for other_id, lease in list(self._active.items()):
+                if lease.start == start:
+                    del self._active[other_id]
+            self.stats.completed += 1
+            self.stats.checked += checked
+            end = min(start + self.lease_size, len(self.entries))
+            originals = dict(zip(self.entries[start:end], self.proxies[start:end]))
+            now = datetime.now()
+            for ip, port, proxy_type, latency, anonymity, exit_ip, *rest in working:
+                # Pays annoncé par le juge de l'ouvrier (absent chez un ouvrier plus ancien) ; la base GeoIP locale prime
+                country = rest[0] if rest else None
+                if self.geo_lookup is not None and exit_ip:
+                    country = self.geo_lookup(exit_ip)
+                entry = (ip, str(port), proxy_type.upper())
+                original = originals.get(entry)
+                proxy = Proxy(ip=ip, port=str(port), proxy_type=proxy_type, country=country, speed=latency,
+                              last_checked=now, anonymity=anonymity, exit_ip=exit_ip,
+                              source=getattr(original, "source", None), sources=getattr(original, "sources", ()))
+                self.pool.add_proxy(proxy)
+                merged.append(proxy)
+                found[entry] = proxy
+            self.stats.working += len(merged)
+            if len(self._done) == self.lease_count:
+                self.finished.set()
+        if self.on_working is not None:
+            for proxy in merged:
+                self.on_working(proxy)
+        # Un ouvrier ne rend que des baux testés en entier : les absents de working ont échoué
+        if self.on_result is not None and mode in STORE_MODES and checked >= len(originals):
+            for entry, original in originals.items():
+                proxy = found.get(entry)
+                if proxy is not None:
+                    self.on_result(proxy, True, proxy.speed)
+                else:
+                    self.on_result(original, False, None)
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            status = asdict(self.stats)
+            status.update(pending=len(self._pending), active=len(self._active), finished=self.finished.is_set())
+        return status
+
+
+class _CoordinatorHandler(BaseHTTPRequestHandler):
+    """Protocole JSON : POST /lease, /renew, /results et GET /status."""
+
+    server: "CoordinatorServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, code: int, payload: Optional[Dict[str, Any]] = None) -> None:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        token = self.server.coordinator.token
+        if token and self.headers.get(TOKEN_HEADER) != token:
+            self._reply(403, {"error": "jeton invalide"})
+            return False
+        return True
+
+    def do_GET(self) -> None:
+        if not self._authorized():
+            return
+        if self.path == "/status":
+            self._reply(200, self.server.coordinator.status())
+        else:
+            self._reply(404, {"error": "inconnu"})
+
+    def do_POST(self) -> None:
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "JSON invalide"})
+            return
+        coordinator = self.server.coordinator
+        if self.path == "/lease":
+            state, lease = coordinator.lease(str(payload.get("worker") or self.client_address[0]))
+            if state == "lease":
+                self._reply(200, lease)
+            else:
+                # 204 : revenir plus tard ; 410 : plus rien à valider
+                self._reply(204 if state == "wait" else 410)
+        elif self.path == "/renew":
+            self._reply(200 if coordinator.renew(int(payload.get("lease", 0))) else 410)
+        elif self.path == "/results":
+            accepted = coordinator.complete(int(payload.get("lease", 0)), int(payload.get("checked", 0)),
+                                            payload.get("working") or [], payload.get("mode"))
+            self._reply(200, {"accepted": accepted})
+        else:
+            self._reply(404, {"error": "inconnu"})
+
+
+class CoordinatorServer(ThreadingHTTPServer):
+    """Serveur HTTP du coordinateur."""
+    daemon_threads = True
+
+    def __init__(self, coordinator: LeaseCoordinator, host: str = DEFAULT_COORDINATOR_HOST,
+                 port: int = DEFAULT_COORDINATOR_PORT):
+        self.coordinator = coordinator
+        super().__init__((host, port), _CoordinatorHandler)
+
+
+def run_coordinator(coordinator: LeaseCoordinator, host: str = DEFAULT_COORDINATOR_HOST,
+                    port: int = DEFAULT_COORDINATOR_PORT, should_stop: Optional[Callable[[], bool]] = None,
+                    on_started: Optional[Callable[[CoordinatorServer], None]] = None) -> ProxyPool:
+    """Sert les baux jusqu'à ce que tout soit validé (ou should_stop()) et retourne le pool fusionné."""
+    server = CoordinatorServer(coordinator, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    if on_started is not None:
+        on_started(server)
+    try:
+        while not coordinator.finished.wait(0.2):
+            if should_stop is not None and should_stop():
+                break
+        if coordinator.finished.is_set():
+            # Laisse aux ouvriers le temps d'apprendre qu'il n'y a plus rien à faire
+            time.sleep(POLL_INTERVAL)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return coordinator.pool
+
+
+def _post(base_url: str, path: str, payload: Dict[str, Any], token: Optional[str] = None,
+          timeout: float = 30) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """Requête JSON vers le coordinateur : (code HTTP, corps décodé)."""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers[TOKEN_HEADER] = token
+    request = urllib_request.Request(base_url.rstrip("/") + path, data=json.dumps(payload).encode(), headers=headers, method="POST")
+    try:
+        with urllib_request.urlopen(request, timeout=timeout) as response:
+            body = response.read()
+            return response.status, json.loads(body) if body else None
+    except urllib_error.HTTPError as e:
+        return e.code, None
+
+
+def _renew_loop(base_url: str, lease_id: int, interval: float, token: Optional[str], stop: threading.Event) -> None:
+    """Renouvelle le bail tant que sa validation est en cours."""
+    while not stop.wait(interval):
+        try:
+            _post(base_url, "/renew", {"lease": lease_id}, token)
+        except (OSError, ValueError):
+            pass
+
+
+def run_worker(
+    coordinator_url: str,
+    worker_name: Optional[str] = None,
+    timeout: float = 5,
+    mode: str = "staged",
+    judge_url: Optional[str] = None,
+    test_url: str = DEFAULT_TEST_URL,
+    max_workers: Optional[int] = None,
+    token: Optional[str] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_lease: Optional[Callable[[int, int, int], None]] = None,
+) -> int:
+    """Valide des baux jusqu'à ce que le coordinateur n'en ait plus ; retourne le nombre de proxys testés.
+
+    on_lease(bail, testés, fonctionnels) est appelé après chaque bail rendu.
+    """
+    worker_name = worker_name or f"{socket.gethostname()}-{os.getpid()}"
+    checked_total = 0
+    errors = 0
+    while should_stop is None or not should_stop():
+        try:
+            status, lease = _post(coordinator_url, "/lease", {"worker": worker_name}, token)
+        except (OSError, ValueError):
+            errors += 1
+            if errors >= MAX_CONNECT_ERRORS:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        errors = 0
+        if status == 410:
+            break
+        if status != 200 or not lease:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        proxies = [Proxy(ip=ip, port=port, proxy_type=proxy_type) for ip, port, proxy_type in lease["proxies"]]
+        latencies: Dict[int, Optional[float]] = {}
+        stop_renew = threading.Event()
+        renewer = threading.Thread(
+            target=_renew_loop,
+            args=(coordinator_url, lease["lease"], max(1.0, lease["timeout"] / 3), token, stop_renew),
+            daemon=True,
+        )
+        renewer.start()
+        try:
+            working_proxies = validate_proxies_async(
+                proxies,
+                timeout=timeout,
+                concurrency=max_workers or AdaptiveConcurrency(timeout),
+                on_result=lambda proxy, ok, latency: latencies.__setitem__(id(proxy), latency),
+                should_stop=should_stop,
+                mode=mode,
+                judge_url=judge_url,
+                test_url=test_url,
+            )
+        finally:
+            stop_renew.set()
+        if should_stop is not None and should_stop():
+            # Bail incomplet : non rendu, il sera redistribué à son expiration
+            break
+        working = [[proxy.ip, proxy.port, proxy.proxy_type, latencies.get(id(proxy)), proxy.anonymity, proxy.exit_ip, proxy.country]
+                   for proxy in working_proxies]
+        try:
+            _post(coordinator_url, "/results", {"lease": lease["lease"], "checked": len(proxies), "working": working, "mode": mode}, token)
+        except (OSError, ValueError):
+            continue
+        checked_total += len(proxies)
+        if on_lease is not None:
+            on_lease(lease["lease"], len(proxies), len(working))
+    return checked_total
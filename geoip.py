@@ -0,0 +1,173 @@
+"""
+Géolocalisation hors ligne des proxys.
+Une base locale de plages IPv4 -> pays (CSV) est chargée dans un index trié,
+interrogé par recherche dichotomique, sans aucune requête réseau.
+"""
+
+import bisect
+import csv
+import gzip
+import ipaddress
+import os
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from proxy_pool import ProxyPool, _uint32_array, np, pack_country, pack_ipv4, unpack_country
+
+DEFAULT_GEOIP_PATH = "geoip.csv"
+# Index binaire construit à côté du CSV, rechargé tant que le CSV n'a pas changé
+INDEX_SUFFIX = ".idx"
+_INDEX_MAGIC = b"GEOIDX1\0"
+_INDEX_HEADER = struct.Struct("<8sI")
+
+
+def _parse_address(value: str) -> Optional[int]:
+    """Adresse IPv4 texte ou entière (format ip2location) en entier 32 bits."""
+    value = value.strip()
+    if value.isdigit():
+        number = int(value)
+        return number if number <= 0xFFFFFFFF else None
+    try:
+        return pack_ipv4(value)
+    except OSError:
+        return None
+
+
+def iter_csv_ranges(path: str) -> Iterator[Tuple[int, int, str]]:
+    """Lit les plages (début, fin, pays) d'un CSV GeoIP.
+
+    Formats acceptés : `début,fin,PAYS` (IPv4 texte ou entiers, ex. db-ip / ip2location lite)
+    et `réseau/CIDR,PAYS`. Les lignes IPv6 et les pays inconnus sont ignorés.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        for row in csv.reader(file):
+            if len(row) < 2:
+                continue
+            if "/" in row[0]:
+                try:
+                    network = ipaddress.IPv4Network(row[0].strip(), strict=False)
+                except ValueError:
+                    continue
+                start, end, country = int(network.network_address), int(network.broadcast_address), row[1]
+            else:
+                if len(row) < 3:
+                    continue
+                start, end, country = _parse_address(row[0]), _parse_address(row[1]), row[2]
+                if start is None or end is None:
+                    continue
+            country = country.strip().upper()
+            if len(country) == 2 and country.isalpha() and start <= end:
+                yield start, end, country
+
+
+class GeoIPIndex:
+    """Index trié de plages IPv4 : ~10 octets par plage, recherche en O(log n)."""
+
+    def __init__(self):
+        self.starts = _uint32_array()
+        self.ends = _uint32_array()
+        self.countries = array("H")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "GeoIPIndex":
+        """Construit l'index à partir d'un CSV (trié par début de plage)."""
+        index = cls()
+        for start, end, country in sorted(iter_csv_ranges(path)):
+            index.starts.append(start)
+            index.ends.append(end)
+            index.countries.append(pack_country(country))
+        return index
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_GEOIP_PATH) -> "GeoIPIndex":
+        """Charge l'index binaire s'il est à jour, sinon le reconstruit depuis le CSV."""
+        index_path = path + INDEX_SUFFIX
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(path):
+            try:
+                return cls.read_index(index_path)
+            except (OSError, ValueError, EOFError):
+                pass
+        index = cls.from_csv(path)
+        try:
+            index.write_index(index_path)
+        except OSError:
+            pass
+        return index
+
+    @classmethod
+    def read_index(cls, index_path: str) -> "GeoIPIndex":
+        """Lit un index binaire écrit par write_index."""
+        index = cls()
+        with open(index_path, "rb") as file:
+            magic, count = _INDEX_HEADER.unpack(file.read(_INDEX_HEADER.size))
+            if magic != _INDEX_MAGIC:
+                raise ValueError("Index GeoIP invalide")
+            index.starts.fromfile(file, count)
+            index.ends.fromfile(file, count)
+            index.countries.fromfile(file, count)
+        return index
+
+    def write_index(self, index_path: str) -> None:
+        """Écrit l'index binaire (fichier temporaire puis renommage atomique)."""
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(_INDEX_HEADER.pack(_INDEX_MAGIC, len(self)))
+            self.starts.tofile(file)
+            self.ends.tofile(file)
+            self.countries.tofile(file)
+        os.replace(tmp_path, index_path)
+
+    def lookup_packed(self, value: int) -> int:
+        """Code pays packé d'une IPv4 entière (0 = inconnu)."""
+        position = bisect.bisect_right(self.starts, value) - 1
+        if position >= 0 and value <= self.ends[position]:
+            return self.countries[position]
+        return 0
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """Code pays ISO d'une adresse IPv4, ou None (IPv6 ou plage inconnue)."""
+        try:
+            value = pack_ipv4(ip)
+        except OSError:
+            return None
+        return unpack_country(self.lookup_packed(value))
+
+    def tag_pool(self, pool: ProxyPool, overwrite: bool = False) -> int:
+        """Renseigne la colonne pays de toutes les entrées IPv4 d'un pool ; retourne le nombre de pays trouvés."""
+        if not len(pool.ips) or not len(self):
+            return 0
+        if np is not None:
+            ips = np.frombuffer(pool.ips, dtype=np.uint32)
+            starts = np.frombuffer(self.starts, dtype=np.uint32)
+            positions = np.searchsorted(starts, ips, side="right") - 1
+            clipped = np.maximum(positions, 0)
+            found = (positions >= 0) & (ips <= np.frombuffer(self.ends, dtype=np.uint32)[clipped])
+            codes = np.where(found, np.frombuffer(self.countries, dtype=np.uint16)[clipped], 0).astype(np.uint16)
+            current = np.frombuffer(pool.countries, dtype=np.uint16)
+            if not overwrite:
+                codes = np.where(current != 0, current, codes)
+            pool.countries = array("H", codes.tobytes())
+            return int(np.count_nonzero(found))
+
+        found = 0
+        for position, value in enumerate(pool.ips):
+            code = self.lookup_packed(value)
+            if code:
+                found += 1
+                if overwrite or not pool.countries[position]:
+                    pool.countries[position] = code
+        return found
+
+    def select_countries(self, pool: ProxyPool, countries: Iterable[str]) -> List[int]:
+        """Indices des entrées IPv4 du pool situées dans l'un des pays (colonne pays renseignée au passage)."""
+        self.tag_pool(pool, overwrite=True)
+        codes = {pack_country(country) for country in countries} - {0}
+        if np is not None:
+            column = np.frombuffer(pool.countries, dtype=np.uint16)
+            return np.flatnonzero(np.isin(column, list(codes))).tolist()
+        return [position for position, code in enumerate(pool.countries) if code in codes]
@@ -0,0 +1,274 @@
+"""
+Stockage persistant de l'état de santé des proxys (SQLite).
+Permet de ne revalider que les proxys nouveaux ou dont le dernier test est trop ancien.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_DB_PATH = "proxy_health.db"
+DEFAULT_TTL = 3600
+# Taille des écritures groupées dans la base
+WRITE_BATCH_SIZE = 1000
+# Durée de conservation de l'historique détaillé des tests (table checks)
+DEFAULT_HISTORY_RETENTION = 7 * 24 * 3600
+# Délai minimal entre deux purges de l'historique lors des écritures
+PRUNE_INTERVAL = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxies (
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    proxy_type TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_checked REAL,
+    last_ok INTEGER,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    failure_count INTEGER NOT NULL DEFAULT 0,
+    last_latency REAL,
+    country TEXT,
+    anonymity TEXT,
+    PRIMARY KEY (ip, port, proxy_type)
+);
+CREATE TABLE IF NOT EXISTS checks (
+    ip TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    proxy_type TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS idx_checks_proxy ON checks (ip, port, proxy_type);
+CREATE INDEX IF NOT EXISTS idx_checks_checked_at ON checks (checked_at);
+CREATE INDEX IF NOT EXISTS idx_proxies_last_checked ON proxies (last_checked);
+CREATE TABLE IF NOT EXISTS sources (
+    url TEXT PRIMARY KEY,
+    checked INTEGER NOT NULL DEFAULT 0,
+    alive INTEGER NOT NULL DEFAULT 0,
+    last_checked REAL
+);
+"""
+
+# Colonnes ajoutées à la table sources (bases créées avant leur introduction)
+SOURCE_COLUMNS = {
+    "unique_alive": "INTEGER NOT NULL DEFAULT 0",   # fonctionnels listés par cette seule source
+    "scrapes": "INTEGER NOT NULL DEFAULT 0",
+    "listed": "INTEGER NOT NULL DEFAULT 0",         # entrées cumulées sur tous les scrapings
+    "unique_listed": "INTEGER NOT NULL DEFAULT 0",  # entrées absentes des autres sources
+    "new_listed": "INTEGER NOT NULL DEFAULT 0",     # entrées absentes du scraping précédent
+    "last_scraped": "REAL",
+    "last_changed": "REAL",                         # dernier changement du contenu de la liste
+}
+
+UPSERT_SQL = """
+INSERT INTO proxies (ip, port, proxy_type, first_seen, last_checked, last_ok,
+                     success_count, failure_count, last_latency, country, anonymity)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (ip, port, proxy_type) DO UPDATE SET
+    last_checked = excluded.last_checked,
+    last_ok = excluded.last_ok,
+    success_count = success_count + excluded.success_count,
+    failure_count = failure_count + excluded.failure_count,
+    last_latency = COALESCE(excluded.last_latency, last_latency),
+    country = COALESCE(excluded.country, country),
+    anonymity = COALESCE(excluded.anonymity, anonymity)
+"""
+
+SOURCE_UPSERT_SQL = """
+INSERT INTO sources (url, checked, alive, unique_alive, last_checked) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    checked = checked + excluded.checked,
+    alive = alive + excluded.alive,
+    unique_alive = unique_alive + excluded.unique_alive,
+    last_checked = excluded.last_checked
+"""
+
+SOURCE_SCRAPE_SQL = """
+INSERT INTO sources (url, scrapes, listed, unique_listed, new_listed, last_scraped, last_changed)
+VALUES (?, 1, ?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    scrapes = scrapes + 1,
+    listed = listed + excluded.listed,
+    unique_listed = unique_listed + excluded.unique_listed,
+    new_listed = new_listed + excluded.new_listed,
+    last_scraped = excluded.last_scraped,
+    last_changed = COALESCE(excluded.last_changed, last_changed)
+"""
+
+SOURCE_STATS_COLUMNS = ("checked", "alive", "unique_alive", "scrapes", "listed", "unique_listed",
+                        "new_listed", "last_scraped", "last_changed")
+
+
+def proxy_key(proxy: Any) -> Tuple[str, int, str]:
+    """Clé ip:port:type d'un proxy dans la base."""
+    return proxy.ip, int(proxy.port), proxy.proxy_type.upper()
+
+
+class ProxyHealthStore:
+    """Historique des tests de proxys, partagé entre les exécutions."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, history_retention: Optional[float] = DEFAULT_HISTORY_RETENTION):
+        self.path = path
+        # Historique détaillé purgé au-delà de cette durée (None : conservé sans limite)
+        self.history_retention = history_retention
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        # Résultats par source en attente : url -> [testés, fonctionnels, fonctionnels propres à la source]
+        self._pending_sources: Dict[str, List[int]] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Ajoute les colonnes manquantes d'une base plus ancienne."""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(sources)")}
+        with self._conn:
+            for name, definition in SOURCE_COLUMNS.items():
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE sources ADD COLUMN {name} {definition}")
+
+    def load_fresh(self, ttl: float = DEFAULT_TTL) -> Dict[Tuple[str, int, str], Tuple]:
+        """Retourne les entrées testées il y a moins de `ttl` secondes."""
+        cutoff = time.time() - ttl
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ip, port, proxy_type, last_checked, last_ok, last_latency, country, anonymity "
+                "FROM proxies WHERE last_checked >= ?",
+                (cutoff,),
+            ).fetchall()
+        return {(row[0], row[1], row[2]): row[3:] for row in rows}
+
+    def split_by_freshness(self, proxies: Iterable[Any], ttl: float = DEFAULT_TTL) -> Tuple[List[Any], List[Any], int]:
+        """Sépare les proxys à retester de ceux dont le résultat récent est réutilisable.
+
+        Retourne (à tester, fonctionnels récents, nombre de morts récents).
+        Les fonctionnels récents reçoivent les métadonnées connues.
+        """
+        fresh = self.load_fresh(ttl)
+        to_check = []
+        fresh_alive = []
+        fresh_dead = 0
+        for proxy in proxies:
+            entry = fresh.get(proxy_key(proxy))
+            if entry is None:
+                to_check.append(proxy)
+                continue
+            last_checked, last_ok, latency, country, anonymity = entry
+            if not last_ok:
+                fresh_dead += 1
+                continue
+            proxy.last_checked = datetime.fromtimestamp(last_checked)
+            if latency is not None and getattr(proxy, "speed", None) is None:
+                proxy.speed = latency
+            if country and not getattr(proxy, "country", None):
+                proxy.country = country
+            if anonymity and not getattr(proxy, "anonymity", None):
+                proxy.anonymity = anonymity
+            fresh_alive.append(proxy)
+        return to_check, fresh_alive, fresh_dead
+
+    def record(self, proxy: Any, ok: bool, latency: Optional[float] = None) -> None:
+        """Enregistre le résultat d'un test (écrit par lots)."""
+        ip, port, proxy_type = proxy_key(proxy)
+        now = time.time()
+        row = (
+            ip, port, proxy_type, now, now, int(ok),
+            int(ok), int(not ok), latency if ok else None,
+            getattr(proxy, "country", None), getattr(proxy, "anonymity", None),
+        )
+        # Chaque source qui liste le proxy est créditée ; sources n'est connu qu'après un scraping
+        sources = getattr(proxy, "sources", None)
+        source = getattr(proxy, "source", None)
+        if not sources:
+            sources = (source,) if source else ()
+            unique = False
+        else:
+            unique = len(sources) == 1
+        with self._lock:
+            self._pending.append(row)
+            for url in sources:
+                counts = self._pending_sources.setdefault(url, [0, 0, 0])
+                counts[0] += 1
+                counts[1] += int(ok)
+                counts[2] += int(ok and unique)
+            full = len(self._pending) >= WRITE_BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Écrit les résultats en attente dans la base, puis purge l'historique trop ancien (au plus une fois par heure)."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            sources, self._pending_sources = self._pending_sources, {}
+            if not pending:
+                return
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(UPSERT_SQL, pending)
+                self._conn.executemany(
+                    SOURCE_UPSERT_SQL, [(url, checked, alive, unique_alive, now) for url, (checked, alive, unique_alive) in sources.items()]
+                )
+                self._conn.executemany(
+                    "INSERT INTO checks (ip, port, proxy_type, checked_at, ok, latency) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(row[0], row[1], row[2], row[4], row[5], row[8]) for row in pending],
+                )
+        if self.history_retention and now - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = now
+            self.prune_history(self.history_retention)
+
+    def history_counts(self) -> Dict[Tuple[str, int, str], Tuple[int, int]]:
+        """Succès et échecs cumulés de chaque proxy connu."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ip, port, proxy_type, success_count, failure_count FROM proxies"
+            ).fetchall()
+        return {(row[0], row[1], row[2]): (row[3], row[4]) for row in rows}
+
+    def source_counts(self) -> Dict[str, Tuple[int, int]]:
+        """Proxys fonctionnels et non fonctionnels cumulés par URL source."""
+        with self._lock:
+            rows = self._conn.execute("SELECT url, checked, alive FROM sources").fetchall()
+        return {url: (alive, checked - alive) for url, checked, alive in rows}
+
+    def record_scrape(self, url: str, listed: int, unique_listed: int, new_listed: int,
+                      changed_at: Optional[float] = None) -> None:
+        """Enregistre le contenu d'une source lors d'un scraping (rendement, recouvrement, fraîcheur)."""
+        with self._lock, self._conn:
+            self._conn.execute(SOURCE_SCRAPE_SQL, (url, listed, unique_listed, new_listed, time.time(), changed_at))
+
+    def source_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques cumulées de chaque source connue."""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT url, {', '.join(SOURCE_STATS_COLUMNS)} FROM sources").fetchall()
+        return {row[0]: dict(zip(SOURCE_STATS_COLUMNS, row[1:])) for row in rows}
+
+    def prune_history(self, max_age: float) -> int:
+        """Supprime l'historique des tests plus ancien que `max_age` secondes."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM checks WHERE checked_at < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+    def stats(self, proxy: Any) -> Optional[Dict[str, Any]]:
+        """Retourne les statistiques connues d'un proxy."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT first_seen, last_checked, last_ok, success_count, failure_count, last_latency, country, anonymity "
+                "FROM proxies WHERE ip = ? AND port = ? AND proxy_type = ?",
+                proxy_key(proxy),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("first_seen", "last_checked", "last_ok", "success_count", "failure_count", "last_latency", "country", "anonymity")
+        return dict(zip(keys, row))
+
+    def close(self) -> None:
+        """Écrit les résultats en attente et ferme la base."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
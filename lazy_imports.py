@@ -0,0 +1,41 @@
+"""
+Imports différés des dépendances lourdes (requests, numpy) ou propres au mode
+interactif (colorama, fade) : une invocation en ligne de commande ne paie que
+ce qu'elle utilise réellement.
+"""
+
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Any, Callable, Optional
+
+
+class LazyModule:
+    """Module (ou attribut de module) importé au premier accès à l'un de ses attributs."""
+
+    def __init__(self, name: str, attribute: Optional[str] = None,
+                 setup: Optional[Callable[[ModuleType], None]] = None):
+        self._name = name
+        self._attribute = attribute
+        self._setup = setup
+        self._target: Any = None
+
+    def _load(self) -> Any:
+        if self._target is None:
+            module = importlib.import_module(self._name)
+            if self._setup is not None:
+                self._setup(module)
+            self._target = getattr(module, self._attribute) if self._attribute else module
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+
+def optional_module(name: str) -> Optional[LazyModule]:
+    """Module différé s'il est installé, sinon None (dépendance optionnelle)."""
+    return LazyModule(name) if importlib.util.find_spec(name) is not None else None
+
+
+# Couleurs du terminal : colorama n'est importé et initialisé qu'au premier affichage
+Fore = LazyModule("colorama", "Fore", setup=lambda colorama: colorama.init(autoreset=True))
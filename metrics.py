@@ -0,0 +1,369 @@
+"""
+Compteurs, jauges et histogrammes du pipeline (sources, analyse, déduplication, tests).
+Le registre s'expose au format texte Prometheus (/metrics) ou en JSON, servi en HTTP
+ou écrit périodiquement dans un fichier. La progression affichée est rendue par un
+thread à part : le chemin chaud ne fait qu'incrémenter des compteurs.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_METRICS_HOST = "127.0.0.1"
+DEFAULT_METRICS_PORT = 9464
+DEFAULT_DUMP_INTERVAL = 10.0
+DEFAULT_PROGRESS_INTERVAL = 1.0
+# Bornes des histogrammes de durée (secondes)
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+# Issues d'un test de proxy
+CHECK_OUTCOMES = ("ok", "timeout", "refused", "bad_status", "protocol", "error")
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Métrique nommée, une série par combinaison de valeurs d'étiquettes."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+
+class Counter(_Metric):
+    """Compteur monotone."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, snapshot: Dict[LabelValues, Any]) -> None:
+        with self._lock:
+            for key, value in snapshot.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Gauge(Counter):
+    """Valeur instantanée (tests en vol, dernier taux de doublons...)."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def merge(self, snapshot: Dict[LabelValues, Any]) -> None:
+        # Les jauges d'un autre processus ne s'additionnent pas
+        pass
+
+
+class Histogram(_Metric):
+    """Distribution cumulée par tranches, avec somme et nombre d'observations."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # Par série : [compte par tranche..., somme, nombre]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", _format_labels(self.labels, key, f'le="{_format_value(bound)}"'), cumulative))
+                samples.append((f"{self.name}_sum", _format_labels(self.labels, key), series[-2]))
+                samples.append((f"{self.name}_count", _format_labels(self.labels, key), series[-1]))
+        return samples
+
+    def snapshot(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def merge(self, snapshot: Dict[LabelValues, Any]) -> None:
+        with self._lock:
+            for key, values in snapshot.items():
+                series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+                for index, value in enumerate(values):
+                    series[index] += value
+
+
+class MetricsRegistry:
+    """Ensemble des métriques d'un processus."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render_prometheus(self) -> str:
+        """Format d'exposition texte de Prometheus."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Vue JSON : une entrée par série, avec ses étiquettes et sa valeur."""
+        result: Dict[str, Any] = {"timestamp": time.time()}
+        for metric in list(self._metrics.values()):
+            series = []
+            for key, value in sorted(metric.snapshot().items()):
+                if isinstance(metric, Histogram):
+                    # Comptes par tranche (la dernière, sans borne, est omise des bornes), somme et nombre
+                    value = {"buckets": value[:-2], "sum": value[-2], "count": value[-1]}
+                series.append({"labels": dict(zip(metric.labels, key)), "value": value})
+            entry: Dict[str, Any] = {"type": metric.kind, "series": series}
+            if isinstance(metric, Histogram):
+                entry["bounds"] = list(metric.buckets[:-1])
+            result[metric.name] = entry
+        return result
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, Any]]:
+        """Valeurs transmissibles à un autre processus (voir merge)."""
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+    def merge(self, snapshot: Dict[str, Dict[LabelValues, Any]]) -> None:
+        """Ajoute les compteurs et histogrammes d'un processus de validation."""
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+
+REGISTRY = MetricsRegistry()
+
+# Métriques du pipeline
+SOURCE_FETCH_SECONDS = REGISTRY.histogram("scproxy_source_fetch_seconds", "Durée de téléchargement et d'analyse d'une source", ("source",))
+SOURCE_FETCHES = REGISTRY.counter("scproxy_source_fetches_total", "Téléchargements de sources par statut (200, 304, error)", ("source", "status"))
+SOURCE_LINES = REGISTRY.counter("scproxy_source_lines_total", "Lignes analysées par source", ("source",))
+SOURCE_REJECTED = REGISTRY.counter("scproxy_source_rejected_lines_total", "Lignes rejetées par source", ("source",))
+DEDUPE_INPUT = REGISTRY.counter("scproxy_dedupe_input_total", "Proxys soumis à la déduplication", ("proxy_type",))
+DEDUPE_UNIQUE = REGISTRY.counter("scproxy_dedupe_unique_total", "Proxys uniques après déduplication", ("proxy_type",))
+DEDUPE_RATIO = REGISTRY.gauge("scproxy_dedupe_ratio", "Part de doublons lors du dernier scraping", ("proxy_type",))
+CHECKS_IN_FLIGHT = REGISTRY.gauge("scproxy_checks_in_flight", "Tests de proxys en cours")
+CHECK_SECONDS = REGISTRY.histogram("scproxy_check_duration_seconds", "Durée des tests de proxys par issue", ("outcome",))
+SOURCE_CHECKS = REGISTRY.counter("scproxy_source_checks_total", "Proxys testés par source et résultat (alive, dead)", ("source", "result"))
+
+
+def record_dedupe(proxy_type: str, before: int, after: int) -> None:
+    """Compte une déduplication et publie sa part de doublons."""
+    DEDUPE_INPUT.inc(before, proxy_type=proxy_type)
+    DEDUPE_UNIQUE.inc(after, proxy_type=proxy_type)
+    DEDUPE_RATIO.set(1 - after / before if before else 0.0, proxy_type=proxy_type)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics (texte Prometheus) et /metrics.json."""
+
+    server: "MetricsServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            body = self.server.registry.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(self.server.registry.to_dict()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serveur HTTP d'exposition des métriques."""
+    daemon_threads = True
+
+    def __init__(self, registry: MetricsRegistry, host: str = DEFAULT_METRICS_HOST, port: int = DEFAULT_METRICS_PORT):
+        self.registry = registry
+        super().__init__((host, port), _MetricsHandler)
+
+
+def start_metrics_server(host: str = DEFAULT_METRICS_HOST, port: int = DEFAULT_METRICS_PORT,
+                         registry: MetricsRegistry = REGISTRY) -> MetricsServer:
+    """Expose le registre en arrière-plan ; server.shutdown() l'arrête."""
+    server = MetricsServer(registry, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_metrics_json(path: str, registry: MetricsRegistry = REGISTRY) -> None:
+    """Écrit le registre en JSON (fichier temporaire puis renommage atomique)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(registry.to_dict(), file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def start_json_dump(path: str, interval: float = DEFAULT_DUMP_INTERVAL,
+                    registry: MetricsRegistry = REGISTRY) -> Callable[[], None]:
+    """Écrit le registre toutes les `interval` secondes ; la fonction retournée arrête l'écriture
+    après un dernier passage avec les valeurs finales."""
+    stop_event = threading.Event()
+
+    def dump() -> None:
+        while not stop_event.wait(interval):
+            write_metrics_json(path, registry)
+        write_metrics_json(path, registry)
+
+    thread = threading.Thread(target=dump, daemon=True)
+    thread.start()
+
+    def stop() -> None:
+        stop_event.set()
+        thread.join()
+
+    return stop
+
+
+class ProgressReporter:
+    """Progression d'une validation, rendue périodiquement par un thread dédié.
+
+    Le chemin chaud n'appelle que record(ok) ; render(reporter) est appelé toutes les
+    `interval` secondes puis une dernière fois à l'arrêt.
+    """
+
+    def __init__(self, total: int, render: Callable[["ProgressReporter"], None],
+                 interval: float = DEFAULT_PROGRESS_INTERVAL):
+        self.total = total
+        self.completed = 0
+        self.working = 0
+        self.render = render
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self._last_completed = 0
+        self._last_time = self.start_time
+        # Débit sur le dernier intervalle (proxys/s)
+        self.rate = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, ok: bool) -> None:
+        # Appelé depuis un seul thread (boucle asyncio ou processus principal) : pas de verrou
+        self.completed += 1
+        if ok:
+            self.working += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_time
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        completed = self.completed
+        if now > self._last_time:
+            self.rate = (completed - self._last_completed) / (now - self._last_time)
+        self._last_completed = completed
+        self._last_time = now
+        self.render(self)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._tick()
+
+    def __enter__(self) -> "ProgressReporter":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # Dernier rendu : débit moyen sur toute la validation
+        self._last_completed = 0
+        self._last_time = self.start_time
+        self._tick()
@@ -0,0 +1,232 @@
+"""
+API de requête sur le pool validé.
+Chaque instantané du pool est indexé une fois par (type, pays, tranche de latence) :
+une requête comme « 10 SOCKS5 en DE sous 300 ms, sauf ceux-ci » ne lit que les
+entrées des tranches concernées, jamais le pool entier. La revalidation construit un
+nouvel instantané à côté et le publie par simple remplacement de référence.
+"""
+
+import bisect
+import json
+import math
+import threading
+from array import array
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from proxy_pool import Proxy
+from result_writer import proxy_to_dict
+
+DEFAULT_QUERY_HOST = "127.0.0.1"
+DEFAULT_QUERY_PORT = 8897
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 1000
+# Bornes supérieures des tranches de latence (secondes) ; la dernière reçoit aussi les latences inconnues
+LATENCY_BUCKETS = (0.1, 0.2, 0.3, 0.5, 1.0, 2.0, 5.0, math.inf)
+UNKNOWN_COUNTRY = "??"
+
+# (type ou None, pays ou None, tranche) : None indexe « tous les types » / « tous les pays »
+IndexKey = Tuple[Optional[str], Optional[str], int]
+
+
+def latency_bucket(latency: float) -> int:
+    """Tranche de latence contenant la valeur."""
+    return bisect.bisect_left(LATENCY_BUCKETS, latency)
+
+
+class PoolIndex:
+    """Instantané immuable du pool, indexé par type, pays et tranche de latence."""
+
+    def __init__(self, proxies: Iterable[Any]):
+        self.entries: List[Any] = list(proxies)
+        self.latencies = array("d", (proxy.speed if proxy.speed is not None else math.inf for proxy in self.entries))
+        lists: Dict[IndexKey, array] = defaultdict(lambda: array("I"))
+        # Parcours par latence croissante : chaque liste d'index est déjà triée
+        for position in sorted(range(len(self.entries)), key=self.latencies.__getitem__):
+            proxy = self.entries[position]
+            proxy_type = proxy.proxy_type.upper()
+            country = (proxy.country or UNKNOWN_COUNTRY).upper()
+            bucket = latency_bucket(self.latencies[position])
+            for key in ((proxy_type, country, bucket), (proxy_type, None, bucket),
+                        (None, country, bucket), (None, None, bucket)):
+                lists[key].append(position)
+        self._index: Dict[IndexKey, array] = dict(lists)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def query(self, proxy_type: Optional[str] = None, country: Optional[str] = None,
+              max_latency: Optional[float] = None, limit: int = DEFAULT_LIMIT,
+              exclude: Optional[Set[str]] = None) -> List[Any]:
+        """Les `limit` proxys les plus rapides correspondant aux critères, hors adresses IP:PORT exclues."""
+        proxy_type = proxy_type.upper() if proxy_type else None
+        country = country.upper() if country else None
+        max_latency = math.inf if max_latency is None else max_latency
+        results: List[Any] = []
+        for bucket, upper in enumerate(LATENCY_BUCKETS):
+            positions = self._index.get((proxy_type, country, bucket))
+            if positions:
+                # Seule la tranche qui contient la borne demande de comparer les latences
+                check_latency = upper > max_latency
+                for position in positions:
+                    if check_latency and self.latencies[position] > max_latency:
+                        break
+                    proxy = self.entries[position]
+                    if exclude and f"{proxy.ip}:{proxy.port}" in exclude:
+                        continue
+                    results.append(proxy)
+                    if len(results) >= limit:
+                        return results
+            if upper >= max_latency:
+                break
+        return results
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Nombre de proxys par type et par pays, lu sur les index."""
+        by_type: Dict[str, int] = defaultdict(int)
+        by_country: Dict[str, int] = defaultdict(int)
+        for (proxy_type, country, _), positions in self._index.items():
+            if proxy_type is not None and country is None:
+                by_type[proxy_type] += len(positions)
+            elif proxy_type is None and country is not None:
+                by_country[country] += len(positions)
+        return {"types": dict(by_type), "countries": dict(by_country)}
+
+
+class PoolQueryService:
+    """Point d'accès au dernier instantané indexé ; update() le remplace sans bloquer les lectures."""
+
+    def __init__(self, proxies: Iterable[Any] = ()):
+        self.index = PoolIndex(proxies)
+        self.version = 1
+        self._update_lock = threading.Lock()
+
+    def update(self, proxies: Iterable[Any]) -> None:
+        """Indexe le nouveau pool puis le publie (copie sur écriture)."""
+        index = PoolIndex(proxies)
+        with self._update_lock:
+            # Une lecture en cours garde sa référence sur l'ancien instantané
+            self.index = index
+            self.version += 1
+
+    def query(self, **criteria: Any) -> List[Any]:
+        return self.index.query(**criteria)
+
+    def status(self) -> Dict[str, Any]:
+        index = self.index
+        return {"version": self.version, "total": len(index), **index.counts()}
+
+
+def parse_exclude(values: Iterable[str]) -> Set[str]:
+    """Adresses IP:PORT à exclure, séparées par des virgules ou répétées."""
+    return {address.strip() for value in values for address in value.split(",") if address.strip()}
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """GET /proxies?type=&country=&max_latency_ms=&limit=&exclude=, POST /proxies (mêmes clés en JSON), GET /status."""
+
+    server: "PoolQueryServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _reply(self, code: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer(self, criteria: Dict[str, Any]) -> None:
+        try:
+            limit = min(int(criteria.get("limit") or DEFAULT_LIMIT), MAX_LIMIT)
+            max_latency_ms = criteria.get("max_latency_ms")
+            max_latency = float(max_latency_ms) / 1000 if max_latency_ms not in (None, "") else None
+        except (TypeError, ValueError):
+            self._reply(400, {"error": "limit et max_latency_ms doivent être numériques"})
+            return
+        exclude = criteria.get("exclude") or []
+        proxies = self.server.service.query(
+            proxy_type=criteria.get("type") or None,
+            country=criteria.get("country") or None,
+            max_latency=max_latency,
+            limit=limit,
+            exclude=parse_exclude([exclude] if isinstance(exclude, str) else exclude),
+        )
+        self._reply(200, {"count": len(proxies), "proxies": [proxy_to_dict(proxy) for proxy in proxies]})
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/status":
+            self._reply(200, self.server.service.status())
+        elif url.path == "/proxies":
+            params = parse_qs(url.query)
+            criteria: Dict[str, Any] = {name: values[-1] for name, values in params.items()}
+            criteria["exclude"] = params.get("exclude", [])
+            self._answer(criteria)
+        else:
+            self._reply(404, {"error": "inconnu"})
+
+    def do_POST(self) -> None:
+        # Longues listes d'exclusion : critères dans un corps JSON
+        if urlparse(self.path).path != "/proxies":
+            self._reply(404, {"error": "inconnu"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            criteria = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._reply(400, {"error": "JSON invalide"})
+            return
+        if not isinstance(criteria, dict):
+            self._reply(400, {"error": "objet JSON attendu"})
+            return
+        self._answer(criteria)
+
+
+class PoolQueryServer(ThreadingHTTPServer):
+    """Serveur HTTP de l'API de requête."""
+    daemon_threads = True
+
+    def __init__(self, service: PoolQueryService, host: str = DEFAULT_QUERY_HOST, port: int = DEFAULT_QUERY_PORT):
+        self.service = service
+        super().__init__((host, port), _QueryHandler)
+
+
+def start_query_server(service: PoolQueryService, host: str = DEFAULT_QUERY_HOST,
+                       port: int = DEFAULT_QUERY_PORT) -> PoolQueryServer:
+    """Démarre l'API dans un thread d'arrière-plan ; server.shutdown() l'arrête."""
+    server = PoolQueryServer(service, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def iter_result_records(filename: str) -> Iterator[Dict[str, Any]]:
+    """Objets d'un fichier de résultats JSON (tableau) ou JSONL."""
+    with open(filename, encoding="utf-8") as file:
+        first = file.read(1)
+        while first.isspace():
+            first = file.read(1)
+        if first == "[":
+            yield from json.loads(first + file.read())
+            return
+        file.seek(0)
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_results(filename: str) -> List[Proxy]:
+    """Proxys validés relus depuis une sortie JSON/JSONL (type, pays et latence conservés)."""
+    proxies = []
+    for record in iter_result_records(filename):
+        proxy = Proxy(ip=record["ip"], port=str(record["port"]), proxy_type=record.get("type") or "HTTP")
+        proxy.country = record.get("country")
+        proxy.speed = record.get("speed")
+        proxy.anonymity = record.get("anonymity")
+        proxy.exit_ip = record.get("exit_ip")
+        proxies.append(proxy)
+    return proxies
@@ -0,0 +1,934 @@
+"""
+Moteur de validation asynchrone des proxys.
+Garde des milliers de tests en vol dans un seul processus au lieu d'un thread par proxy.
+"""
+
+import asyncio
+import ipaddress
+import json
+import re
+import socket
+import statistics
+import ssl
+import struct
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from adaptive_concurrency import AdaptiveConcurrency
+from metrics import CHECK_SECONDS, CHECKS_IN_FLIGHT
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TEST_URL = "http://httpbin.org/ip"
+# Juge : renvoie l'IP vue par le serveur et les en-têtes reçus (JSON httpbin ou texte type azenv)
+DEFAULT_JUDGE_URL = "http://httpbin.org/get"
+# Cible du profil https : tunnel CONNECT (ou SOCKS) puis TLS jusqu'au serveur
+DEFAULT_HTTPS_URL = "https://httpbin.org/ip"
+DEFAULT_CONCURRENCY = 500
+DEFAULT_HANDSHAKE_TIMEOUT = 3
+# Période de la surveillance d'une validation (interruption, on_tick)
+TICK_INTERVAL = 0.2
+
+# Profils de validation : requête complète, handshake seul, handshake puis requête complète,
+# tunnel HTTPS jusqu'à une cible TLS, ou simple requête vers une URL cible choisie
+VALIDATION_MODES = ("full", "handshake", "staged", "https", "url")
+# Étapes d'un profil : handshake du protocole, sonde du juge, requête vers une URL (statut 200 attendu)
+STAGE_KINDS = ("handshake", "judge", "request")
+# Profils dont le succès prouve que le proxy relaie vers le juge : eux seuls alimentent l'historique de santé
+STORE_MODES = ("full", "staged")
+# Échantillons de latence par proxy pour le test de vitesse
+DEFAULT_SAMPLES = 5
+MAX_RESPONSE_SIZE = 65536
+USER_AGENT = "Mozilla/5.0 (ScProxy)"
+
+# En-têtes ajoutés par un proxy qui trahissent son utilisation
+REVEALING_HEADERS = frozenset((
+    "via", "forwarded", "forwarded-for", "x-forwarded-for", "x-forwarded", "x-real-ip",
+    "client-ip", "x-client-ip", "x-originating-ip", "proxy-client-ip", "wl-proxy-client-ip",
+    "x-proxy-id", "proxy-connection", "x-proxy-connection", "x-bluecoat-via",
+))
+
+# Séparateurs des adresses dans une valeur d'en-tête (X-Forwarded-For, Forwarded, Via, ...)
+_ADDRESS_SEPARATORS = re.compile(r"[,;\s]+")
+
+# Descripteurs gardés en réserve pour le reste du processus (fichiers, DNS, ...)
+FD_RESERVE = 64
+
+
+class ProxyCheckError(Exception):
+    """Erreur de protocole lors du dialogue avec un proxy."""
+
+
+@dataclass
+class HttpResponse:
+    """Réponse HTTP minimale lue à travers un proxy."""
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+
+@dataclass(frozen=True)
+class CheckStage:
+    """Étape d'un profil de validation ; le proxy passe à l'étape suivante s'il la réussit."""
+    kind: str
+    url: str
+    # Délai propre à l'étape (sinon celui de la validation)
+    timeout: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class CheckProfile:
+    """Suite d'étapes appliquée à chaque proxy ; la latence retenue est celle de la dernière."""
+    name: str
+    stages: Tuple[CheckStage, ...]
+
+
+@dataclass
+class ProbeResult:
+    """Résultat d'une sonde unique à travers un proxy, via un juge."""
+    ok: bool
+    latency: Optional[float] = None
+    status: Optional[int] = None
+    exit_ip: Optional[str] = None
+    anonymity: Optional[str] = None
+    country: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    # ok, timeout, refused, bad_status, protocol ou error
+    outcome: str = "ok"
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Percentile par interpolation linéaire sur des valeurs triées."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@dataclass
+class LatencyProfile:
+    """Échantillons de latence d'un proxy, par phase (secondes, horloge monotone)."""
+    connect: List[float] = field(default_factory=list)
+    handshake: List[float] = field(default_factory=list)
+    ttfb: List[float] = field(default_factory=list)
+    total: List[float] = field(default_factory=list)
+    failures: int = 0
+    body: Optional[bytes] = None
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.total)
+
+    @property
+    def p50(self) -> Optional[float]:
+        return _percentile(self.total, 0.5) if self.total else None
+
+    @property
+    def p95(self) -> Optional[float]:
+        return _percentile(self.total, 0.95) if self.total else None
+
+    @property
+    def jitter(self) -> Optional[float]:
+        """Écart moyen entre deux mesures consécutives."""
+        if len(self.total) < 2:
+            return 0.0 if self.total else None
+        return statistics.fmean(abs(b - a) for a, b in zip(self.total, self.total[1:]))
+
+    def phases(self) -> Dict[str, float]:
+        """Médiane de chaque phase mesurée."""
+        return {
+            name: statistics.median(values)
+            for name, values in (("connect", self.connect), ("handshake", self.handshake), ("ttfb", self.ttfb), ("total", self.total))
+            if values
+        }
+
+
+@lru_cache(maxsize=64)
+def split_url(url: str) -> Tuple[str, str, int, str]:
+    """Découpe une URL en (scheme, host, port, chemin)."""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return scheme, parts.hostname or "", port, path
+
+
+def effective_concurrency(requested: int) -> int:
+    """Borne la concurrence demandée par la limite de descripteurs de fichiers."""
+    if resource is None:
+        return requested
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        wanted = requested + FD_RESERVE
+        if soft != resource.RLIM_INFINITY and soft < wanted:
+            new_soft = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+            soft = new_soft
+        if soft == resource.RLIM_INFINITY:
+            return requested
+        return max(1, min(requested, soft - FD_RESERVE))
+    except (ValueError, OSError):
+        return requested
+
+
+# Cache DNS partagé (SOCKS4 ne transporte que des adresses IPv4)
+_dns_cache: Dict[str, str] = {}
+
+
+async def _resolve_ipv4(host: str) -> str:
+    """Résout un nom d'hôte en IPv4 avec cache."""
+    cached = _dns_cache.get(host)
+    if cached:
+        return cached
+    try:
+        socket.inet_aton(host)
+        return host
+    except OSError:
+        pass
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+    address = infos[0][4][0]
+    _dns_cache[host] = address
+    return address
+
+
+def _socks5_address(host: str) -> bytes:
+    """Encode l'adresse de destination d'une requête SOCKS5."""
+    try:
+        return b"\x01" + socket.inet_pton(socket.AF_INET, host)
+    except OSError:
+        pass
+    try:
+        return b"\x04" + socket.inet_pton(socket.AF_INET6, host)
+    except OSError:
+        pass
+    encoded = host.encode("idna")
+    return b"\x03" + bytes([len(encoded)]) + encoded
+
+
+async def _socks5_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, port: int) -> None:
+    """Négociation SOCKS5 sans authentification puis CONNECT."""
+    writer.write(b"\x05\x01\x00")
+    await writer.drain()
+    reply = await reader.readexactly(2)
+    if reply[0] != 5 or reply[1] != 0:
+        raise ProxyCheckError("SOCKS5: méthode d'authentification refusée")
+
+    writer.write(b"\x05\x01\x00" + _socks5_address(host) + struct.pack(">H", port))
+    await writer.drain()
+    reply = await reader.readexactly(4)
+    if reply[0] != 5 or reply[1] != 0:
+        raise ProxyCheckError(f"SOCKS5: connexion refusée (code {reply[1]})")
+
+    # Consommer l'adresse liée renvoyée par le proxy
+    atyp = reply[3]
+    if atyp == 1:
+        await reader.readexactly(4 + 2)
+    elif atyp == 4:
+        await reader.readexactly(16 + 2)
+    elif atyp == 3:
+        length = (await reader.readexactly(1))[0]
+        await reader.readexactly(length + 2)
+    else:
+        raise ProxyCheckError("SOCKS5: type d'adresse inconnu")
+
+
+async def _socks4_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, port: int) -> None:
+    """Requête SOCKS4 CONNECT."""
+    address = await _resolve_ipv4(host)
+    writer.write(struct.pack(">BBH", 4, 1, port) + socket.inet_aton(address) + b"\x00")
+    await writer.drain()
+    reply = await reader.readexactly(8)
+    if reply[0] != 0 or reply[1] != 0x5A:
+        raise ProxyCheckError(f"SOCKS4: connexion refusée (code {reply[1]})")
+
+
+def _parse_head(head: bytes) -> Tuple[int, Dict[str, str]]:
+    """Analyse la ligne de statut et les en-têtes d'une réponse HTTP."""
+    lines = head.decode("latin-1").split("\r\n")
+    status_line = lines[0].split(" ", 2)
+    if len(status_line) < 2 or not status_line[0].startswith("HTTP/"):
+        raise ProxyCheckError("Réponse HTTP invalide")
+    try:
+        status = int(status_line[1])
+    except ValueError:
+        raise ProxyCheckError("Code de statut HTTP invalide")
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    """Lit l'en-tête d'une réponse HTTP."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise ProxyCheckError("En-tête HTTP incomplet")
+    return _parse_head(head)
+
+
+async def _http_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, port: int, require_ok: bool = True) -> int:
+    """Ouverture d'un tunnel HTTP CONNECT, retourne le statut du proxy."""
+    authority = f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+    writer.write(f"CONNECT {authority} HTTP/1.1\r\nHost: {authority}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    status, _ = await _read_head(reader)
+    if require_ok and status != 200:
+        raise ProxyCheckError(f"CONNECT refusé (statut {status})")
+    return status
+
+
+async def _negotiate(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, proxy: Any, host: str, port: int, require_ok: bool = True) -> None:
+    """Négociation du tunnel vers host:port selon le type du proxy."""
+    proxy_type = proxy.proxy_type.upper()
+    if proxy_type == "SOCKS5":
+        await _socks5_connect(reader, writer, host, port)
+    elif proxy_type == "SOCKS4":
+        await _socks4_connect(reader, writer, host, port)
+    else:
+        await _http_connect(reader, writer, host, port, require_ok=require_ok)
+
+
+async def open_tunnel(proxy: Any, host: str, port: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Ouvre un tunnel TCP vers host:port à travers le proxy selon son type."""
+    reader, writer = await asyncio.open_connection(proxy.ip, int(proxy.port))
+    try:
+        await _negotiate(reader, writer, proxy, host, port)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer
+
+
+_ssl_context: Optional[ssl.SSLContext] = None
+
+
+def _get_ssl_context() -> ssl.SSLContext:
+    """Contexte TLS partagé par toutes les connexions."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+async def _open_phased(proxy: Any, url: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, str, float, float]:
+    """Ouvre la connexion adaptée à l'URL.
+
+    Retourne (reader, writer, cible de la ligne de requête, durée TCP, durée de négociation).
+    """
+    scheme, host, port, path = split_url(url)
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(proxy.ip, int(proxy.port))
+    connected = time.perf_counter()
+    if scheme == "http" and proxy.proxy_type.upper() == "HTTP":
+        # Proxy HTTP classique : requête en forme absolue, sans tunnel
+        return reader, writer, url, connected - start, 0.0
+
+    try:
+        await _negotiate(reader, writer, proxy, host, port)
+        if scheme == "https":
+            await writer.start_tls(_get_ssl_context(), server_hostname=host)
+    except BaseException:
+        writer.close()
+        raise
+    return reader, writer, path, connected - start, time.perf_counter() - connected
+
+
+async def _open_for_url(proxy: Any, url: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, str]:
+    """Ouvre la connexion adaptée à l'URL et retourne la cible de la ligne de requête."""
+    reader, writer, target, _, _ = await _open_phased(proxy, url)
+    return reader, writer, target
+
+
+def _build_request(url: str, target: str, keep_alive: bool = False) -> bytes:
+    """Construit une requête GET minimale."""
+    _, host, port, _ = split_url(url)
+    connection = "keep-alive" if keep_alive else "close"
+    return (
+        f"GET {target} HTTP/1.1\r\n"
+        f"Host: {host}\r\n"
+        f"User-Agent: {USER_AGENT}\r\n"
+        f"Accept: */*\r\n"
+        f"Connection: {connection}\r\n\r\n"
+    ).encode("latin-1")
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    """Lit le corps d'une réponse HTTP (taille bornée)."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        size = 0
+        while size < MAX_RESPONSE_SIZE:
+            line = await reader.readuntil(b"\r\n")
+            length = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            if length == 0:
+                await reader.readuntil(b"\r\n")
+                break
+            chunks.append(await reader.readexactly(length))
+            await reader.readexactly(2)
+            size += length
+        return b"".join(chunks)
+
+    length = headers.get("content-length")
+    if length is not None and length.isdigit():
+        return await reader.readexactly(min(int(length), MAX_RESPONSE_SIZE))
+
+    # Ni longueur ni découpage : le corps s'arrête à la fermeture de la connexion
+    chunks = []
+    size = 0
+    while size < MAX_RESPONSE_SIZE:
+        chunk = await reader.read(MAX_RESPONSE_SIZE - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+
+async def _exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, url: str, target: str, read_body: bool) -> HttpResponse:
+    """Envoie la requête GET sur une connexion ouverte et lit la réponse."""
+    try:
+        writer.write(_build_request(url, target))
+        await writer.drain()
+        status, headers = await _read_head(reader)
+        body = await _read_body(reader, headers) if read_body else b""
+        return HttpResponse(status=status, headers=headers, body=body)
+    finally:
+        writer.close()
+
+
+async def fetch(proxy: Any, url: str = DEFAULT_TEST_URL, read_body: bool = True) -> HttpResponse:
+    """Effectue une requête GET à travers le proxy."""
+    reader, writer, target = await _open_for_url(proxy, url)
+    return await _exchange(reader, writer, url, target, read_body)
+
+
+async def fetch_direct(url: str) -> HttpResponse:
+    """Effectue une requête GET sans proxy."""
+    scheme, host, port, path = split_url(url)
+    ssl_context = _get_ssl_context() if scheme == "https" else None
+    reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context)
+    return await _exchange(reader, writer, url, path, True)
+
+
+async def _handshake(proxy: Any, host: str, port: int) -> None:
+    """Dialogue protocolaire seul : connexion TCP puis négociation SOCKS/CONNECT."""
+    reader, writer = await asyncio.open_connection(proxy.ip, int(proxy.port))
+    try:
+        # Un proxy HTTP sans CONNECT répond tout de même par un statut HTTP valide
+        await _negotiate(reader, writer, proxy, host, port, require_ok=proxy.proxy_type.upper() != "HTTP")
+    finally:
+        writer.close()
+
+
+def classify_failure(error: BaseException) -> str:
+    """Issue d'un test interrompu par une exception."""
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    if isinstance(error, (ProxyCheckError, asyncio.IncompleteReadError, ValueError, ssl.SSLError)):
+        return "protocol"
+    return "error"
+
+
+async def handshake_outcome(proxy: Any, url: str = DEFAULT_TEST_URL, timeout: float = DEFAULT_HANDSHAKE_TIMEOUT) -> str:
+    """Issue du handshake du protocole (« ok » si le proxy répond correctement)."""
+    _, host, port, _ = split_url(url)
+    try:
+        await asyncio.wait_for(_handshake(proxy, host, port), timeout)
+        return "ok"
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError) as error:
+        return classify_failure(error)
+
+
+async def check_outcome(proxy: Any, url: str = DEFAULT_TEST_URL, timeout: float = 5) -> str:
+    """Issue d'une requête HTTP relayée par le proxy."""
+    try:
+        response = await asyncio.wait_for(fetch(proxy, url, read_body=False), timeout)
+        return "ok" if response.status == 200 else "bad_status"
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError, ssl.SSLError) as error:
+        return classify_failure(error)
+
+
+def _header_name(name: str) -> str:
+    """Normalise un nom d'en-tête (httpbin : X-Forwarded-For, azenv : HTTP_X_FORWARDED_FOR)."""
+    name = name.strip().lower()
+    if name.startswith("http_"):
+        name = name[5:]
+    return name.replace("_", "-")
+
+
+def parse_judge_response(body: bytes) -> Tuple[List[str], Dict[str, str]]:
+    """Extrait les adresses vues par le juge et les en-têtes qu'il a reçus."""
+    text = body.decode("utf-8", "replace")
+    origin = ""
+    headers: Dict[str, str] = {}
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        # httpbin : "origin", ipify (format=json) : "ip", ip-api : "query"
+        origin = str(data.get("origin") or data.get("ip") or data.get("query") or "")
+        received = data.get("headers")
+        if isinstance(received, dict):
+            headers = {_header_name(name): str(value) for name, value in received.items()}
+    elif text.strip() and len(text.split()) == 1 and "=" not in text:
+        # Juge texte réduit à l'adresse (ipify)
+        origin = text.strip()
+    else:
+        # Juges texte : une ligne "CLE = valeur" par variable CGI
+        for line in text.splitlines():
+            name, sep, value = line.partition("=")
+            if not sep:
+                continue
+            name = name.strip().upper()
+            if name == "REMOTE_ADDR":
+                origin = value.strip()
+            elif name.startswith("HTTP_"):
+                headers[_header_name(name)] = value.strip()
+    addresses = [address.strip() for address in origin.split(",") if address.strip()]
+    return addresses, headers
+
+
+def judge_country(body: bytes) -> Optional[str]:
+    """Pays de sortie annoncé par un juge de géolocalisation (ip-api : "countryCode")."""
+    if b"countryCode" not in body:
+        return None
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    country = data.get("countryCode") if isinstance(data, dict) else None
+    return str(country).upper() if country else None
+
+
+def _parse_address(token: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """Adresse IP d'un élément d'en-tête ("1.2.3.4", "1.2.3.4:80", "for=\"[::1]:80\"") ou None."""
+    token = token.strip().strip('"')
+    if token.lower().startswith("for="):
+        token = token[4:].strip('"')
+    if token.startswith("["):
+        token = token[1:].partition("]")[0]
+    elif token.count(":") == 1:
+        token = token.partition(":")[0]
+    try:
+        return ipaddress.ip_address(token)
+    except ValueError:
+        return None
+
+
+def _reveals_address(values: Iterable[str], real: Union[ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+    """Vrai si l'une des valeurs contient l'adresse entière (et pas seulement une sous-chaîne)."""
+    return any(_parse_address(token) == real for value in values for token in _ADDRESS_SEPARATORS.split(value))
+
+
+def classify_anonymity(addresses: List[str], headers: Dict[str, str], real_ip: Optional[str]) -> str:
+    """Classe un proxy en transparent, anonymous ou elite d'après la réponse du juge."""
+    real = _parse_address(real_ip) if real_ip else None
+    if real is not None:
+        if _reveals_address(addresses, real) or _reveals_address(headers.values(), real):
+            return "transparent"
+    if len(addresses) > 1 or REVEALING_HEADERS.intersection(headers):
+        return "anonymous"
+    return "elite"
+
+
+# Adresse publique de la machine par URL de juge (nécessaire pour détecter les proxys transparents)
+_real_ip_cache: Dict[str, Optional[str]] = {}
+
+
+async def discover_real_ip(judge_url: str = DEFAULT_JUDGE_URL, timeout: float = 5) -> Optional[str]:
+    """Interroge le juge sans proxy pour connaître l'adresse publique réelle."""
+    if judge_url in _real_ip_cache:
+        return _real_ip_cache[judge_url]
+    try:
+        response = await asyncio.wait_for(fetch_direct(judge_url), timeout)
+        addresses, _ = parse_judge_response(response.body) if response.status == 200 else ([], {})
+        real_ip = addresses[-1] if addresses else None
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError, ssl.SSLError):
+        real_ip = None
+    _real_ip_cache[judge_url] = real_ip
+    return real_ip
+
+
+async def probe_proxy(
+    proxy: Any,
+    judge_url: str = DEFAULT_JUDGE_URL,
+    timeout: float = 5,
+    real_ip: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> ProbeResult:
+    """Une seule requête au juge : vivacité, latence, IP de sortie, anonymat et pays."""
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(fetch(proxy, judge_url), timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError, ssl.SSLError) as error:
+        return ProbeResult(ok=False, outcome=classify_failure(error))
+    latency = time.perf_counter() - start
+    if response.status != 200:
+        return ProbeResult(ok=False, latency=latency, status=response.status, outcome="bad_status")
+
+    return judge_result(response.body, latency, real_ip, geo_lookup)
+
+
+def judge_result(
+    body: bytes,
+    latency: Optional[float],
+    real_ip: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> ProbeResult:
+    """Métadonnées d'un proxy fonctionnel tirées de la réponse du juge."""
+    addresses, headers = parse_judge_response(body)
+    # Le dernier maillon de la chaîne vue par le juge est l'IP de sortie
+    exit_ip = addresses[-1] if addresses else None
+    country = geo_lookup(exit_ip) if geo_lookup is not None and exit_ip else judge_country(body)
+    return ProbeResult(
+        ok=True,
+        latency=latency,
+        status=200,
+        exit_ip=exit_ip,
+        anonymity=classify_anonymity(addresses, headers, real_ip) if addresses or headers else None,
+        country=country,
+        headers=headers,
+    )
+
+
+def apply_probe(proxy: Any, result: ProbeResult) -> None:
+    """Reporte les métadonnées d'une sonde sur l'objet proxy (si ses champs existent)."""
+    for name in ("exit_ip", "anonymity", "country"):
+        value = getattr(result, name)
+        if value is not None and hasattr(proxy, name):
+            setattr(proxy, name, value)
+
+
+async def _timed_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, url: str, target: str) -> Tuple[float, float, HttpResponse, bool]:
+    """Requête keep-alive chronométrée : (TTFB, durée totale, réponse, connexion réutilisable)."""
+    start = time.perf_counter()
+    writer.write(_build_request(url, target, keep_alive=True))
+    await writer.drain()
+    first = await reader.readexactly(1)
+    ttfb = time.perf_counter() - start
+    try:
+        head = first + await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise ProxyCheckError("En-tête HTTP incomplet")
+    status, headers = _parse_head(head)
+    body = await _read_body(reader, headers)
+    total = time.perf_counter() - start
+
+    # Réutilisable seulement si le corps a une taille connue et a été lu en entier
+    length = headers.get("content-length", "")
+    framed = headers.get("transfer-encoding", "").lower() == "chunked" or (length.isdigit() and int(length) == len(body))
+    reusable = framed and head.startswith(b"HTTP/1.1") and headers.get("connection", "").lower() != "close"
+    return ttfb, total, HttpResponse(status=status, headers=headers, body=body), reusable
+
+
+async def profile_proxy(proxy: Any, url: str = DEFAULT_JUDGE_URL, samples: int = DEFAULT_SAMPLES, timeout: float = 5) -> LatencyProfile:
+    """Mesure N requêtes à travers le proxy en réutilisant le tunnel quand c'est possible."""
+    profile = LatencyProfile()
+    reader = writer = None
+    target = ""
+    try:
+        for _ in range(samples):
+            setup = 0.0
+            try:
+                if writer is not None:
+                    try:
+                        ttfb, total, response, reusable = await asyncio.wait_for(_timed_request(reader, writer, url, target), timeout)
+                    except (OSError, asyncio.IncompleteReadError, ProxyCheckError):
+                        # Connexion keep-alive fermée par l'autre bout : nouvelle connexion, sans compter d'échec
+                        writer.close()
+                        writer = None
+                if writer is None:
+                    reader, writer, target, connect, handshake = await asyncio.wait_for(_open_phased(proxy, url), timeout)
+                    profile.connect.append(connect)
+                    profile.handshake.append(handshake)
+                    setup = connect + handshake
+                    ttfb, total, response, reusable = await asyncio.wait_for(_timed_request(reader, writer, url, target), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError, ssl.SSLError):
+                profile.failures += 1
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                if not profile.total:
+                    # Proxy injoignable dès la première mesure : inutile d'insister
+                    break
+                continue
+
+            if response.status == 200:
+                profile.ttfb.append(ttfb)
+                profile.total.append(setup + total)
+                if profile.body is None:
+                    profile.body = response.body
+            else:
+                profile.failures += 1
+            if not reusable:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+    return profile
+
+
+def apply_profile(proxy: Any, profile: LatencyProfile) -> None:
+    """Reporte p50 (vitesse), p95, gigue et phases sur l'objet proxy (si ses champs existent)."""
+    values = {"speed": profile.p50, "speed_p95": profile.p95, "jitter": profile.jitter, "phases": profile.phases()}
+    for name, value in values.items():
+        if value is not None and hasattr(proxy, name):
+            setattr(proxy, name, value)
+
+
+Concurrency = Union[int, AdaptiveConcurrency]
+
+
+def _succeeded(result: Any) -> bool:
+    """Succès d'un test, quel que soit le type de résultat retourné par check()."""
+    if isinstance(result, tuple):
+        return bool(result[0])
+    return bool(getattr(result, "ok", result))
+
+
+async def run_checks(
+    proxies: Iterable[Any],
+    check: Callable[[Any], Awaitable[Any]],
+    concurrency: Concurrency = DEFAULT_CONCURRENCY,
+    on_result: Optional[Callable[[Any, Any], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_tick: Optional[Callable[[], None]] = None,
+) -> None:
+    """Exécute check() sur chaque proxy avec au plus `concurrency` tests en vol.
+
+    Avec un AdaptiveConcurrency, la limite est réajustée en continu (AIMD).
+    on_tick() est appelé dans la boucle toutes les TICK_INTERVAL secondes, même sans nouveau résultat.
+    """
+    iterator = iter(proxies)
+    controller = concurrency if isinstance(concurrency, AdaptiveConcurrency) else None
+    if controller is not None:
+        controller.cap(effective_concurrency(controller.maximum))
+        worker_count = controller.maximum
+    else:
+        worker_count = effective_concurrency(concurrency)
+
+    async def worker() -> None:
+        while True:
+            if controller is not None:
+                await controller.acquire()
+            proxy = next(iterator, None)
+            if proxy is None or (should_stop is not None and should_stop()):
+                if controller is not None:
+                    await controller.release_slot()
+                return
+            start = time.perf_counter()
+            CHECKS_IN_FLIGHT.inc()
+            try:
+                result = await check(proxy)
+            except Exception:
+                result = False
+            finally:
+                CHECKS_IN_FLIGHT.dec()
+            if controller is not None:
+                await controller.release(_succeeded(result), time.perf_counter() - start)
+            if on_result is not None:
+                on_result(proxy, result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(worker_count)]
+
+    async def watch_interrupt() -> None:
+        # Annule les tests en vol dès que l'interruption est demandée
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            if on_tick is not None:
+                on_tick()
+            if should_stop is not None and should_stop():
+                for task in workers:
+                    task.cancel()
+                return
+
+    watchers = [asyncio.create_task(watch_interrupt())]
+    if controller is not None:
+        watchers.append(asyncio.create_task(controller.watch_loop_lag()))
+    try:
+        await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        for watcher in watchers:
+            watcher.cancel()
+
+
+def _bounded(concurrency: Concurrency, count: int) -> Concurrency:
+    """Borne la concurrence au nombre de proxys à tester."""
+    if isinstance(concurrency, AdaptiveConcurrency):
+        concurrency.cap(count)
+        return concurrency
+    return min(concurrency, count)
+
+
+def build_profile(
+    mode: str = "full",
+    test_url: str = DEFAULT_TEST_URL,
+    judge_url: Optional[str] = None,
+    handshake_timeout: float = DEFAULT_HANDSHAKE_TIMEOUT,
+) -> CheckProfile:
+    """Profil correspondant à un mode de validation (voir VALIDATION_MODES)."""
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Mode de validation inconnu: {mode}")
+    if mode == "https":
+        url = test_url if test_url.startswith("https://") else DEFAULT_HTTPS_URL
+        return CheckProfile(mode, (CheckStage("handshake", url, handshake_timeout), CheckStage("request", url)))
+    if mode == "url":
+        return CheckProfile(mode, (CheckStage("request", test_url),))
+    # Avec un juge, la requête complète renseigne aussi IP de sortie, anonymat et pays
+    full = CheckStage("judge", judge_url) if judge_url else CheckStage("request", test_url)
+    handshake = CheckStage("handshake", judge_url or test_url, handshake_timeout)
+    stages = {"full": (full,), "handshake": (handshake,), "staged": (handshake, full)}[mode]
+    return CheckProfile(mode, stages)
+
+
+async def run_stage(
+    stage: CheckStage,
+    proxy: Any,
+    timeout: float = 5,
+    real_ip: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> Tuple[str, Optional[float]]:
+    """Exécute une étape ; retourne (issue, latence)."""
+    timeout = min(stage.timeout, timeout) if stage.timeout is not None else timeout
+    start = time.perf_counter()
+    if stage.kind == "handshake":
+        outcome = await handshake_outcome(proxy, stage.url, timeout)
+    elif stage.kind == "judge":
+        result = await probe_proxy(proxy, stage.url, timeout, real_ip, geo_lookup)
+        if result.ok:
+            apply_probe(proxy, result)
+        return result.outcome, result.latency
+    elif stage.kind == "request":
+        outcome = await check_outcome(proxy, stage.url, timeout)
+    else:
+        raise ValueError(f"Étape de validation inconnue: {stage.kind}")
+    return outcome, time.perf_counter() - start
+
+
+async def run_profile(
+    profile: CheckProfile,
+    proxy: Any,
+    timeout: float = 5,
+    real_ip: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> Tuple[str, Optional[float]]:
+    """Enchaîne les étapes du profil et s'arrête au premier échec."""
+    outcome, latency = "ok", None
+    for stage in profile.stages:
+        outcome, latency = await run_stage(stage, proxy, timeout, real_ip, geo_lookup)
+        if outcome != "ok":
+            break
+    return outcome, latency
+
+
+def validate_proxies_async(
+    proxies: List[Any],
+    timeout: float = 5,
+    concurrency: Concurrency = DEFAULT_CONCURRENCY,
+    test_url: str = DEFAULT_TEST_URL,
+    on_result: Optional[Callable[[Any, bool, Optional[float]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    mode: str = "full",
+    handshake_timeout: float = DEFAULT_HANDSHAKE_TIMEOUT,
+    judge_url: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+    profile: Optional[CheckProfile] = None,
+    on_tick: Optional[Callable[[], None]] = None,
+) -> List[Any]:
+    """Valide une liste de proxys et retourne ceux qui fonctionnent.
+
+    on_result(proxy, ok, latence) est appelé pour chaque proxy testé, on_tick() périodiquement (voir run_checks).
+    Sans profile explicite, celui du mode est construit par build_profile() : avec
+    judge_url, la requête complète est une sonde unique qui renseigne aussi IP de
+    sortie, anonymat et pays des proxys fonctionnels.
+    """
+    profile = profile or build_profile(mode, test_url, judge_url, handshake_timeout)
+    working_proxies = []
+
+    def collect(proxy: Any, result: Any) -> None:
+        ok, latency = result if isinstance(result, tuple) else (False, None)
+        if ok:
+            working_proxies.append(proxy)
+        if on_result is not None:
+            on_result(proxy, ok, latency)
+
+    async def check(proxy: Any) -> Tuple[bool, Optional[float]]:
+        start = time.perf_counter()
+        outcome, latency = await run_profile(profile, proxy, timeout, real_ip, geo_lookup)
+        CHECK_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
+        return outcome == "ok", latency if outcome == "ok" else None
+
+    real_ip: Optional[str] = None
+
+    async def run() -> None:
+        nonlocal real_ip
+        judge = next((stage.url for stage in profile.stages if stage.kind == "judge"), None)
+        if judge:
+            real_ip = await discover_real_ip(judge, timeout)
+        await run_checks(proxies, check, _bounded(concurrency, len(proxies)), collect, should_stop, on_tick)
+
+    if proxies:
+        asyncio.run(run())
+    return working_proxies
+
+
+def profile_proxies_async(
+    proxies: List[Any],
+    samples: int = DEFAULT_SAMPLES,
+    timeout: float = 5,
+    concurrency: Concurrency = DEFAULT_CONCURRENCY,
+    judge_url: str = DEFAULT_JUDGE_URL,
+    on_result: Optional[Callable[[Any, LatencyProfile], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> List[Any]:
+    """Profile la latence de chaque proxy (N échantillons) et retourne ceux qui ont répondu.
+
+    La première réponse du juge renseigne aussi IP de sortie, anonymat et pays.
+    """
+    working_proxies = []
+    real_ip: Optional[str] = None
+
+    def collect(proxy: Any, profile: Any) -> None:
+        if not isinstance(profile, LatencyProfile):
+            profile = LatencyProfile(failures=1)
+        if profile.ok:
+            apply_profile(proxy, profile)
+            if profile.body is not None:
+                apply_probe(proxy, judge_result(profile.body, profile.p50, real_ip, geo_lookup))
+            working_proxies.append(proxy)
+        if on_result is not None:
+            on_result(proxy, profile)
+
+    async def run() -> None:
+        nonlocal real_ip
+        real_ip = await discover_real_ip(judge_url, timeout)
+        await run_checks(
+            proxies,
+            lambda proxy: profile_proxy(proxy, judge_url, samples, timeout),
+            _bounded(concurrency, len(proxies)),
+            collect,
+            should_stop,
+        )
+
+    if proxies:
+        asyncio.run(run())
+    return working_proxies
@@ -0,0 +1,293 @@
+"""
+Passerelle locale de proxys rotatifs.
+Un seul host:port accepte des clients HTTP (CONNECT ou requête absolue) et SOCKS5,
+et relaie chaque connexion à travers un proxy choisi par le rotateur.
+"""
+
+import asyncio
+import concurrent.futures
+import socket
+import struct
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from proxy_engine import ProxyCheckError, effective_concurrency, open_tunnel
+from proxy_rotator import ProxyRotator
+
+DEFAULT_GATEWAY_HOST = "127.0.0.1"
+DEFAULT_GATEWAY_PORT = 8899
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_MAX_RETRIES = 3
+# Tunnels simultanés au maximum (deux descripteurs par tunnel) ; au-delà, les clients attendent une place
+DEFAULT_MAX_TUNNELS = 4096
+RELAY_BUFFER = 65536
+
+_UPSTREAM_ERRORS = (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ProxyCheckError, ValueError)
+
+
+class GatewayError(Exception):
+    """Requête client invalide ou non prise en charge."""
+
+
+@dataclass
+class GatewayStats:
+    """Compteurs de la passerelle."""
+    active: int = 0
+    total: int = 0
+    failed: int = 0
+    retries: int = 0
+    # Clients refusés faute de place libre dans le délai de connexion
+    rejected: int = 0
+
+
+async def _relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Copie un sens du tunnel jusqu'à la fin du flux."""
+    try:
+        while True:
+            data = await reader.read(RELAY_BUFFER)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (OSError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        try:
+            if writer.can_write_eof():
+                writer.write_eof()
+        except OSError:
+            pass
+
+
+async def _read_socks5_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Tuple[str, int]:
+    """Négociation SOCKS5 côté serveur (sans authentification) et lecture du CONNECT."""
+    methods_count = (await reader.readexactly(1))[0]
+    methods = await reader.readexactly(methods_count)
+    if 0 not in methods:
+        writer.write(b"\x05\xff")
+        await writer.drain()
+        raise GatewayError("SOCKS5: aucune méthode sans authentification")
+    writer.write(b"\x05\x00")
+    await writer.drain()
+
+    version, command, _, atyp = await reader.readexactly(4)
+    if atyp == 1:
+        host = socket.inet_ntop(socket.AF_INET, await reader.readexactly(4))
+    elif atyp == 4:
+        host = socket.inet_ntop(socket.AF_INET6, await reader.readexactly(16))
+    elif atyp == 3:
+        length = (await reader.readexactly(1))[0]
+        host = (await reader.readexactly(length)).decode("idna")
+    else:
+        raise GatewayError("SOCKS5: type d'adresse inconnu")
+    port = struct.unpack(">H", await reader.readexactly(2))[0]
+    if version != 5 or command != 1:
+        writer.write(b"\x05\x07\x00\x01" + b"\x00" * 6)
+        await writer.drain()
+        raise GatewayError("SOCKS5: seule la commande CONNECT est prise en charge")
+    return host, port
+
+
+def _socks5_reply(code: int) -> bytes:
+    """Réponse SOCKS5 avec une adresse liée nulle."""
+    return bytes([5, code, 0, 1]) + b"\x00" * 6
+
+
+def _split_authority(authority: str, default_port: int) -> Tuple[str, int]:
+    """Découpe host:port (IPv6 entre crochets acceptée)."""
+    if authority.startswith("["):
+        host, _, rest = authority[1:].partition("]")
+        port = rest[1:]
+    elif ":" in authority:
+        host, _, port = authority.rpartition(":")
+    else:
+        host, port = authority, ""
+    return host, int(port) if port else default_port
+
+
+class ProxyGateway:
+    """Serveur asyncio relayant les connexions clientes à travers le pool de proxys."""
+
+    def __init__(
+        self,
+        rotator: ProxyRotator,
+        host: str = DEFAULT_GATEWAY_HOST,
+        port: int = DEFAULT_GATEWAY_PORT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_tunnels: int = DEFAULT_MAX_TUNNELS,
+        on_result: Optional[Callable[[Any, bool, Optional[float]], None]] = None,
+    ):
+        self.rotator = rotator
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.max_tunnels = max_tunnels
+        self.on_result = on_result
+        self.stats = GatewayStats()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # on_result (écritures SQLite de l'historique) s'exécute hors de la boucle, dans l'ordre des résultats
+        self._reporter = concurrent.futures.ThreadPoolExecutor(max_workers=1) if on_result is not None else None
+        # Connexions ouvertes (clientes et amont), fermées à l'arrêt
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        """Démarre l'écoute (port 0 : port libre choisi par le système)."""
+        effective_concurrency(self.max_tunnels * 2)
+        self._slots = asyncio.Semaphore(self.max_tunnels)
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Arrête l'écoute et ferme les tunnels encore ouverts."""
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        # Laisse les tunnels se terminer proprement avant de rendre la main
+        for _ in range(50):
+            if not self.stats.active:
+                break
+            await asyncio.sleep(0.02)
+        await self._server.wait_closed()
+        self._server = None
+        if self._reporter is not None:
+            # Les derniers résultats sont écrits avant de rendre la main
+            await asyncio.get_running_loop().run_in_executor(None, self._reporter.shutdown)
+            self._reporter = None
+
+    async def serve(self, should_stop: Optional[Callable[[], bool]] = None) -> None:
+        """Sert jusqu'à l'annulation ou jusqu'à ce que should_stop() soit vrai."""
+        if self._server is None:
+            await self.start()
+        try:
+            while should_stop is None or not should_stop():
+                await asyncio.sleep(0.2)
+        finally:
+            await self.stop()
+
+    def _report(self, proxy: Any, ok: bool, latency: Optional[float]) -> None:
+        """Remonte le résultat au rotateur et à l'historique de santé."""
+        self.rotator.report(proxy, ok, latency)
+        if self._reporter is not None:
+            self._reporter.submit(self.on_result, proxy, ok, latency)
+
+    async def _open_upstream(self, host: str, port: int, plain_http: bool) -> Tuple[Any, asyncio.StreamReader, asyncio.StreamWriter]:
+        """Ouvre la connexion amont, en changeant de proxy après chaque échec."""
+        for attempt in range(self.max_retries):
+            proxy = self.rotator.get()
+            if proxy is None:
+                break
+            if attempt:
+                self.stats.retries += 1
+            start = time.perf_counter()
+            try:
+                if plain_http and proxy.proxy_type.upper() == "HTTP":
+                    # Requête HTTP en clair : relayée telle quelle au proxy HTTP
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(proxy.ip, int(proxy.port)), self.connect_timeout
+                    )
+                else:
+                    reader, writer = await asyncio.wait_for(open_tunnel(proxy, host, port), self.connect_timeout)
+            except _UPSTREAM_ERRORS:
+                self._report(proxy, False, None)
+                continue
+            self._report(proxy, True, time.perf_counter() - start)
+            return proxy, reader, writer
+        raise ProxyCheckError("Aucun proxy amont disponible")
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Au plus max_tunnels tunnels ouverts : les clients en trop attendent, puis sont refusés
+            await asyncio.wait_for(self._slots.acquire(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            self.stats.rejected += 1
+            writer.close()
+            return
+        try:
+            await self._tunnel(reader, writer)
+        finally:
+            self._slots.release()
+
+    async def _tunnel(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.active += 1
+        self.stats.total += 1
+        upstream_writer: Optional[asyncio.StreamWriter] = None
+        self._writers.add(writer)
+        try:
+            first = await reader.readexactly(1)
+            if first == b"\x05":
+                host, port = await _read_socks5_request(reader, writer)
+                try:
+                    _, upstream_reader, upstream_writer = await self._open_upstream(host, port, False)
+                except ProxyCheckError:
+                    writer.write(_socks5_reply(1))
+                    raise
+                writer.write(_socks5_reply(0))
+            else:
+                head = first + await reader.readuntil(b"\r\n\r\n")
+                method, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+                if method.upper() == "CONNECT":
+                    host, port = _split_authority(target, 443)
+                    try:
+                        _, upstream_reader, upstream_writer = await self._open_upstream(host, port, False)
+                    except ProxyCheckError:
+                        writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+                        raise
+                    writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                else:
+                    parts = urlsplit(target)
+                    if parts.scheme.lower() != "http" or not parts.hostname:
+                        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                        raise GatewayError("Requête non absolue")
+                    port = parts.port or 80
+                    try:
+                        proxy, upstream_reader, upstream_writer = await self._open_upstream(parts.hostname, port, True)
+                    except ProxyCheckError:
+                        writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+                        raise
+                    if proxy.proxy_type.upper() != "HTTP":
+                        # Tunnel brut vers le serveur : requête en forme origine
+                        path = parts.path or "/"
+                        if parts.query:
+                            path += "?" + parts.query
+                        head = head.replace(target.encode("latin-1"), path.encode("latin-1"), 1)
+                    upstream_writer.write(head)
+            self._writers.add(upstream_writer)
+            await writer.drain()
+            await asyncio.gather(_relay(reader, upstream_writer), _relay(upstream_reader, writer))
+        except (GatewayError, ProxyCheckError, OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            self.stats.failed += 1
+            try:
+                await writer.drain()
+            except OSError:
+                pass
+        finally:
+            self.stats.active -= 1
+            self._writers.discard(writer)
+            writer.close()
+            if upstream_writer is not None:
+                self._writers.discard(upstream_writer)
+                upstream_writer.close()
+
+
+def run_gateway(
+    rotator: ProxyRotator,
+    host: str = DEFAULT_GATEWAY_HOST,
+    port: int = DEFAULT_GATEWAY_PORT,
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_result: Optional[Callable[[Any, bool, Optional[float]], None]] = None,
+    **options: Any,
+) -> GatewayStats:
+    """Lance la passerelle jusqu'à l'interruption et retourne ses compteurs."""
+    gateway = ProxyGateway(rotator, host, port, on_result=on_result, **options)
+    try:
+        asyncio.run(gateway.serve(should_stop))
+    except KeyboardInterrupt:
+        pass
+    return gateway.stats
@@ -0,0 +1,110 @@
+"""
+Analyse en flux des listes de proxys.
+Une seule grammaire précompilée reconnaît IP:PORT, IP:PORT:USER:PASS,
+scheme://, user:pass@ et les adresses IPv6 [addr]:port.
+"""
+
+import re
+import socket
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Octet 0-255 et port 1-65535 validés par la grammaire elle-même (pas de int() ni de split())
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_PORT = r"(?:6553[0-5]|655[0-2][0-9]|65[0-4][0-9]{2}|6[0-4][0-9]{3}|[1-5][0-9]{4}|[1-9][0-9]{0,3})"
+
+GRAMMAR = re.compile(
+    r"^[ \t]*"
+    r"(?:[A-Za-z][A-Za-z0-9+.-]*://)?"            # scheme:// optionnel
+    r"(?:[^@\s/]+@)?"                              # user:pass@ optionnel
+    r"(?:(" + _OCTET + r"(?:\." + _OCTET + r"){3})"
+    r"|\[([0-9A-Fa-f:.]{2,45})\])"                 # [IPv6]
+    r":(" + _PORT + r")"
+    r"(?::[^:\s]+:[^:\s]+)?"                       # :user:pass optionnel
+    r"/?[ \t]*\r?$",
+    re.MULTILINE,
+)
+
+# Lignes vides ou commentaires : ignorées sans être comptées comme rejetées
+_BLANK = re.compile(r"^[ \t]*(?:#[^\n]*)?\r?$", re.MULTILINE)
+
+CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class ParseStats:
+    """Compteurs d'une analyse de liste."""
+    lines: int = 0
+    accepted: int = 0
+    skipped: int = 0
+
+    @property
+    def rejected(self) -> int:
+        return self.lines - self.accepted - self.skipped
+
+
+def _is_ipv6(address: str) -> bool:
+    """Vérifie une adresse IPv6 (cas rare, hors chemin rapide)."""
+    try:
+        socket.inet_pton(socket.AF_INET6, address)
+        return True
+    except OSError:
+        return False
+
+
+def parse_line(line: str) -> Optional[Tuple[str, str]]:
+    """Analyse une ligne isolée et retourne (ip, port) ou None."""
+    match = GRAMMAR.match(line.strip())
+    if match is None:
+        return None
+    ip, ip6, port = match.groups()
+    if ip:
+        return ip, port
+    return (ip6, port) if _is_ipv6(ip6) else None
+
+
+def _count(text: str, accepted: int, stats: Optional[ParseStats]) -> None:
+    """Met à jour les compteurs après l'analyse d'un bloc."""
+    if stats is not None:
+        ends_with_newline = text.endswith("\n")
+        stats.lines += text.count("\n") + (0 if ends_with_newline else 1)
+        stats.accepted += accepted
+        stats.skipped += len(_BLANK.findall(text)) - (1 if ends_with_newline else 0)
+
+
+def parse_block(block: bytes, stats: Optional[ParseStats] = None) -> List[Tuple[str, str]]:
+    """Analyse un bloc de lignes complètes en une seule passe de la grammaire."""
+    # latin-1 : décodage 1 octet = 1 caractère, jamais en échec
+    text = block.decode("latin-1")
+    pairs = [(ip or ip6, port) for ip, ip6, port in GRAMMAR.findall(text) if ip or _is_ipv6(ip6)]
+    _count(text, len(pairs), stats)
+    return pairs
+
+
+def parse_block_offsets(block: bytes, stats: Optional[ParseStats] = None) -> List[Tuple[int, str, str]]:
+    """Comme parse_block, avec la position dans le bloc du début de chaque ligne acceptée."""
+    text = block.decode("latin-1")
+    found = []
+    for match in GRAMMAR.finditer(text):
+        ip, ip6, port = match.groups()
+        if ip or _is_ipv6(ip6):
+            found.append((match.start(), ip or ip6, port))
+    _count(text, len(found), stats)
+    return found
+
+
+def iter_parse_chunks(chunks: Iterable[bytes], stats: Optional[ParseStats] = None) -> Iterator[Tuple[str, str]]:
+    """Analyse un flux de blocs d'octets sans jamais construire le texte complet."""
+    remainder = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = remainder + chunk if remainder else chunk
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            remainder = data
+            continue
+        remainder = data[cut + 1:]
+        yield from parse_block(data[:cut + 1], stats)
+    if remainder:
+        yield from parse_block(remainder, stats)
@@ -0,0 +1,398 @@
+"""
+Représentation des proxys : objet Proxy et pool compact en colonnes.
+Le pool stocke l'IPv4 sur 32 bits et le port sur 16 bits ; les objets Proxy
+ne sont créés qu'à la demande.
+"""
+
+import math
+import socket
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from lazy_imports import optional_module
+
+# numpy optionnel, importé seulement quand un traitement vectorisé en a besoin
+np = optional_module("numpy")
+
+
+@dataclass(slots=True)
+class Proxy:
+    """Classe pour représenter un proxy avec ses métadonnées."""
+    ip: str
+    port: str
+    proxy_type: str
+    country: Optional[str] = None
+    speed: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    anonymity: Optional[str] = None
+    exit_ip: Optional[str] = None
+    speed_p95: Optional[float] = None
+    jitter: Optional[float] = None
+    phases: Optional[Dict[str, float]] = None
+    source: Optional[str] = None
+    # Toutes les sources qui listent ce proxy (source est la mieux notée)
+    sources: Tuple[str, ...] = ()
+
+
+PROXY_TYPES = ("HTTP", "HTTPS", "SOCKS4", "SOCKS5")
+TYPE_CODES = {name: code for code, name in enumerate(PROXY_TYPES)}
+ANONYMITY_LEVELS = (None, "transparent", "anonymous", "elite")
+ANONYMITY_CODES = {name: code for code, name in enumerate(ANONYMITY_LEVELS)}
+
+# Sources attribuables par pool : un bit chacune dans la colonne source_masks
+MAX_SOURCES = 64
+
+_IPV4 = struct.Struct("!I")
+
+
+def pack_ipv4(ip: str) -> int:
+    """Convertit une IPv4 texte en entier 32 bits."""
+    return _IPV4.unpack(socket.inet_aton(ip))[0]
+
+
+def unpack_ipv4(value: int) -> str:
+    """Convertit un entier 32 bits en IPv4 texte."""
+    return socket.inet_ntoa(_IPV4.pack(value))
+
+
+def pack_country(country: Optional[str]) -> int:
+    """Code pays ISO à 2 lettres sur 16 bits (0 = inconnu)."""
+    if not country or len(country) != 2 or country == "Unknown":
+        return 0
+    upper = country.upper()
+    return (ord(upper[0]) << 8) | ord(upper[1])
+
+
+def unpack_country(value: int) -> Optional[str]:
+    """Inverse de pack_country."""
+    if not value:
+        return None
+    return chr(value >> 8) + chr(value & 0xFF)
+
+
+def _uint32_array() -> array:
+    """Tableau d'entiers non signés de 32 bits sur toutes les plateformes."""
+    for code in ("I", "L"):
+        if array(code).itemsize == 4:
+            return array(code)
+    raise RuntimeError("Aucun type array 32 bits disponible")
+
+
+def _ipv4_column(packed: bytes) -> array:
+    """Colonne d'IPv4 32 bits à partir d'adresses packées en ordre réseau (inet_aton)."""
+    column = _uint32_array()
+    column.frombytes(packed)
+    if sys.byteorder == "little":
+        column.byteswap()
+    return column
+
+
+class ProxyPool:
+    """Pool de proxys en colonnes (array) : ~18 octets par entrée IPv4."""
+
+    def __init__(self):
+        self.ips = _uint32_array()
+        self.ports = array("H")
+        self.types = array("B")
+        self.speeds = array("f")            # NaN = inconnue
+        self.countries = array("H")         # 2 lettres packées, 0 = inconnu
+        self.checked = _uint32_array()      # timestamp Unix, 0 = jamais
+        self.anonymity = array("B")         # index dans ANONYMITY_LEVELS
+        self.source_masks = array("Q")      # bit i = listé par source_urls[i], 0 = source inconnue
+        self.source_urls: List[str] = []
+        self._source_bits: Dict[str, int] = {}
+        # Tuples de sources par masque : peu de combinaisons distinctes, partagées entre les Proxy créés
+        self._source_tuples: Dict[int, Tuple[str, ...]] = {0: ()}
+        # Entrées IPv6, rares : conservées telles quelles
+        self.extra: List[Proxy] = []
+
+    def __len__(self) -> int:
+        return len(self.ips) + len(self.extra)
+
+    def source_bit(self, url: Optional[str]) -> int:
+        """Bit de la source (enregistrée au premier appel) ; 0 si inconnue ou au-delà de MAX_SOURCES."""
+        if not url:
+            return 0
+        bit = self._source_bits.get(url)
+        if bit is None:
+            if len(self.source_urls) >= MAX_SOURCES:
+                return 0
+            bit = self._source_bits[url] = 1 << len(self.source_urls)
+            self.source_urls.append(url)
+        return bit
+
+    def sources_mask(self, urls: Iterable[str]) -> int:
+        """Masque des sources déjà enregistrées parmi urls."""
+        mask = 0
+        for url in urls:
+            mask |= self._source_bits.get(url, 0)
+        return mask
+
+    def _sources_of(self, mask: int) -> Tuple[str, ...]:
+        """Sources d'un masque, dans l'ordre d'enregistrement."""
+        sources = self._source_tuples.get(mask)
+        if sources is None:
+            # Les bits déjà attribués ne changent jamais : le tuple reste valable
+            sources = self._source_tuples[mask] = tuple(url for bit, url in enumerate(self.source_urls) if mask >> bit & 1)
+        return sources
+
+    def add(self, ip: str, port, proxy_type: str) -> None:
+        """Ajoute un proxy sans métadonnées."""
+        if ":" in ip:
+            self.extra.append(Proxy(ip=ip, port=str(port), proxy_type=proxy_type))
+            return
+        self.ips.append(pack_ipv4(ip))
+        self.ports.append(int(port))
+        self.types.append(TYPE_CODES.get(proxy_type.upper(), 0))
+        self.speeds.append(math.nan)
+        self.countries.append(0)
+        self.checked.append(0)
+        self.anonymity.append(0)
+        self.source_masks.append(0)
+
+    def extend_pairs(self, pairs: Iterable[Tuple[str, str]], proxy_type: str, source: Optional[str] = None) -> None:
+        """Ajoute des couples (ip, port) issus de l'analyse d'une source."""
+        type_code = TYPE_CODES.get(proxy_type.upper(), 0)
+        source_mask = self.source_bit(source)
+        sources = (source,) if source else ()
+        # Adresses packées en un seul bloc puis converties d'un coup en colonne
+        aton = socket.inet_aton
+        packed = []
+        ports = []
+        for ip, port in pairs:
+            if ":" in ip:
+                self.extra.append(Proxy(ip=ip, port=port, proxy_type=proxy_type, source=source, sources=sources))
+                continue
+            packed.append(aton(ip))
+            ports.append(int(port))
+        self.ips.extend(_ipv4_column(b"".join(packed)))
+        self.ports.extend(array("H", ports))
+        self._pad_metadata(len(ports), type_code, source_mask)
+
+    def extend_packed(self, ips, ports, proxy_type: str) -> None:
+        """Ajoute des colonnes déjà packées (uint32 / uint16, array ou numpy)."""
+        count = len(ips)
+        if np is not None and isinstance(ips, np.ndarray):
+            self.ips.frombytes(ips.astype(np.uint32, copy=False).tobytes())
+            self.ports.frombytes(ports.astype(np.uint16, copy=False).tobytes())
+        else:
+            self.ips.extend(ips)
+            self.ports.extend(ports)
+        self._pad_metadata(count, TYPE_CODES.get(proxy_type.upper(), 0))
+
+    def _pad_metadata(self, count: int, type_code: int, source_mask: int = 0) -> None:
+        """Complète les colonnes de métadonnées pour `count` nouvelles entrées."""
+        self.types.extend(array("B", [type_code]) * count)
+        self.speeds.extend(array("f", [math.nan]) * count)
+        self.countries.extend(array("H", [0]) * count)
+        checked = _uint32_array()
+        checked.append(0)
+        self.checked.extend(checked * count)
+        self.anonymity.extend(array("B", [0]) * count)
+        self.source_masks.extend(array("Q", [source_mask]) * count)
+
+    def add_proxy(self, proxy: Proxy) -> None:
+        """Ajoute un objet Proxy avec ses métadonnées."""
+        if ":" in proxy.ip:
+            self.extra.append(proxy)
+            return
+        self.add(proxy.ip, proxy.port, proxy.proxy_type)
+        self.set_metadata(len(self.ips) - 1, proxy.speed, proxy.country, proxy.last_checked, proxy.anonymity)
+        mask = 0
+        for url in proxy.sources or ((proxy.source,) if proxy.source else ()):
+            mask |= self.source_bit(url)
+        self.source_masks[-1] = mask
+
+    def set_metadata(self, index: int, speed: Optional[float] = None, country: Optional[str] = None,
+                     last_checked: Optional[datetime] = None, anonymity: Optional[str] = None) -> None:
+        """Met à jour les métadonnées d'une entrée IPv4."""
+        if speed is not None:
+            self.speeds[index] = speed
+        if country:
+            self.countries[index] = pack_country(country)
+        if last_checked is not None:
+            self.checked[index] = int(last_checked.timestamp())
+        if anonymity:
+            self.anonymity[index] = ANONYMITY_CODES.get(anonymity, 0)
+
+    def __getitem__(self, index: int) -> Proxy:
+        """Crée l'objet Proxy d'une entrée à la demande."""
+        if index < 0:
+            index += len(self)
+        if index >= len(self.ips):
+            return self.extra[index - len(self.ips)]
+        return self._build(self.ips[index], self.ports[index], self.types[index], self.speeds[index], self.countries[index],
+                           self.checked[index], self.anonymity[index], self.source_masks[index])
+
+    def _build(self, ip: int, port: int, type_code: int, speed: float, country: int, checked: int, anonymity: int,
+               mask: int) -> Proxy:
+        """Objet Proxy d'une ligne de colonnes."""
+        sources = self._sources_of(mask)
+        return Proxy(
+            ip=unpack_ipv4(ip),
+            port=str(port),
+            proxy_type=PROXY_TYPES[type_code],
+            country=unpack_country(country) if country else None,
+            speed=None if math.isnan(speed) else speed,
+            last_checked=datetime.fromtimestamp(checked) if checked else None,
+            anonymity=ANONYMITY_LEVELS[anonymity],
+            source=sources[0] if sources else None,
+            sources=sources,
+        )
+
+    def __iter__(self) -> Iterator[Proxy]:
+        build = self._build
+        for row in zip(self.ips, self.ports, self.types, self.speeds, self.countries, self.checked, self.anonymity,
+                       self.source_masks):
+            yield build(*row)
+        yield from self.extra
+
+    def iter_pairs(self) -> Iterator[Tuple[str, str]]:
+        """Couples (ip, port) texte sans créer d'objets Proxy."""
+        for ip, port in zip(self.ips, self.ports):
+            yield unpack_ipv4(ip), str(port)
+        for proxy in self.extra:
+            yield proxy.ip, proxy.port
+
+    def iter_addresses(self) -> Iterator[str]:
+        """Adresses IP:PORT sans créer d'objets Proxy."""
+        for ip, port in zip(self.ips, self.ports):
+            yield f"{unpack_ipv4(ip)}:{port}"
+        for proxy in self.extra:
+            yield f"{proxy.ip}:{proxy.port}"
+
+    def _unique_ipv4(self, by_type: bool):
+        """Indices triés des premières occurrences parmi les entrées IPv4.
+
+        Retourne (indices, masques) : le masque de chaque entrée gardée réunit les sources de ses doublons.
+        """
+        if np is not None:
+            keys = np.frombuffer(self.ips, dtype=np.uint32).astype(np.uint64) << np.uint64(16)
+            keys |= np.frombuffer(self.ports, dtype=np.uint16).astype(np.uint64)
+            if by_type:
+                keys = (keys << np.uint64(8)) | np.frombuffer(self.types, dtype=np.uint8).astype(np.uint64)
+            if not len(keys):
+                return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.uint64)
+            # Tri non stable (rapide) puis plus petit indice d'origine de chaque groupe de clés égales
+            order = np.argsort(keys)
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+            first = np.minimum.reduceat(order, starts)
+            masks = np.bitwise_or.reduceat(np.frombuffer(self.source_masks, dtype=np.uint64)[order], starts)
+            arrange = np.argsort(first)
+            return first[arrange], masks[arrange]
+
+        positions: Dict[int, int] = {}
+        indices = []
+        masks = []
+        types = self.types
+        for index, (ip, port, mask) in enumerate(zip(self.ips, self.ports, self.source_masks)):
+            key = (ip << 16) | port
+            if by_type:
+                key = (key << 8) | types[index]
+            position = positions.get(key)
+            if position is None:
+                positions[key] = len(indices)
+                indices.append(index)
+                masks.append(mask)
+            else:
+                masks[position] |= mask
+        return indices, masks
+
+    def _unique_extra(self, by_type: bool) -> Tuple[List[int], List[Tuple[str, ...]]]:
+        """Positions des premières occurrences parmi les entrées IPv6, avec les sources réunies."""
+        positions: Dict[Tuple[str, str, Optional[str]], int] = {}
+        kept = []
+        sources: List[Tuple[str, ...]] = []
+        for position, proxy in enumerate(self.extra):
+            key = (proxy.ip, proxy.port, proxy.proxy_type.upper() if by_type else None)
+            first = positions.get(key)
+            if first is None:
+                positions[key] = len(kept)
+                kept.append(position)
+                sources.append(proxy.sources)
+            else:
+                sources[first] += tuple(url for url in proxy.sources if url not in sources[first])
+        return kept, sources
+
+    def unique_indices(self, by_type: bool = False) -> List[int]:
+        """Indices de la première occurrence de chaque IP:PORT (ou IP:PORT:TYPE), dans l'ordre."""
+        ipv4, _ = self._unique_ipv4(by_type)
+        indices = ipv4.tolist() if np is not None else ipv4
+        offset = len(self.ips)
+        indices.extend(offset + position for position in self._unique_extra(by_type)[0])
+        return indices
+
+    def dedupe(self, by_type: bool = False) -> int:
+        """Supprime les doublons en place et retourne le nombre d'entrées retirées.
+
+        Chaque entrée gardée conserve toutes les sources qui listaient ses doublons.
+        """
+        before = len(self)
+        kept, masks = self._unique_ipv4(by_type)
+        if len(kept) != len(self.ips):
+            self._take(kept)
+            self.source_masks = array("Q", masks.tolist() if np is not None else masks)
+        positions, sources = self._unique_extra(by_type)
+        extra = []
+        for position, merged in zip(positions, sources):
+            proxy = self.extra[position]
+            if merged != proxy.sources:
+                proxy = replace(proxy, source=proxy.source or merged[0], sources=merged)
+            extra.append(proxy)
+        self.extra = extra
+        return before - len(self)
+
+    def source_counts(self) -> Dict[str, List[int]]:
+        """Par source : [entrées, entrées qu'aucune autre source ne liste]."""
+        counts = {url: [0, 0] for url in self.source_urls}
+        if np is not None:
+            masks = np.frombuffer(self.source_masks, dtype=np.uint64)
+            for bit, url in enumerate(self.source_urls):
+                flag = np.uint64(1 << bit)
+                counts[url] = [int(np.count_nonzero(masks & flag)), int(np.count_nonzero(masks == flag))]
+        else:
+            for mask in self.source_masks:
+                unique = not mask & (mask - 1)
+                for url in self._sources_of(mask):
+                    entry = counts[url]
+                    entry[0] += 1
+                    entry[1] += unique
+        for proxy in self.extra:
+            for url in proxy.sources:
+                entry = counts.setdefault(url, [0, 0])
+                entry[0] += 1
+                entry[1] += len(proxy.sources) == 1
+        return counts
+
+    def _take(self, indices) -> None:
+        """Ne conserve que les entrées IPv4 aux indices donnés."""
+        for name in ("ips", "ports", "types", "speeds", "countries", "checked", "anonymity", "source_masks"):
+            column = getattr(self, name)
+            new_column = array(column.typecode)
+            if np is not None:
+                new_column.frombytes(np.frombuffer(column, dtype=np.dtype(column.typecode))[indices].tobytes())
+            else:
+                new_column.extend(column[index] for index in indices)
+            setattr(self, name, new_column)
+
+
+def remove_duplicates(proxies: Sequence[Any], by_type: bool = False) -> List[Any]:
+    """Supprime les proxys en double basés sur IP:PORT (ou IP:PORT:TYPE), dans l'ordre."""
+    # Clés entières (IP 32 bits << 16 | PORT) dans un pool compact plutôt que des chaînes "ip:port"
+    pool = ProxyPool()
+    ipv4: List[int] = []
+    ipv6: List[int] = []
+    for position, proxy in enumerate(proxies):
+        (ipv6 if ":" in proxy.ip else ipv4).append(position)
+    pool.extend_pairs(((proxies[position].ip, proxies[position].port) for position in ipv4), "HTTP")
+    if by_type:
+        pool.types = array("B", [TYPE_CODES.get(proxies[position].proxy_type.upper(), 0) for position in ipv4])
+    pool.extra = [proxies[position] for position in ipv6]
+    # Le pool range les IPv6 après les IPv4 : retour aux positions d'origine
+    positions = ipv4 + ipv6
+    return [proxies[position] for position in sorted(positions[index] for index in pool.unique_indices(by_type))]
@@ -0,0 +1,102 @@
+"""
+Ordonnancement de la file de validation par probabilité d'être fonctionnel.
+Chaque indice (source, port, historique du proxy, succès du /24) ajuste une
+estimation en log-odds ; les proxys les plus prometteurs sont testés en premier.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from health_store import ProxyHealthStore, proxy_key
+
+# Taux de proxys fonctionnels supposé sans autre information
+BASE_ALIVE_RATE = 0.04
+# Poids (en observations fictives) de l'a priori face aux comptages observés
+PRIOR_WEIGHT = 10
+# Taux a priori des ports usuels des proxys publics
+PORT_PRIORS: Dict[int, float] = {
+    3128: 0.12, 8080: 0.10, 1080: 0.10, 4145: 0.09, 80: 0.08, 8888: 0.07, 8118: 0.07,
+    3129: 0.06, 9050: 0.06, 5678: 0.06, 1081: 0.06, 8000: 0.05, 8081: 0.05, 9999: 0.05,
+    999: 0.05, 10808: 0.05, 4153: 0.05, 443: 0.04, 53281: 0.04,
+}
+UNKNOWN_PORT_RATE = 0.02
+
+Counts = Tuple[int, int]
+
+
+def _logit(rate: float) -> float:
+    rate = min(max(rate, 1e-4), 1 - 1e-4)
+    return math.log(rate / (1 - rate))
+
+
+def _smoothed(success: int, failure: int, prior: float) -> float:
+    """Taux observé tiré vers l'a priori tant que les observations sont rares."""
+    return (success + prior * PRIOR_WEIGHT) / (success + failure + PRIOR_WEIGHT)
+
+
+def _subnet(ip: str) -> Optional[str]:
+    """Préfixe /24 d'une IPv4 (None pour une IPv6)."""
+    if ":" in ip:
+        return None
+    return ip.rpartition(".")[0]
+
+
+def _add(table: Dict[Any, List[int]], key: Any, success: int, failure: int) -> None:
+    counts = table.setdefault(key, [0, 0])
+    counts[0] += success
+    counts[1] += failure
+
+
+class PriorityScorer:
+    """Score de priorité d'un proxy : somme des écarts en log-odds au taux de base."""
+
+    def __init__(self, history: Optional[Dict[Tuple[str, int, str], Counts]] = None,
+                 sources: Optional[Dict[str, Counts]] = None):
+        self.history = history or {}
+        self.sources = sources or {}
+        self.subnets: Dict[str, List[int]] = {}
+        self.ports: Dict[int, List[int]] = {}
+        for (ip, port, _), (success, failure) in self.history.items():
+            subnet = _subnet(ip)
+            if subnet is not None:
+                _add(self.subnets, subnet, success, failure)
+            _add(self.ports, port, success, failure)
+        self._base = _logit(BASE_ALIVE_RATE)
+
+    @classmethod
+    def from_store(cls, store: ProxyHealthStore) -> "PriorityScorer":
+        """Construit le score à partir de l'historique de santé."""
+        return cls(store.history_counts(), store.source_counts())
+
+    def _evidence(self, counts: Optional[Iterable[int]], prior: float) -> float:
+        if counts is None:
+            return 0.0
+        success, failure = counts
+        return _logit(_smoothed(success, failure, prior)) - self._base
+
+    def score(self, proxy: Any) -> float:
+        key = proxy_key(proxy)
+        port_prior = PORT_PRIORS.get(key[1], UNKNOWN_PORT_RATE)
+        # Les ports déjà observés affinent l'a priori statique
+        port_rate = _smoothed(*self.ports.get(key[1], (0, 0)), port_prior)
+        score = _logit(port_rate) - self._base
+        source = getattr(proxy, "source", None)
+        sources = getattr(proxy, "sources", None) or ((source,) if source else ())
+        if sources:
+            # Un proxy listé par plusieurs sources vaut ce que vaut la meilleure d'entre elles
+            score += max(self._evidence(self.sources.get(url), BASE_ALIVE_RATE) for url in sources)
+        score += self._evidence(self.subnets.get(_subnet(proxy.ip)), BASE_ALIVE_RATE)
+        # L'historique propre du proxy est l'indice le plus fort
+        score += 2 * self._evidence(self.history.get(key), BASE_ALIVE_RATE)
+        return score
+
+    def order(self, proxies: Iterable[Any]) -> List[Any]:
+        """Proxys triés par score décroissant (ordre de scraping conservé à égalité)."""
+        scored = [(self.score(proxy), position, proxy) for position, proxy in enumerate(proxies)]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [proxy for _, _, proxy in scored]
+
+
+def prioritize(proxies: Iterable[Any], store: ProxyHealthStore) -> List[Any]:
+    """Ordonne la file de validation d'après l'historique de santé."""
+    return PriorityScorer.from_store(store).order(proxies)
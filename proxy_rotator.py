@@ -0,0 +1,167 @@
+"""
+Rotateur de proxys partagé entre threads.
+Sélection « power of two choices » pondérée par la latence (EWMA), disjoncteur
+par proxy avec temps de refroidissement, et filtres par type / pays en O(1).
+"""
+
+import heapq
+import random
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Lissage de la moyenne mobile exponentielle des latences
+EWMA_ALPHA = 0.3
+# Latence supposée d'un proxy jamais mesuré
+DEFAULT_LATENCY = 1.0
+# Échecs consécutifs avant ouverture du disjoncteur
+FAILURE_THRESHOLD = 3
+BASE_COOLDOWN = 30.0
+MAX_COOLDOWN = 900.0
+
+BucketKey = Tuple[Optional[str], Optional[str]]
+
+
+class _Entry:
+    """État d'un proxy dans le rotateur."""
+    __slots__ = ("proxy", "key", "ewma", "failures", "trips", "open_until", "positions")
+
+    def __init__(self, proxy: Any, key: Tuple[str, str, str]):
+        self.proxy = proxy
+        self.key = key
+        speed = getattr(proxy, "speed", None)
+        self.ewma = speed if speed else DEFAULT_LATENCY
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        # Position de l'entrée dans chaque bucket qui la contient (retrait O(1))
+        self.positions: Dict[BucketKey, int] = {}
+
+    def score(self) -> float:
+        return self.ewma * (1 + self.failures)
+
+
+def _entry_key(proxy: Any) -> Tuple[str, str, str]:
+    return proxy.ip, str(proxy.port), proxy.proxy_type.upper()
+
+
+def _bucket_keys(entry: _Entry) -> List[BucketKey]:
+    """Buckets d'une entrée : tous, par type, par pays, par type et pays."""
+    proxy_type = entry.key[2]
+    country = (getattr(entry.proxy, "country", None) or "").upper() or None
+    keys: List[BucketKey] = [(None, None), (proxy_type, None)]
+    if country:
+        keys += [(None, country), (proxy_type, country)]
+    return keys
+
+
+class ProxyRotator:
+    """Rotateur pondéré par la santé des proxys, sûr entre threads."""
+
+    def __init__(self, proxies: Iterable[Any] = (), failure_threshold: int = FAILURE_THRESHOLD,
+                 base_cooldown: float = BASE_COOLDOWN, max_cooldown: float = MAX_COOLDOWN,
+                 seed: Optional[int] = None):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._entries: Dict[Tuple[str, str, str], _Entry] = {}
+        self._buckets: Dict[BucketKey, List[_Entry]] = {}
+        # Disjoncteurs ouverts : (fin du refroidissement, ordre, entrée)
+        self._cooling: List[Tuple[float, int, _Entry]] = []
+        self._sequence = 0
+        for proxy in proxies:
+            self.add(proxy)
+
+    def __len__(self) -> int:
+        """Nombre de proxys actuellement sélectionnables."""
+        with self._lock:
+            return len(self._buckets.get((None, None), ()))
+
+    def __call__(self) -> Optional[Any]:
+        return self.get()
+
+    def add(self, proxy: Any) -> None:
+        """Ajoute un proxy (ignoré s'il est déjà présent)."""
+        key = _entry_key(proxy)
+        with self._lock:
+            if key in self._entries:
+                return
+            entry = _Entry(proxy, key)
+            self._entries[key] = entry
+            self._insert(entry)
+
+    def remove(self, proxy: Any) -> None:
+        """Retire définitivement un proxy."""
+        with self._lock:
+            entry = self._entries.pop(_entry_key(proxy), None)
+            if entry is not None and entry.positions:
+                self._detach(entry)
+
+    def _insert(self, entry: _Entry) -> None:
+        for bucket_key in _bucket_keys(entry):
+            bucket = self._buckets.setdefault(bucket_key, [])
+            entry.positions[bucket_key] = len(bucket)
+            bucket.append(entry)
+
+    def _detach(self, entry: _Entry) -> None:
+        """Retire une entrée de ses buckets par échange avec le dernier élément."""
+        for bucket_key, position in entry.positions.items():
+            bucket = self._buckets[bucket_key]
+            last = bucket.pop()
+            if last is not entry:
+                bucket[position] = last
+                last.positions[bucket_key] = position
+        entry.positions = {}
+
+    def _release_cooled(self, now: float) -> None:
+        """Remet en service (semi-ouvert) les proxys dont le refroidissement est terminé."""
+        while self._cooling and self._cooling[0][0] <= now:
+            _, _, entry = heapq.heappop(self._cooling)
+            if entry.key in self._entries and not entry.positions:
+                self._insert(entry)
+
+    def get(self, proxy_type: Optional[str] = None, country: Optional[str] = None) -> Optional[Any]:
+        """Choisit le meilleur de deux proxys tirés au hasard parmi les candidats."""
+        bucket_key = (proxy_type.upper() if proxy_type else None, country.upper() if country else None)
+        with self._lock:
+            self._release_cooled(time.monotonic())
+            bucket = self._buckets.get(bucket_key)
+            if not bucket:
+                return None
+            first = bucket[self._random.randrange(len(bucket))]
+            if len(bucket) > 1:
+                second = bucket[self._random.randrange(len(bucket))]
+                if second.score() < first.score():
+                    first = second
+            return first.proxy
+
+    def report(self, proxy: Any, ok: bool, latency: Optional[float] = None) -> None:
+        """Remonte le résultat d'une utilisation du proxy."""
+        with self._lock:
+            entry = self._entries.get(_entry_key(proxy))
+            if entry is None:
+                return
+            if ok:
+                if latency is not None:
+                    entry.ewma += EWMA_ALPHA * (latency - entry.ewma)
+                entry.failures = 0
+                entry.trips = 0
+                return
+            entry.failures += 1
+            if entry.failures >= self.failure_threshold and entry.positions:
+                # Ouverture du disjoncteur : refroidissement exponentiel à chaque récidive
+                entry.trips += 1
+                cooldown = min(self.base_cooldown * 2 ** (entry.trips - 1), self.max_cooldown)
+                entry.open_until = time.monotonic() + cooldown
+                entry.failures = self.failure_threshold - 1
+                self._detach(entry)
+                self._sequence += 1
+                heapq.heappush(self._cooling, (entry.open_until, self._sequence, entry))
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs : proxys connus, disponibles et en refroidissement."""
+        with self._lock:
+            live = len(self._buckets.get((None, None), ()))
+            return {"total": len(self._entries), "live": live, "cooling": len(self._entries) - live}
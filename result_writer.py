@@ -0,0 +1,128 @@
+"""
+Écriture en continu des proxys validés.
+Chaque résultat est ajouté à un fichier `.part` dès sa confirmation, vidé par lots,
+puis renommé atomiquement à la fin : un arrêt brutal ne perd que le dernier lot.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+OUTPUT_FORMATS = ("simple", "detailed", "json", "jsonl")
+PART_SUFFIX = ".part"
+DETAILED_HEADER = "IP:PORT:TYPE:COUNTRY:SPEED:LAST_CHECKED:ANONYMITY\n"
+# Le tampon est vidé sur disque tous les FLUSH_EVERY proxys ou toutes les FLUSH_INTERVAL secondes
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 1.0
+
+
+def proxy_to_dict(proxy: Any) -> Dict[str, Any]:
+    """Représentation JSON d'un proxy et de ses métadonnées."""
+    last_checked: Optional[datetime] = getattr(proxy, "last_checked", None)
+    return {
+        "ip": proxy.ip,
+        "port": proxy.port,
+        "type": getattr(proxy, "proxy_type", None),
+        "country": getattr(proxy, "country", None),
+        "speed": getattr(proxy, "speed", None),
+        "last_checked": last_checked.isoformat() if last_checked else None,
+        "anonymity": getattr(proxy, "anonymity", None),
+        "exit_ip": getattr(proxy, "exit_ip", None),
+        "speed_p95": getattr(proxy, "speed_p95", None),
+        "jitter": getattr(proxy, "jitter", None),
+        "phases": getattr(proxy, "phases", None),
+    }
+
+
+def format_detailed(proxy: Any) -> str:
+    """Ligne du format détaillé IP:PORT:TYPE:COUNTRY:SPEED:LAST_CHECKED:ANONYMITY."""
+    last_checked = proxy.last_checked.isoformat() if proxy.last_checked else "Unknown"
+    return (f"{proxy.ip}:{proxy.port}:{proxy.proxy_type}:{proxy.country or 'Unknown'}:{proxy.speed or 'Unknown'}:"
+            f"{last_checked}:{proxy.anonymity or 'Unknown'}\n")
+
+
+class ResultWriter:
+    """Sortie de résultats en flux, à mémoire constante quel que soit le nombre de proxys."""
+
+    def __init__(self, filename: str, format_type: str = "simple", flush_every: int = FLUSH_EVERY,
+                 flush_interval: float = FLUSH_INTERVAL):
+        if format_type not in OUTPUT_FORMATS:
+            raise ValueError(f"Format de sortie inconnu '{format_type}'")
+        self.filename = filename
+        self.format_type = format_type
+        self.part_path = filename + PART_SUFFIX
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.count = 0
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._file = open(self.part_path, "w", encoding="utf-8")
+        if format_type == "detailed":
+            self._file.write(DETAILED_HEADER)
+        elif format_type == "json":
+            self._file.write("[")
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        # Résultats confirmés avant l'erreur : toujours publiés
+        self.close()
+
+    def _format(self, proxy: Any) -> str:
+        if self.format_type == "simple":
+            return f"{proxy.ip}:{proxy.port}\n"
+        if self.format_type == "detailed":
+            return format_detailed(proxy)
+        line = json.dumps(proxy_to_dict(proxy), default=str)
+        if self.format_type == "json":
+            return ("\n" if self.count == 0 else ",\n") + line
+        return line + "\n"
+
+    def write(self, proxy: Any) -> None:
+        """Ajoute un proxy confirmé (sûr entre threads)."""
+        with self._lock:
+            self._buffer.append(self._format(proxy))
+            self.count += 1
+            if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def write_addresses(self, addresses: Iterable[str]) -> None:
+        """Ajoute des adresses IP:PORT déjà formatées (format simple uniquement)."""
+        if self.format_type != "simple":
+            raise ValueError("write_addresses n'accepte que le format simple")
+        for address in addresses:
+            with self._lock:
+                self._buffer.append(address + "\n")
+                self.count += 1
+                if len(self._buffer) >= self.flush_every:
+                    self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        """Vide le tampon dans le fichier `.part`."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self) -> None:
+        """Termine le fichier et le renomme atomiquement vers sa destination finale."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            if self.format_type == "json":
+                self._file.write("\n]\n" if self.count else "]\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.part_path, self.filename)
@@ -0,0 +1,137 @@
+"""
+Validation répartie sur plusieurs processus.
+La liste dédoublonnée est découpée en shards ; chaque processus exécute son propre
+moteur asyncio à forte concurrence et renvoie ses résultats par lots au processus
+principal, qui les fusionne et les diffuse au fil de l'eau.
+"""
+
+import multiprocessing
+import os
+import queue
+import signal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from adaptive_concurrency import AdaptiveConcurrency
+from metrics import REGISTRY
+from proxy_engine import DEFAULT_TEST_URL, TICK_INTERVAL, ProbeResult, apply_probe, validate_proxies_async
+from proxy_pool import Proxy, remove_duplicates
+
+DEFAULT_PROCESSES = os.cpu_count() or 1
+# Résultats renvoyés au processus principal par lots de RESULT_BATCH, et au plus tard
+# toutes les TICK_INTERVAL secondes (même si aucun nouveau résultat n'arrive)
+RESULT_BATCH = 256
+RESULT_INTERVAL = TICK_INTERVAL
+
+# (position dans le shard, ok, latence, IP de sortie, anonymat, pays annoncé par le juge)
+ShardResult = Tuple[int, bool, Optional[float], Optional[str], Optional[str], Optional[str]]
+
+
+def _shard_worker(shard_id: int, entries: List[Tuple[str, str, str]], max_workers: Optional[int],
+                  options: Dict[str, Any], results: Any, stop_event: Any) -> None:
+    """Processus de validation d'un shard."""
+    # Ctrl+C est géré par le processus principal, qui transmet l'arrêt via stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    proxies = [Proxy(ip=ip, port=port, proxy_type=proxy_type) for ip, port, proxy_type in entries]
+    positions = {id(proxy): position for position, proxy in enumerate(proxies)}
+    batch: List[ShardResult] = []
+
+    def flush() -> None:
+        # Appelé par la boucle du shard toutes les RESULT_INTERVAL secondes : un fonctionnel
+        # trouvé n'attend pas le résultat suivant (qui peut être un délai dépassé)
+        nonlocal batch
+        if batch:
+            results.put((shard_id, batch))
+            batch = []
+
+    def on_result(proxy: Proxy, ok: bool, latency: Optional[float]) -> None:
+        batch.append((positions[id(proxy)], ok, latency, proxy.exit_ip, proxy.anonymity, proxy.country))
+        if len(batch) >= RESULT_BATCH:
+            flush()
+
+    try:
+        validate_proxies_async(
+            proxies,
+            concurrency=max_workers or AdaptiveConcurrency(options["timeout"]),
+            on_result=on_result,
+            should_stop=stop_event.is_set,
+            on_tick=flush,
+            **options,
+        )
+    finally:
+        results.put((shard_id, batch))
+        # Compteurs du shard, fusionnés dans le registre du processus principal
+        results.put((shard_id, REGISTRY.snapshot()))
+        # Fin du shard
+        results.put((shard_id, None))
+
+
+def validate_sharded(
+    proxies: List[Any],
+    processes: Optional[int] = None,
+    timeout: float = 5,
+    max_workers: Optional[int] = None,
+    on_result: Optional[Callable[[Any, bool, Optional[float]], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    mode: str = "full",
+    test_url: str = DEFAULT_TEST_URL,
+    judge_url: Optional[str] = None,
+    geo_lookup: Optional[Callable[[str], Optional[str]]] = None,
+) -> List[Any]:
+    """Valide les proxys sur plusieurs processus et retourne ceux qui fonctionnent.
+
+    max_workers est la concurrence de chaque processus (adaptative si None).
+    on_result(proxy, ok, latence) est appelé dans le processus principal avec les objets d'origine.
+    """
+    unique = remove_duplicates(proxies, by_type=True)
+    processes = max(1, min(processes or DEFAULT_PROCESSES, len(unique)))
+    # Répartition en quinconce : chaque shard garde l'ordre de priorité de la file
+    shards = [unique[index::processes] for index in range(processes)]
+    options = {"timeout": timeout, "mode": mode, "test_url": test_url, "judge_url": judge_url}
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    stop_event = context.Event()
+    workers = [
+        context.Process(
+            target=_shard_worker,
+            args=(shard_id, [(proxy.ip, str(proxy.port), proxy.proxy_type) for proxy in shard], max_workers, options, results, stop_event),
+            daemon=True,
+        )
+        for shard_id, shard in enumerate(shards)
+    ]
+    for worker in workers:
+        worker.start()
+
+    working_proxies = []
+    running = len(workers)
+    while running:
+        if should_stop is not None and should_stop():
+            stop_event.set()
+        try:
+            shard_id, batch = results.get(timeout=0.2)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                # Processus terminés sans signaler leur fin (plantage)
+                break
+            continue
+        if batch is None:
+            running -= 1
+            continue
+        if isinstance(batch, dict):
+            REGISTRY.merge(batch)
+            continue
+        shard = shards[shard_id]
+        for position, ok, latency, exit_ip, anonymity, country in batch:
+            proxy = shard[position]
+            if ok:
+                # La base GeoIP locale reste dans ce processus ; sinon, pays annoncé par le juge
+                if geo_lookup is not None and exit_ip:
+                    country = geo_lookup(exit_ip)
+                apply_probe(proxy, ProbeResult(ok=True, latency=latency, exit_ip=exit_ip, anonymity=anonymity, country=country))
+                working_proxies.append(proxy)
+            if on_result is not None:
+                on_result(proxy, ok, latency)
+
+    for worker in workers:
+        worker.join(timeout=5)
+    return working_proxies
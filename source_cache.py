@@ -0,0 +1,124 @@
+"""
+Cache disque des listes de proxys sources (requêtes conditionnelles).
+Conserve ETag, Last-Modified et le résultat déjà analysé de chaque URL.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_CACHE_DIR = "source_cache"
+# Âge maximal d'une copie en cache utilisable quand la source est injoignable
+DEFAULT_MAX_STALE = 24 * 3600
+INDEX_FILENAME = "index.json"
+
+
+def _atomic_write(path: str, data: str) -> None:
+    """Écrit un fichier via un fichier temporaire puis un renommage atomique."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class SourceCache:
+    """Cache des sources indexé par URL."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_stale: float = DEFAULT_MAX_STALE):
+        self.directory = directory
+        self.max_stale = max_stale
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_FILENAME)
+        self._index: Dict[str, Dict] = self._load_index()
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Charge l'index des entrées en cache."""
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _data_path(self, url: str) -> str:
+        """Chemin du fichier contenant les proxys analysés pour une URL."""
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.txt")
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """En-têtes If-None-Match / If-Modified-Since pour une URL en cache."""
+        entry = self._index.get(url)
+        if not entry or not os.path.exists(self._data_path(url)):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, url: str, max_age: Optional[float] = None) -> Optional[List[Tuple[str, str]]]:
+        """Retourne les couples (ip, port) en cache, ou None si absents ou trop anciens."""
+        entry = self._index.get(url)
+        if not entry:
+            return None
+        if max_age is not None and time.time() - entry.get("fetched_at", 0) > max_age:
+            return None
+        try:
+            with open(self._data_path(url), "r", encoding="utf-8") as file:
+                return [tuple(line.rstrip("\n").rsplit(":", 1)) for line in file if line.strip()]
+        except OSError:
+            return None
+
+    def load_stale(self, url: str) -> Optional[List[Tuple[str, str]]]:
+        """Copie de secours utilisable si la source est injoignable."""
+        return self.load(url, self.max_stale)
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], proxies: List[Tuple[str, str]]) -> None:
+        """Enregistre le résultat analysé d'une URL et ses validateurs HTTP.
+
+        Les entrées absentes de la version précédente sont comptées (fraîcheur de la source).
+        """
+        previous = self.load(url)
+        now = time.time()
+        current = set(proxies)
+        if previous is None:
+            new, changed_at = len(current), now
+        else:
+            new = len(current.difference(previous))
+            changed_at = now if new or len(previous) != len(proxies) else self._index[url].get("changed_at", now)
+        _atomic_write(self._data_path(url), "".join(f"{ip}:{port}\n" for ip, port in proxies))
+        with self._lock:
+            self._index[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": now,
+                "changed_at": changed_at,
+                "count": len(proxies),
+                "new": new,
+            }
+            self._save_index()
+
+    def touch(self, url: str) -> None:
+        """Marque une entrée comme revalidée (réponse 304)."""
+        with self._lock:
+            if url in self._index:
+                self._index[url]["fetched_at"] = time.time()
+                self._index[url]["new"] = 0
+                self._save_index()
+
+    def freshness(self, url: str, since: float = 0) -> Tuple[int, Optional[float]]:
+        """(entrées nouvelles au dernier téléchargement, date du dernier changement de contenu).
+
+        Une copie qui n'a pas été revalidée depuis `since` (source injoignable) n'apporte rien de nouveau.
+        """
+        entry = self._index.get(url) or {}
+        new = entry.get("new", 0) if entry.get("fetched_at", 0) >= since else 0
+        return new, entry.get("changed_at")
+
+    def _save_index(self) -> None:
+        """Écrit l'index (appelé sous verrou)."""
+        _atomic_write(self._index_path, json.dumps(self._index, indent=2))
@@ -0,0 +1,167 @@
+"""
+Qualité des sources de proxys, suivie d'une exécution à l'autre dans l'historique de santé.
+Pour chaque URL : rendement, recouvrement avec les autres sources, taux de proxys
+fonctionnels, fraîcheur de la liste et fonctionnels que seule cette source apporte.
+Les sources sans valeur sont échantillonnées ou ignorées : la validation se concentre
+sur les sources où se trouvent réellement les proxys fonctionnels.
+"""
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from health_store import ProxyHealthStore
+from proxy_pool import Proxy, ProxyPool
+from proxy_priority import BASE_ALIVE_RATE, PRIOR_WEIGHT
+
+# Tests nécessaires avant de juger une source
+MIN_SOURCE_CHECKS = 200
+# En dessous de ce taux de fonctionnels (lissé), une source n'est plus validée en entier
+LOW_ALIVE_RATE = 0.005
+# Part des entrées d'une source faible qui reste validée : ses statistiques continuent d'évoluer
+SAMPLE_FRACTION = 0.1
+# Une source faible n'est plus téléchargée si les autres listent déjà l'essentiel de ses entrées...
+SKIP_OVERLAP = 0.9
+# ... ou si sa liste n'a pas changé depuis une semaine
+STALE_AGE = 7 * 24 * 3600
+# Une source ignorée est de nouveau téléchargée (et échantillonnée) après ce délai
+SKIP_REVISIT = 24 * 3600
+
+KEEP, SAMPLE, SKIP = "keep", "sample", "skip"
+DECISION_LABELS = {KEEP: "validée", SAMPLE: "échantillonnée", SKIP: "ignorée"}
+
+
+@dataclass
+class SourceStats:
+    """Statistiques cumulées d'une source."""
+    url: str
+    checked: int = 0
+    alive: int = 0
+    unique_alive: int = 0
+    scrapes: int = 0
+    listed: int = 0
+    unique_listed: int = 0
+    new_listed: int = 0
+    last_scraped: Optional[float] = None
+    last_changed: Optional[float] = None
+
+    @property
+    def alive_rate(self) -> float:
+        """Taux de fonctionnels, tiré vers le taux de base tant que les tests sont rares."""
+        return (self.alive + BASE_ALIVE_RATE * PRIOR_WEIGHT) / (self.checked + PRIOR_WEIGHT)
+
+    @property
+    def unique_alive_rate(self) -> float:
+        """Part des tests qui ont trouvé un fonctionnel listé par cette seule source."""
+        return self.unique_alive / self.checked if self.checked else 0.0
+
+    @property
+    def yield_per_scrape(self) -> float:
+        return self.listed / self.scrapes if self.scrapes else 0.0
+
+    @property
+    def overlap(self) -> float:
+        """Part des entrées également listées par une autre source."""
+        return 1 - self.unique_listed / self.listed if self.listed else 0.0
+
+    @property
+    def freshness(self) -> float:
+        """Part des entrées absentes du téléchargement précédent."""
+        return self.new_listed / self.listed if self.listed else 0.0
+
+    def decision(self, now: Optional[float] = None) -> str:
+        """KEEP (validée en entier), SAMPLE (échantillonnée) ou SKIP (pas téléchargée)."""
+        if self.checked < MIN_SOURCE_CHECKS or self.alive_rate >= LOW_ALIVE_RATE:
+            return KEEP
+        now = time.time() if now is None else now
+        if self.last_scraped is not None and now - self.last_scraped < SKIP_REVISIT:
+            stale = self.last_changed is not None and now - self.last_changed > STALE_AGE
+            if stale or self.overlap >= SKIP_OVERLAP:
+                return SKIP
+        return SAMPLE
+
+
+def load_source_stats(store: ProxyHealthStore) -> Dict[str, SourceStats]:
+    """Statistiques de toutes les sources connues de l'historique."""
+    return {url: SourceStats(url, **values) for url, values in store.source_stats().items()}
+
+
+def rank_sources(urls: Iterable[str], stats: Dict[str, SourceStats]) -> List[str]:
+    """URLs par taux de fonctionnels décroissant (une source inconnue vaut le taux de base)."""
+    return sorted(urls, key=lambda url: -(stats[url].alive_rate if url in stats else BASE_ALIVE_RATE))
+
+
+def merge_listings(listings: Dict[str, Sequence[Tuple[str, str]]], proxy_type: str) -> ProxyPool:
+    """Pool dédoublonné sur les clés IP:PORT packées ; chaque entrée garde toutes les sources qui la listent.
+
+    La première source (dans l'ordre de listings) devient la source principale de ses proxys.
+    """
+    pool = ProxyPool()
+    for url, pairs in listings.items():
+        pool.extend_pairs(pairs, proxy_type, source=url)
+    pool.dedupe()
+    return pool
+
+
+def select_for_validation(pool: ProxyPool, decisions: Dict[str, str], fraction: float = SAMPLE_FRACTION,
+                          rng: Optional[random.Random] = None) -> Tuple[List[Proxy], int]:
+    """Proxys à valider : tous ceux listés par une source gardée, un échantillon des autres.
+
+    Seules les entrées sélectionnées deviennent des objets Proxy.
+    Retourne (sélection, nombre de proxys écartés).
+    """
+    rng = rng or random.Random()
+    keep = pool.sources_mask(url for url in pool.source_urls if decisions.get(url, KEEP) == KEEP)
+    selected = []
+    dropped = 0
+    for index, mask in enumerate(pool.source_masks):
+        if mask & keep or rng.random() < fraction:
+            selected.append(pool[index])
+        else:
+            dropped += 1
+    for proxy in pool.extra:
+        if any(decisions.get(url, KEEP) == KEEP for url in proxy.sources) or rng.random() < fraction:
+            selected.append(proxy)
+        else:
+            dropped += 1
+    return selected, dropped
+
+
+def report_lines(counts: Dict[str, List[int]], decisions: Dict[str, str], stats: Dict[str, SourceStats],
+                 working: Optional[Iterable[Proxy]] = None) -> List[str]:
+    """Apport de chaque source au scraping : entrées propres et, après validation, fonctionnels propres."""
+    alive: Dict[str, List[int]] = {}
+    for proxy in working or ():
+        for url in proxy.sources:
+            entry = alive.setdefault(url, [0, 0])
+            entry[0] += 1
+            entry[1] += len(proxy.sources) == 1
+    lines = []
+    for url, decision in decisions.items():
+        if decision == SKIP:
+            lines.append(f"{url} : {DECISION_LABELS[SKIP]}")
+            continue
+        if url not in counts:
+            lines.append(f"{url} : aucune entrée [{DECISION_LABELS[decision]}]")
+            continue
+        listed, unique = counts[url]
+        line = f"{url} : {listed} entrées dont {unique} propres ({1 - unique / listed if listed else 0:.0%} de recouvrement)"
+        if working is not None:
+            found, found_unique = alive.get(url, (0, 0))
+            line += f", {found} fonctionnels dont {found_unique} propres"
+        if url in stats:
+            line += f", historique {stats[url].alive_rate:.2%}"
+        lines.append(f"{line} [{DECISION_LABELS[decision]}]")
+    return lines
+
+
+def describe(stats: SourceStats, now: Optional[float] = None) -> str:
+    """Résumé des statistiques cumulées d'une source."""
+    now = time.time() if now is None else now
+    changed = f"{(now - stats.last_changed) / 3600:.0f} h" if stats.last_changed else "?"
+    return (f"{stats.url}\n"
+            f"    {stats.scrapes} scrapings, {stats.yield_per_scrape:.0f} entrées par scraping, "
+            f"{stats.overlap:.0%} de recouvrement, {stats.freshness:.0%} d'entrées nouvelles, liste changée il y a {changed}\n"
+            f"    {stats.checked} testés, {stats.alive_rate:.2%} fonctionnels, {stats.unique_alive} fonctionnels propres "
+            f"[{DECISION_LABELS[stats.decision(now)]}]")